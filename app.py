@@ -1,42 +1,49 @@
+import time
+from contextlib import contextmanager
+
 import streamlit as st
-import pandas as pd
-from modules.user_filter import filter_user_preferences
-from modules.image import generate_dummy_image
-from modules.recommendation import hybrid_topk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from scipy.sparse import csr_matrix
-from PIL import Image
+from modules.image import dummy_image_bytes
+from modules.result_cache import RESULT_CACHE, cached_query, canonical_query
+from modules.catalog import get_catalog
+from modules.preference import PreferenceProfile, personalized_query
+from modules.tracing import TRACE_ENV, begin_trace, finish_trace, span
 
 st.set_page_config(page_title="Skincare Recommendation", layout="wide")
 
-# ====== Load dataset ======
+# ====== Timing per rerun (selalu aktif) + trace detail (jika SKINCARE_TRACE=1 / profile, lihat modules/tracing.py) ======
+trace = begin_trace("rerun")
+rerun_start = time.perf_counter()
+timings = {}
+
+@contextmanager
+def stage(name):
+    # Durasi tahap selalu dicatat (perf_counter); span ikut masuk trace jika tracing aktif
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+# ====== Load katalog (cache per proses, dipakai bersama semua sesi) ======
 CSV_PATH = "data/skincare_products_clean.csv"
-df = pd.read_csv(CSV_PATH)
+with stage("load_catalog"):
+    catalog = get_catalog(CSV_PATH)
 
-# --- Normalisasi teks ---
-for col in ['Category', 'Skin_Type', 'Gender', 'Usage_Frequency', 'Product_Name', 'Brand', 'Ingredients']:
-    if col in df.columns:
-        df[col] = df[col].fillna('').astype(str).str.strip().str.lower()
+# ====== Profil preferensi sesi dari like/dislike (lihat modules/preference.py) ======
+if "preference" not in st.session_state or not st.session_state["preference"].matches(catalog):
+    st.session_state["preference"] = PreferenceProfile.for_catalog(catalog)
+preference = st.session_state["preference"]
+
+def record_feedback(position, liked):
+    # Callback tombol dijalankan sebelum rerun, jadi ranking rerun berikutnya sudah memakai profil baru
+    if liked:
+        preference.like(catalog.tfidf_matrix, position)
     else:
-        df[col] = ''
-
-# Price numeric safety
-if 'Price_IDR' in df.columns:
-    df['Price_IDR'] = pd.to_numeric(df['Price_IDR'], errors='coerce').fillna(0)
-else:
-    df['Price_IDR'] = 0
-
-# ===== Precompute TF-IDF sekali =====
-st.session_state.setdefault("tfidf_matrix", None)
-st.session_state.setdefault("tfidf_vectorizer", None)
-
-if st.session_state.tfidf_matrix is None:
-    tfidf_vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = csr_matrix(tfidf_vectorizer.fit_transform(df['combined_features']))
-    st.session_state.tfidf_matrix = tfidf_matrix
-    st.session_state.tfidf_vectorizer = tfidf_vectorizer
-else:
-    tfidf_matrix = st.session_state.tfidf_matrix
+        preference.dislike(catalog.tfidf_matrix, position)
+
+def reset_preference():
+    st.session_state["preference"] = PreferenceProfile.for_catalog(catalog)
 
 # ----- Halaman & Sidebar Styling -----
 st.markdown("""
@@ -127,11 +134,11 @@ p, span, div, label {
 st.title("🏆Cosmetics Recommendation System")
 st.sidebar.header("Product Filters")
 
-# ----- Ambil unique value -----
-categories = ["All"] + sorted(df['Category'].dropna().unique().tolist())
-skin_types = ["All"] + sorted(df['Skin_Type'].dropna().unique().tolist())
-genders = ["All"] + sorted(df['Gender'].dropna().unique().tolist())
-usage_freqs = ["All"] + sorted(df['Usage_Frequency'].dropna().unique().tolist())
+# ----- Ambil unique value (sudah dihitung di katalog) -----
+categories = ["All"] + catalog.facet_values['Category']
+skin_types = ["All"] + catalog.facet_values['Skin_Type']
+genders = ["All"] + catalog.facet_values['Gender']
+usage_freqs = ["All"] + catalog.facet_values['Usage_Frequency']
 
 # ----- Filter Sidebar -----
 category_select = st.sidebar.selectbox("Product Categories", categories)
@@ -139,8 +146,8 @@ skin_type_select = st.sidebar.selectbox("Skin Type", skin_types)
 gender_select = st.sidebar.selectbox("Gender", genders)
 usage_select = st.sidebar.selectbox("Usage Frequency", usage_freqs)
 
-price_min = float(df['Price_IDR'].min()) if len(df) > 0 else 0.0
-price_max = float(df['Price_IDR'].max()) if len(df) > 0 else 0.0
+price_min = catalog.price_min
+price_max = catalog.price_max
 
 st.sidebar.markdown("Product Price Range (Rp)")
 price_range = st.sidebar.slider(
@@ -153,53 +160,98 @@ price_range = st.sidebar.slider(
 )
 st.sidebar.caption(f"Displaying products with prices between **Rp {price_range[0]:,.0f}** and **Rp {price_range[1]:,.0f}**")
 
+st.sidebar.markdown("Personalization")
+st.sidebar.caption(f"{len(preference.liked)} liked / {len(preference.disliked)} disliked products")
+st.sidebar.button("Reset preferences", on_click=reset_preference, disabled=preference.interactions == 0)
+
 # ----- Convert "All" => None -----
 category = None if category_select == "All" else category_select
 skin_type = None if skin_type_select == "All" else skin_type_select
 gender = None if gender_select == "All" else gender_select
 usage_frequency = None if usage_select == "All" else usage_select
 
-# ----- Apply filter -----
-filtered_df = filter_user_preferences(df, category, skin_type, gender, usage_frequency, price_range)
-
 # ----- Tentukan jumlah top recommendation -----
 top_k = 20 if all(x is None for x in [category, skin_type, gender, usage_frequency]) else 10
 
-# ----- Hitung rekomendasi -----
-top_recommendations = hybrid_topk(
-    filtered_df,
+# ----- Filter + ranking (hasil di-cache per query kanonik, dipakai bersama semua sesi) -----
+query = canonical_query(
+    catalog,
+    category,
+    skin_type,
+    gender,
+    usage_frequency,
+    price_range,
     alpha=0.4,
     beta=0.2,
     gamma=0.4,
-    k=top_k,
-    tfidf_matrix=tfidf_matrix
+    k=top_k
 )
+personalized = preference.unit_vector() is not None
+with stage("filter+rank"):
+    if personalized:
+        # Skor similarity terhadap profil sesi, tidak di-cache (spesifik per sesi)
+        matched, top_recommendations = personalized_query(catalog, query, preference)
+        cache_hit = None
+    else:
+        matched, top_recommendations, cache_hit = cached_query(catalog, query)
+
+with stage("render"):
+    if matched == 0:
+        st.warning("Sorry, there are no products matching your filter.")
+    else:
+        st.write(f"Top-{top_k} Recommended Cosmetic Products" + (" (personalized)" if personalized else ""))
+        for _, row in top_recommendations.iterrows():
+            with st.container():
+                cols = st.columns([1, 2])
+                with cols[0]:
+                    product_name = str(row.get("Product_Name", "Unknown Product"))
+                    # Pakai dummy image otomatis (PNG dari cache memori)
+                    st.image(dummy_image_bytes(product_name), width=180, caption=f"{row['Brand'].title()}")
+                    # Label index = posisi global produk di katalog
+                    position = int(row.name)
+                    st.button("👍 Like" + (" ✓" if position in preference.liked else ""), key=f"like_{position}",
+                              on_click=record_feedback, args=(position, True))
+                    st.button("👎 Dislike" + (" ✓" if position in preference.disliked else ""),
+                              key=f"dislike_{position}", on_click=record_feedback, args=(position, False))
+
+                with cols[1]:
+                    st.markdown(f"""
+                        <div class='card'>
+                            <h3 style='margin:0; color:#0b3d91;'>{row['Product_Name'].title()}</h3>
+                            <p style='margin:0.3em 0; font-weight:bold; color:#1a1a1a;'>Brand: {row['Brand'].title()}</p>
+                            <p style='margin:0.3em 0;'><span style="background-color:#6c91c2; color:#fff; padding:3px 6px; border-radius:5px;">{row['Category'].title()}</span></p>
+                            <p style='margin:0.3em 0;'><b>Rating:</b> {'⭐'*int(row['Rating'])} ({row['Rating']})</p>
+                            <p style='margin:0.3em 0;'><b>Reviews:</b> {int(row['Number_of_Reviews'])}</p>
+                            <p style='margin:0.3em 0; color:#0b3d91; font-size:18px;'><b>Price:</b> Rp {row['Price_IDR']:,.0f}</p>
+                            <p style='margin:0.3em 0;'><b>Ingredients:</b> {row['Ingredients']}</p>
+                            <p style='margin:0.3em 0;'><b>Origin:</b> {row['Country_of_Origin']}</p>
+                        </div>
+                    """, unsafe_allow_html=True)
+                st.markdown("---")
+report_path = finish_trace(trace)
+rerun_seconds = time.perf_counter() - rerun_start
 
-if filtered_df.empty:
-    st.warning("Sorry, there are no products matching your filter.")
-else:
-    st.write(f"Top-{top_k} Recommended Cosmetic Products")
-    for _, row in top_recommendations.iterrows():
-        with st.container():
-            cols = st.columns([1, 2])
-            with cols[0]:
-                product_name = str(row.get("Product_Name", "Unknown Product"))
-                # Pakai dummy image otomatis
-                img_path = generate_dummy_image(product_name)
-                img = Image.open(img_path)
-                st.image(img, width=180, caption=f"{row['Brand'].title()}")
-
-            with cols[1]:
-                st.markdown(f"""
-                    <div class='card'>
-                        <h3 style='margin:0; color:#0b3d91;'>{row['Product_Name'].title()}</h3>
-                        <p style='margin:0.3em 0; font-weight:bold; color:#1a1a1a;'>Brand: {row['Brand'].title()}</p>
-                        <p style='margin:0.3em 0;'><span style="background-color:#6c91c2; color:#fff; padding:3px 6px; border-radius:5px;">{row['Category'].title()}</span></p>
-                        <p style='margin:0.3em 0;'><b>Rating:</b> {'⭐'*int(row['Rating'])} ({row['Rating']})</p>
-                        <p style='margin:0.3em 0;'><b>Reviews:</b> {int(row['Number_of_Reviews'])}</p>
-                        <p style='margin:0.3em 0; color:#0b3d91; font-size:18px;'><b>Price:</b> Rp {row['Price_IDR']:,.0f}</p>
-                        <p style='margin:0.3em 0;'><b>Ingredients:</b> {row['Ingredients']}</p>
-                        <p style='margin:0.3em 0;'><b>Origin:</b> {row['Country_of_Origin']}</p>
-                    </div>
-                """, unsafe_allow_html=True)
-            st.markdown("---")
+# ----- Ringkasan trace rerun -----
+with st.sidebar.expander("Rerun timing"):
+    for name, seconds in timings.items():
+        share = seconds / rerun_seconds * 100 if rerun_seconds > 0 else 0
+        st.caption(f"{name}: {seconds * 1000:.1f} ms ({share:.0f}%)")
+    st.caption(f"**total: {rerun_seconds * 1000:.1f} ms**")
+    if trace is None:
+        st.caption(f"detail span: jalankan dengan {TRACE_ENV}=1 atau {TRACE_ENV}=profile")
+    else:
+        # Span bersarang (tahap level atas sudah ditampilkan di atas)
+        for name, entry in trace.summary().items():
+            if entry["depth"] == 0:
+                continue
+            share = entry["seconds"] / trace.seconds * 100 if trace.seconds > 0 else 0
+            line = f"{'· ' * entry['depth']}{name}: {entry['seconds'] * 1000:.1f} ms ({share:.0f}%)"
+            if entry["count"] > 1:
+                line += f" x{entry['count']}"
+            st.caption(line)
+        if report_path is not None:
+            st.caption(f"profil cProfile/tracemalloc: `{report_path}`")
+    stats = RESULT_CACHE.stats()
+    cache_state = "skipped (personalized)" if cache_hit is None else "hit" if cache_hit else "miss"
+    st.caption(f"result cache: {cache_state} "
+               f"({stats['hits']} hit / {stats['misses']} miss / {stats['evictions']} evicted, {stats['size']} entri)")
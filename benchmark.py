@@ -0,0 +1,1006 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from modules.catalog import Catalog, CompactCatalog, catalog_memory, clear_catalog_cache, get_catalog
+from modules.columnar import build_columnar, normalize_catalog
+from modules.data_preprocessing import preprocess_and_save, preprocess_and_save_streaming
+from modules.image import _gradient, clear_image_cache, dummy_image_bytes, generate_dummy_image, prerender_images
+from modules.ingest import apply_changes
+from modules.model_store import build_tfidf_artifact, load_or_build_tfidf
+from modules.neighbors import EXACT_MAX_ROWS, NEIGHBOR_METHODS, N_PROBE, build_neighbors, neighbor_recall
+from modules.preference import DISLIKE_WEIGHT, LIKE_WEIGHT, PreferenceProfile, personalized_query, replay_profile
+from modules.profiles import build_profiles
+from modules.recommendation import (
+    hybrid_topk, hybrid_topk_batch, mean_similarity, pairwise_mean_similarity, rank_positions,
+    score_columns, similarity_scores, topk_indices, component_scores, weighted_scores,
+)
+from modules.result_cache import ResultCache, cached_query, canonical_query, live_query, run_query
+from modules.sharding import ShardedCatalog
+from modules.topk_views import VIEW_FILE, build_views, view_arrays
+from modules import tracing
+from evaluasi_metrik import encode_ids, ndcg_at_k, precision_at_k, ranking_metrics, recall_at_k
+from modules.user_filter import FACET_COLUMNS, FacetIndex, filter_positions, filter_user_preferences
+
+"""
+    Benchmark performa pipeline rekomendasi.
+
+    Setiap benchmark dijalankan sebagai subcommand, contoh:
+        python benchmark.py similarity --sizes 1000 15000 150000
+
+    Katalog sintetis dibuat dengan sampling ulang baris dataset clean,
+    sehingga distribusi fitur tetap sama dengan data asli.
+
+    Benchmark hanya mengukur waktu & memori; kesetaraan hasil antar
+    implementasi dicek di tests/ (python -m pytest).
+"""
+
+CSV_PATH = "data/skincare_products_clean.csv"
+RAW_CSV_PATH = "data/skincare_products.csv"
+
+# Batas memori matrix dense n x n untuk mode pairwise (bytes), di atas ini dilewati
+PAIRWISE_MAX_BYTES = 2 * 1024**3
+
+def load_clean_catalog(csv_path=CSV_PATH):
+    return pd.read_csv(csv_path)
+
+def make_synthetic_catalog(df, n_rows, seed=42):
+    # Sampling dengan pengembalian agar ukuran katalog bisa melebihi data asli
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(df), size=n_rows)
+    return df.iloc[idx].reset_index(drop=True)
+
+def timed_call(func, *args, **kwargs):
+    # Seperti measure tanpa tracemalloc (tracemalloc memperlambat kode yang banyak alokasi)
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+@contextlib.contextmanager
+def working_directory(path):
+    # Seperti contextlib.chdir (Python 3.11+), runtime aplikasi masih Python 3.10
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def measure(func, *args, **kwargs):
+    # Mengembalikan (hasil, detik, peak memori tracemalloc dalam MB)
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024**2
+
+def bench_similarity(sizes):
+    base = load_clean_catalog()
+    print("=== BENCHMARK MEAN SIMILARITY (centroid vs pairwise) ===")
+    print(f"{'rows':>10} {'mode':>9} {'time_s':>9} {'peak_MB':>10} {'max_abs_diff':>13}")
+    for n in sizes:
+        df = make_synthetic_catalog(base, n)
+        tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(df['combined_features'])
+
+        centroid, t_c, m_c = measure(mean_similarity, tfidf_matrix)
+        print(f"{n:>10} {'centroid':>9} {t_c:>9.4f} {m_c:>10.1f} {'-':>13}")
+
+        if n * n * 8 > PAIRWISE_MAX_BYTES:
+            print(f"{n:>10} {'pairwise':>9} {'skip':>9} {n * n * 8 / 1024**2:>10.1f} {'-':>13}")
+            continue
+        pairwise, t_p, m_p = measure(pairwise_mean_similarity, tfidf_matrix)
+        diff = float(np.max(np.abs(centroid - pairwise)))
+        print(f"{n:>10} {'pairwise':>9} {t_p:>9.4f} {m_p:>10.1f} {diff:>13.2e}")
+
+def facet_combinations(df):
+    # Semua kombinasi pilihan sidebar: None ("All") + nilai unik tiap facet
+    options = [[None] + sorted(df[col].dropna().unique().tolist()) for col in FACET_COLUMNS]
+    return list(itertools.product(*options))
+
+def bench_filter(price_bands, n_queries, seed=42):
+    df = normalize_catalog(load_clean_catalog())
+    price_max = float(df['Price_IDR'].max())
+    ranges = [(0, price_max)] + [(price_max * i / price_bands, price_max * (i + 1) / price_bands) for i in range(price_bands)]
+
+    _, t_build, m_build = measure(FacetIndex, df)
+    index = FacetIndex(df)
+    # Sampel acak kombinasi facet x rentang harga (semua kombinasi jika n_queries <= 0)
+    cases = list(itertools.product(facet_combinations(df), ranges))
+    if 0 < n_queries < len(cases):
+        picks = np.random.default_rng(seed).choice(len(cases), size=n_queries, replace=False)
+        cases = [cases[i] for i in picks]
+    print("=== BENCHMARK FILTER (FacetIndex vs filter_user_preferences) ===")
+    print(f"Index build: {t_build:.4f}s, peak {m_build:.1f} MB")
+
+    t_old = t_new = 0.0
+    for (category, skin_type, gender, usage), price_range in cases:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            filter_user_preferences(df, category, skin_type, gender, usage, price_range)
+        t_old += time.perf_counter() - start
+
+        start = time.perf_counter()
+        filter_positions(index, category, skin_type, gender, usage, price_range)
+        t_new += time.perf_counter() - start
+
+    n_queries = len(cases)
+    print(f"{n_queries} query")
+    print(f"filter_user_preferences: {t_old / n_queries * 1000:.3f} ms/query")
+    print(f"filter_positions       : {t_new / n_queries * 1000:.3f} ms/query ({t_old / t_new:.1f}x)")
+
+RANK_FILTERS = [
+    {"category": "blush", "skin_type": "oily", "gender": "female", "usage_frequency": "weekly"},
+    {"category": "cleanser", "skin_type": None, "gender": None, "usage_frequency": None},
+    {"category": None, "skin_type": "combination", "gender": "male", "usage_frequency": "monthly"},
+    {"category": None, "skin_type": None, "gender": None, "usage_frequency": None},
+]
+
+def bench_rank(repeat):
+    df = normalize_catalog(load_clean_catalog())
+    tfidf_matrix = load_or_build_tfidf(CSV_PATH).matrix
+    index = FacetIndex(df)
+    price_range = (0, float(df['Price_IDR'].max()))
+
+    columns = score_columns(df)
+
+    # Waktu dengan timed_call: tracemalloc (measure) memperlambat kode yang banyak alokasi kecil
+    print("=== BENCHMARK RANK (rank_positions vs filter_user_preferences + hybrid_topk) ===")
+    for f in RANK_FILTERS:
+        positions = filter_positions(index, price_range=price_range, **f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            filtered = filter_user_preferences(df, price_range=price_range, **f)
+
+        _, t_new = timed_call(lambda: [rank_positions(df, tfidf_matrix, positions, k=10, columns=columns)
+                                       for _ in range(repeat)])
+        _, t_old = timed_call(lambda: [hybrid_topk(filtered, tfidf_matrix, k=10) for _ in range(repeat)])
+        label = ",".join(str(v) for v in f.values() if v is not None) or "all"
+        print(f"{label:<35} rows={len(positions):>6} rank_positions={t_new / repeat * 1000:8.2f} ms  hybrid_topk={t_old / repeat * 1000:8.2f} ms")
+
+def reference_topk(df, sim_scores, alpha, beta, gamma, k):
+    # Implementasi pandas lama (copy + kolom baru + sort penuh), dengan sort stabil
+    data = df.copy()
+    data['Rating_norm'] = data['Rating'] / 5
+    max_reviews = data['Number_of_Reviews'].max()
+    data['Popularity_norm'] = data['Number_of_Reviews'] / max_reviews if max_reviews > 0 else 0
+    data['Similarity_norm'] = sim_scores
+    data['weighted_score'] = (
+        alpha * data['Rating_norm'] +
+        beta  * data['Popularity_norm'] +
+        gamma * data['Similarity_norm']
+    )
+    return data.sort_values('weighted_score', ascending=False, kind='stable').head(k)
+
+def bench_topk(sizes, k):
+    base = normalize_catalog(load_clean_catalog())
+    print("=== BENCHMARK TOP-K (argpartition vs sort_values) ===")
+    print(f"{'rows':>10} {'sort_values_ms':>15} {'argpartition_ms':>16} {'speedup':>8}")
+    for n in sizes:
+        df = make_synthetic_catalog(base, n)
+        tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(df['combined_features'])
+        sim = mean_similarity(tfidf_matrix)
+
+        def numpy_core():
+            rating_norm, popularity_norm = component_scores(
+                df['Rating'].to_numpy(dtype=float), df['Number_of_Reviews'].to_numpy(dtype=float))
+            scores = weighted_scores(rating_norm, popularity_norm, sim, 0.4, 0.2, 0.4)
+            return df.iloc[topk_indices(scores, k)]
+
+        _, t_ref, _ = measure(reference_topk, df, sim, 0.4, 0.2, 0.4, k)
+        _, t_new, _ = measure(numpy_core)
+        print(f"{n:>10} {t_ref * 1000:>15.2f} {t_new * 1000:>16.2f} {t_ref / t_new:>7.1f}x")
+
+def bench_batch(grid_size, k):
+    # Import di sini karena eval.py ada di root project
+    from eval import evaluate_batch, evaluate_hybrid_topk
+
+    df = normalize_catalog(load_clean_catalog())
+    tfidf_matrix = load_or_build_tfidf(CSV_PATH).matrix
+    index = FacetIndex(df)
+    price_range = (0, float(df['Price_IDR'].max()))
+    values = np.linspace(0.1, 0.7, grid_size)
+    grid = list(itertools.product(values, values, values))
+
+    subsets = [filter_positions(index, price_range=price_range, **f) for f in RANK_FILTERS]
+    queries = [
+        {"positions": pos, "alpha": a, "beta": b, "gamma": g, "k": k}
+        for pos in subsets for a, b, g in grid
+    ]
+    print(f"=== BENCHMARK BATCH ({len(queries)} query: {len(subsets)} subset x {len(grid)} bobot) ===")
+
+    start = time.perf_counter()
+    batch = hybrid_topk_batch(df, tfidf_matrix, queries)
+    t_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    loop = [rank_positions(df, tfidf_matrix, q["positions"], q["alpha"], q["beta"], q["gamma"], k) for q in queries]
+    t_loop = time.perf_counter() - start
+    print(f"rank_positions per query : {t_loop:.3f} s")
+    print(f"hybrid_topk_batch        : {t_batch:.3f} s ({t_loop / t_batch:.1f}x)")
+
+    # Evaluasi (rekomendasi + ground truth) seperti tuning.py
+    start = time.perf_counter()
+    evals = evaluate_batch(df, tfidf_matrix, queries)
+    t_eval_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    eval_loop = [
+        evaluate_hybrid_topk(df.iloc[q["positions"]], tfidf_matrix, q["alpha"], q["beta"], q["gamma"], k)
+        for q in queries
+    ]
+    t_eval_loop = time.perf_counter() - start
+    print(f"evaluate_hybrid_topk loop: {t_eval_loop:.3f} s")
+    print(f"evaluate_batch           : {t_eval_batch:.3f} s ({t_eval_loop / t_eval_batch:.1f}x)")
+
+def bench_neighbors(sizes, n_neighbors, n_queries, method, n_probe, recall_sample):
+    base = normalize_catalog(load_clean_catalog())
+    print(f"=== BENCHMARK NEIGHBOR INDEX (method {method}, exact sampai {EXACT_MAX_ROWS} baris) ===")
+    for n in sizes:
+        df = make_synthetic_catalog(base, n)
+        tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(df['combined_features'])
+        index, t_build, m_build = measure(build_neighbors, tfidf_matrix, n_neighbors, method=method, n_probe=n_probe)
+        size_mb = (index.ids.nbytes + index.scores.nbytes) / 1024**2
+
+        rng = np.random.default_rng(0)
+        products = rng.integers(0, n, size=n_queries)
+        allowed = filter_positions(FacetIndex(df), None, "oily", None, None, (0, float(df['Price_IDR'].max())))
+
+        start = time.perf_counter()
+        for p in products:
+            index.similar(p, 10)
+        t_query = (time.perf_counter() - start) / n_queries
+
+        start = time.perf_counter()
+        for p in products:
+            index.similar(p, 10, allowed)
+        t_filtered = (time.perf_counter() - start) / n_queries
+
+        # Pembanding: cosine satu produk terhadap seluruh katalog
+        start = time.perf_counter()
+        for p in products[:20]:
+            cosine_similarity(tfidf_matrix[p], tfidf_matrix)
+        t_full = (time.perf_counter() - start) / 20
+
+        recall = neighbor_recall(index, tfidf_matrix, rng.choice(n, size=min(recall_sample, n), replace=False))
+        print(f"rows={n:>8} build={t_build:7.2f} s peak={m_build:8.1f} MB index={size_mb:7.1f} MB recall@{n_neighbors}={recall:.4f} "
+              f"query={t_query * 1e6:6.1f} us filtered={t_filtered * 1e6:6.1f} us full_scan={t_full * 1e3:7.2f} ms")
+
+def bench_preprocess(sizes, chunksize):
+    raw = pd.read_csv(RAW_CSV_PATH)
+    print("=== BENCHMARK PREPROCESSING (full vs streaming) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            src = RAW_CSV_PATH if n == len(raw) else os.path.join(tmp, f"raw_{n}.csv")
+            if src != RAW_CSV_PATH:
+                make_synthetic_catalog(raw, n).to_csv(src, index=False)
+            out_full = os.path.join(tmp, "full.csv")
+            out_stream = os.path.join(tmp, "stream.csv")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, t_full = timed_call(preprocess_and_save, src, out_full)
+                _, t_stream = timed_call(preprocess_and_save_streaming, src, out_stream, chunksize)
+                _, _, m_full = measure(preprocess_and_save, src, out_full)
+                _, _, m_stream = measure(preprocess_and_save_streaming, src, out_stream, chunksize)
+            print(f"rows={n:>8} full={t_full:6.2f} s ({n / t_full:>9,.0f} baris/s, peak {m_full:7.1f} MB) "
+                  f"streaming={t_stream:6.2f} s ({n / t_stream:>9,.0f} baris/s, peak {m_stream:7.1f} MB)")
+
+# Dijalankan di proses terpisah agar peak RSS (termasuk import pandas) tiap loader terukur terpisah
+LOAD_SCRIPT = """
+import json, os, resource, sys, time
+import pandas as pd
+from modules.columnar import columnar_path, load_columnar, normalize_catalog
+mode, csv_path, columns = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+start = time.perf_counter()
+if mode == "csv":
+    df = normalize_catalog(pd.read_csv(csv_path))
+    df = df if columns is None else df[columns]
+else:
+    df = load_columnar(columnar_path(csv_path), columns)
+elapsed = time.perf_counter() - start
+# VmHWM (bukan ru_maxrss) karena ru_maxrss ikut mewarisi RSS proses induk sebelum exec
+rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if os.path.exists("/proc/self/status"):
+    with open("/proc/self/status") as f:
+        rss_peak = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_peak / 1024,
+                  "frame_mb": df.memory_usage(deep=True).sum() / 1024**2}))
+"""
+
+def run_loader(mode, csv_path, columns=None):
+    output = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, mode, csv_path, json.dumps(columns)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def bench_catalog_load(sizes):
+    df = load_clean_catalog()
+    projection = FACET_COLUMNS + ["Product_Name", "Brand", "Rating", "Number_of_Reviews", "Price_IDR"]
+    print("=== BENCHMARK LOAD KATALOG (CSV + normalisasi vs kolumnar) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            csv_path = os.path.join(tmp, f"clean_{n}.csv")
+            make_synthetic_catalog(df, n).to_csv(csv_path, index=False)
+            _, t_build = timed_call(build_columnar, csv_path, "benchmark")
+            for label, columns in (("semua kolom", None), ("proyeksi", projection)):
+                csv_stats = run_loader("csv", csv_path, columns)
+                col_stats = run_loader("columnar", csv_path, columns)
+                print(f"rows={n:>8} {label:<11} "
+                      f"csv={csv_stats['seconds'] * 1000:8.1f} ms (peak rss {csv_stats['rss_mb']:7.1f} MB, frame {csv_stats['frame_mb']:7.1f} MB) "
+                      f"kolumnar={col_stats['seconds'] * 1000:7.1f} ms (peak rss {col_stats['rss_mb']:6.1f} MB, frame {col_stats['frame_mb']:6.1f} MB) "
+                      f"speedup={csv_stats['seconds'] / col_stats['seconds']:5.1f}x")
+            print(f"rows={n:>8} build kolumnar={t_build:.2f} s")
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+if sys.argv[1] == "eager":
+    # Seperti sebelum import sklearn dibuat lazy
+    import sklearn.feature_extraction.text, sklearn.metrics.pairwise, sklearn.preprocessing
+from modules.catalog import get_catalog
+from modules.image import dummy_image_bytes
+from modules.result_cache import canonical_query, run_query
+imported = time.perf_counter()
+catalog = get_catalog(sys.argv[2])
+loaded = time.perf_counter()
+_, top = run_query(catalog, canonical_query(catalog, "serum", product=int(sys.argv[3])))
+for name in top["Product_Name"]:
+    dummy_image_bytes(str(name))
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "load": loaded - imported, "query": done - loaded,
+                  "total": done - start, "sklearn": "sklearn" in sys.modules}))
+"""
+
+def run_startup(mode, csv_path, product):
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT, mode, csv_path, str(product)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def bench_startup(repeat):
+    # Proses baru per run: waktu import modul aplikasi + respons pertama (load katalog, query, gambar)
+    catalog = get_catalog(CSV_PATH)
+    product = int(filter_positions(catalog.facet_index, "serum", None, None, None, None)[0])
+    print(f"=== BENCHMARK STARTUP (proses baru, median {repeat} run) ===")
+    for mode in ("eager", "lazy"):
+        runs = [run_startup(mode, CSV_PATH, product) for _ in range(repeat)]
+        stats = {key: float(np.median([r[key] for r in runs])) for key in ("import", "load", "query", "total")}
+        print(f"sklearn {mode:<5}: import={stats['import'] * 1000:7.1f} ms load={stats['load'] * 1000:6.1f} ms "
+              f"respons pertama={stats['query'] * 1000:6.1f} ms total={stats['total'] * 1000:7.1f} ms "
+              f"(sklearn dimuat: {runs[0]['sklearn']})")
+
+    # Encoder ringan vs TfidfVectorizer.transform untuk seluruh teks katalog
+    from modules.model_store import load_vectorizer
+    from modules.tfidf_encoder import TfidfEncoder
+
+    artifact = load_or_build_tfidf(CSV_PATH)
+    texts = pd.read_csv(CSV_PATH, usecols=["combined_features"])["combined_features"]
+    _, t_encoder = timed_call(TfidfEncoder.from_artifact(artifact).transform, texts)
+    _, t_sklearn = timed_call(load_vectorizer(artifact).transform, texts)
+    print(f"transform {len(texts)} teks: TfidfEncoder={t_encoder * 1000:.1f} ms sklearn={t_sklearn * 1000:.1f} ms")
+
+def bench_ingest(batch_sizes):
+    raw = pd.read_csv(RAW_CSV_PATH)
+    clean_csv = os.path.abspath(CSV_PATH)
+    print("=== BENCHMARK INGEST INKREMENTAL vs BUILD ULANG PENUH ===")
+    for n in batch_sizes:
+        with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+            # Salinan data di folder sementara agar artefak repo tidak tersentuh
+            os.makedirs("data")
+            shutil.copy(clean_csv, CSV_PATH)
+            clear_catalog_cache()
+            get_catalog(CSV_PATH).neighbors
+
+            updates = raw.sample(n // 2, random_state=1).copy()
+            updates['Rating'] = 5.0
+            appends = raw.sample(n - n // 2, random_state=2).copy()
+            appends['Product_Name'] = [f"New Product {i}" for i in range(len(appends))]
+            deletes = raw.sample(max(1, n // 10), random_state=3)[['Product_Name', 'Brand']]
+
+            result = apply_changes(CSV_PATH, pd.concat([updates, appends]), deletes)
+
+            def full_rebuild():
+                with tempfile.TemporaryDirectory() as out:
+                    build_tfidf_artifact(CSV_PATH, out)
+                    build_neighbors(result.catalog.tfidf_matrix)
+                    FacetIndex(result.catalog.df)
+                    build_columnar(CSV_PATH, "benchmark", os.path.join(out, "columnar"))
+            _, t_full = timed_call(full_rebuild)
+
+            print(f"batch={n:>5} (+{result.appended} ~{result.updated} -{result.deleted} baris) "
+                  f"inkremental={result.seconds:6.2f} s full={t_full:6.2f} s refit={result.refit} "
+                  f"idf_drift={result.idf_drift:.4f}")
+    clear_catalog_cache()
+
+def render_page_legacy(names, image_dir):
+    # Jalur lama app.py: cek file, render + tulis jika belum ada, lalu Image.open
+    for name in names:
+        with Image.open(generate_dummy_image(name, image_dir)) as img:
+            img.load()
+
+def render_page_cached(names, image_dir):
+    for name in names:
+        dummy_image_bytes(name, image_dir=image_dir)
+
+def bench_images(cards, repeat, workers):
+    catalog = get_catalog(CSV_PATH)
+    names = [str(n) for n in rank_positions(catalog.df, catalog.tfidf_matrix, k=cards)['Product_Name']]
+    print(f"=== BENCHMARK GAMBAR ({cards} kartu, {len(set(names))} nama unik) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_dir = os.path.join(tmp, "legacy")
+        _, t_legacy_cold = timed_call(render_page_legacy, names, legacy_dir)
+        t_legacy_warm = min(timed_call(render_page_legacy, names, legacy_dir)[1] for _ in range(repeat))
+
+        empty_dir = os.path.join(tmp, "empty")
+        clear_image_cache()
+        _gradient.cache_clear()
+        _, t_cold = timed_call(render_page_cached, names, empty_dir)
+        t_warm = min(timed_call(render_page_cached, names, empty_dir)[1] for _ in range(repeat))
+        print(f"lama  : cold={t_legacy_cold * 1000:7.2f} ms warm={t_legacy_warm * 1000:7.2f} ms")
+        print(f"cache : cold={t_cold * 1000:7.2f} ms warm={t_warm * 1000:7.2f} ms "
+              f"(warm {t_legacy_warm / t_warm:,.0f}x lebih cepat)")
+
+        prerender_dir = os.path.join(tmp, "prerender")
+        all_names = catalog.df['Product_Name'].unique()
+        (rendered, total), t_pre = timed_call(prerender_images, all_names, prerender_dir, workers=workers)
+        print(f"pre-render katalog: {rendered}/{total} gambar dalam {t_pre:.2f} s ({workers} worker)")
+    clear_image_cache()
+
+def http_get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return response.status, dict(response.headers), json.loads(response.read())
+
+def bench_server(concurrency, n_requests):
+    from server import start_in_thread
+
+    catalog = get_catalog(CSV_PATH)
+    server, _ = start_in_thread()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    combos = facet_combinations(catalog.df)
+    paths = []
+    for category, skin_type, gender, usage in combos:
+        query = {"category": category, "skin_type": skin_type, "gender": gender, "usage_frequency": usage}
+        paths.append("/recommend?" + urlencode({k: v for k, v in query.items() if v is not None}))
+
+    print(f"=== BENCHMARK HTTP SERVICE ({n_requests} request /recommend, {len(paths)} kombinasi facet) ===")
+    rng = np.random.default_rng(42)
+    for workers in concurrency:
+        urls = [base + paths[i] for i in rng.integers(0, len(paths), size=n_requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            responses = list(pool.map(lambda url: (time.perf_counter(), http_get_json(url), time.perf_counter()), urls))
+        elapsed = time.perf_counter() - start
+        client_ms = np.array([(end - begin) * 1000 for begin, _, end in responses])
+        server_ms = np.array([float(headers["X-Response-Time-Ms"]) for _, (_, headers, _), _ in responses])
+        print(f"concurrency={workers:>3} throughput={n_requests / elapsed:7.1f} req/s "
+              f"client p50={np.percentile(client_ms, 50):6.2f} p99={np.percentile(client_ms, 99):7.2f} ms "
+              f"server p50={np.percentile(server_ms, 50):6.2f} p99={np.percentile(server_ms, 99):7.2f} ms")
+    server.shutdown()
+    server.server_close()
+
+def replay_queries(catalog, n_queries, seed=42, zipf=1.2):
+    # Distribusi query realistis: sedikit kombinasi facet populer (Zipf), sebagian
+    # dengan rentang harga dari slider
+    rng = np.random.default_rng(seed)
+    combos = facet_combinations(catalog.df)
+    popularity = rng.permutation(len(combos))
+    weights = 1.0 / (popularity + 1.0) ** zipf
+    picks = rng.choice(len(combos), size=n_queries, p=weights / weights.sum())
+    steps = int((catalog.price_max - catalog.price_min) // 5000)
+    queries = []
+    for i in picks:
+        category, skin_type, gender, usage = combos[i]
+        price_range = None
+        if rng.random() < 0.2:
+            low, high = np.sort(rng.integers(0, steps + 1, size=2))
+            price_range = (catalog.price_min + low * 5000.0, catalog.price_min + high * 5000.0)
+        k = 20 if all(x is None for x in combos[i]) else 10
+        queries.append(canonical_query(catalog, category, skin_type, gender, usage, price_range, k=k))
+    return queries
+
+def bench_cache(n_queries, cache_size, ttl):
+    catalog = get_catalog(CSV_PATH)
+    queries = replay_queries(catalog, n_queries)
+    print(f"=== BENCHMARK RESULT CACHE ({n_queries} query replay, {len(set(queries))} query unik, "
+          f"cache {cache_size} entri, ttl {ttl:.0f} s) ===")
+
+    cache = ResultCache(maxsize=cache_size, ttl=ttl)
+    for label, active in (("tanpa cache", None), ("dengan cache", cache)):
+        latencies = np.empty(n_queries)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            cached_query(catalog, query, active)
+            latencies[i] = (time.perf_counter() - start) * 1000
+        print(f"{label:<13}: p50={np.percentile(latencies, 50):7.3f} ms p99={np.percentile(latencies, 99):7.3f} ms "
+              f"total={latencies.sum() / 1000:6.2f} s")
+
+    print(f"statistik cache: {cache.stats()}")
+
+def bench_tracing(n_queries, n_calls):
+    # Overhead span tanpa trace aktif (kondisi produksi default) vs mode spans/profile
+    print(f"=== BENCHMARK OVERHEAD TRACING ({n_calls:,} panggilan span, {n_queries} query) ===")
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        pass
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        with tracing.span("x"):
+            pass
+    idle = time.perf_counter() - start
+    print(f"span tanpa trace aktif: {(idle - loop) / n_calls * 1e9:6.0f} ns/panggilan")
+
+    catalog = get_catalog(CSV_PATH)
+    queries = replay_queries(catalog, n_queries)
+    previous = tracing.get_mode()
+    try:
+        for mode in ("off", "spans", "profile"):
+            tracing.set_mode(mode)
+            latencies = np.empty(n_queries)
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                with tracing.start_trace("query", dump=False):
+                    run_query(catalog, query)
+                latencies[i] = (time.perf_counter() - start) * 1000
+            print(f"mode {mode:<8}: p50={np.percentile(latencies, 50):7.3f} ms p99={np.percentile(latencies, 99):7.3f} ms "
+                  f"total={latencies.sum() / 1000:6.2f} s")
+    finally:
+        tracing.set_mode(previous)
+
+def metric_cases(n_queries, seed=42):
+    # Pasangan (rekomendasi, ground truth) seperti eval.py: top-k Product_Name dari
+    # subset acak katalog yang sama, sehingga sebagian besar saling beririsan (ada duplikat nama)
+    from eval import evaluate_batch
+
+    catalog = get_catalog(CSV_PATH)
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(n_queries):
+        k = int(rng.choice([10, 20]))
+        positions = np.sort(rng.choice(len(catalog), size=int(rng.integers(k, 400)), replace=False))
+        queries.append({"positions": positions, "alpha": float(rng.uniform(0.1, 0.6)),
+                        "beta": float(rng.uniform(0.1, 0.6)), "gamma": float(rng.uniform(0.1, 0.6)), "k": k})
+    results = evaluate_batch(catalog.df, catalog.tfidf_matrix, queries)
+    return [r[4] for r in results], [r[3] for r in results], [q["k"] for q in queries]
+
+def bench_metrics(n_queries, repeat):
+    recoms, truths, ks = metric_cases(n_queries)
+    print(f"=== BENCHMARK METRIK RANKING ({n_queries} query, k 10/20) ===")
+
+    def scalar():
+        return [(precision_at_k(r, t, k), recall_at_k(r, t, k), ndcg_at_k(r, t, k)) for r, t, k in zip(recoms, truths, ks)]
+
+    encoded = encode_ids(recoms, truths)
+    k_array = np.array(ks)
+    timings = {}
+    for label, func in (("per query (lama)", scalar),
+                        ("batch + encode", lambda: ranking_metrics(recoms, truths, k_array)),
+                        ("batch (kode id)", lambda: ranking_metrics(*encoded, k_array))):
+        best = min(timed_call(func)[1] for _ in range(repeat))
+        timings[label] = best
+        print(f"{label:<17}: {best * 1000:9.2f} ms ({best / n_queries * 1e6:6.2f} us/query)")
+    base = timings["per query (lama)"]
+    print(f"speedup: {base / timings['batch + encode']:.1f}x (dengan encode), {base / timings['batch (kode id)']:.1f}x (kode id)")
+
+# RSS setelah load katalog di proses baru (artefak sudah dibangun proses induk)
+COMPACT_SCRIPT = """
+import json, sys, time
+def rss_kb(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field))
+from modules.catalog import catalog_memory, get_catalog
+from modules.result_cache import canonical_query, run_query
+before = rss_kb("VmRSS:")
+start = time.perf_counter()
+catalog = get_catalog(sys.argv[2], compact=sys.argv[1] == "compact")
+run_query(catalog, canonical_query(catalog))
+elapsed = time.perf_counter() - start
+report = catalog.memory_report() if sys.argv[1] == "compact" else catalog_memory(catalog)
+print(json.dumps({"seconds": elapsed, "rss_mb": (rss_kb("VmRSS:") - before) / 1024,
+                  "hwm_mb": rss_kb("VmHWM:") / 1024, "bytes_mb": report["total"] / 1024**2}))
+"""
+
+def run_compact(mode, csv_path):
+    # Dijalankan dari folder sementara: modul repo lewat PYTHONPATH
+    repo = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", COMPACT_SCRIPT, mode, csv_path],
+        check=True, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": repo},
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def bench_compact(sizes):
+    df = load_clean_catalog()
+    print("=== BENCHMARK KATALOG COMPACT (memori & waktu muat) ===")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+            os.makedirs("data")
+            make_synthetic_catalog(df, n).to_csv(CSV_PATH, index=False)
+            clear_catalog_cache()
+            catalog = get_catalog(CSV_PATH, compact=False)
+            # Pembanding = katalog kolumnar (teks sudah categorical), seperti deploy biasa
+            build_columnar(CSV_PATH, catalog.content_hash)
+            clear_catalog_cache()
+            catalog = get_catalog(CSV_PATH, compact=False)
+            compact, t_build = timed_call(CompactCatalog.from_catalog, catalog)
+
+            stats = {mode: run_compact(mode, CSV_PATH) for mode in ("catalog", "compact")}
+            for mode, s in stats.items():
+                print(f"rows={n:>8} {mode:<8}: load+query={s['seconds'] * 1000:8.1f} ms "
+                      f"rss +{s['rss_mb']:7.1f} MB (peak {s['hwm_mb']:7.1f} MB) komponen={s['bytes_mb']:7.1f} MB")
+            print(f"rows={n:>8} rasio komponen={stats['catalog']['bytes_mb'] / stats['compact']['bytes_mb']:.2f}x "
+                  f"rss={stats['catalog']['rss_mb'] / max(stats['compact']['rss_mb'], 1e-9):.2f}x "
+                  f"from_catalog={t_build * 1000:.1f} ms")
+
+            full_report = catalog_memory(catalog)
+            report = compact.memory_report()
+            tfidf = report["tfidf:data"] + report["tfidf:indices"] + report["tfidf:indptr"]
+            columns = sum(value for key, value in report.items() if key.startswith("column:"))
+            print(f"rows={n:>8} rincian MB: dataframe {full_report['dataframe'] / 1024**2:.1f} -> {columns / 1024**2:.1f}, "
+                  f"tfidf {full_report['tfidf'] / 1024**2:.1f} -> {tfidf / 1024**2:.1f}, "
+                  f"facet_index {report['facet_index'] / 1024**2:.1f}")
+    clear_catalog_cache()
+
+def bench_profiles(sizes, repeat):
+    # Similarity per profil fitur unik vs per produk, semua kombinasi facet (+ produk referensi)
+    df = load_clean_catalog()
+    print("=== BENCHMARK PROFIL FITUR UNIK (similarity per profil vs per produk) ===")
+    for n in sizes:
+        sample = normalize_catalog(make_synthetic_catalog(df, n) if n != len(df) else df)
+        if n == len(df):
+            tfidf_matrix = load_or_build_tfidf(CSV_PATH).matrix
+        else:
+            # Indeks kolom diurutkan seperti artefak model_store (fit_transform tidak urut)
+            tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(sample['combined_features'])
+            tfidf_matrix.sort_indices()
+        profiles, t_build = timed_call(build_profiles, tfidf_matrix)
+        index = FacetIndex(sample)
+        subsets = [filter_positions(index, *combo, None) for combo in facet_combinations(sample)]
+        subsets = [positions for positions in subsets if len(positions) > 0]
+        print(f"rows={n:>8} profil={profiles.n_profiles:>6} kompresi={profiles.compression:6.1f}x "
+              f"build={t_build * 1000:7.1f} ms subset={len(subsets)}")
+
+        for label, reference in (("mean", False), ("referensi", True)):
+            # Tahap similarity saja: semua subset dan seluruh katalog
+            for scope, scope_subsets in (("semua subset", subsets), ("seluruh katalog", [None])):
+                def per_product():
+                    for positions in scope_subsets:
+                        subset = tfidf_matrix if positions is None else tfidf_matrix[positions]
+                        similarity_scores(subset, 0 if reference else None)
+
+                def per_profile():
+                    for positions in scope_subsets:
+                        profiles.similarity(positions, 0 if reference else None)
+
+                t_old = min(timed_call(per_product)[1] for _ in range(repeat)) / len(scope_subsets)
+                t_new = min(timed_call(per_profile)[1] for _ in range(repeat)) / len(scope_subsets)
+                print(f"rows={n:>8} {label:<9} {scope:<15}: per produk={t_old * 1000:8.3f} ms "
+                      f"per profil={t_new * 1000:8.3f} ms ({t_old / t_new:5.1f}x)")
+
+THRESHOLD_WEIGHTS = [(0.4, 0.2, 0.4), (0.8, 0.1, 0.1), (0.1, 0.8, 0.1), (0.1, 0.1, 0.8), (0.34, 0.33, 0.33)]
+
+def bench_threshold(sizes, n_queries, k):
+    # Threshold algorithm vs full scan: subset besar (tanpa filter, 1 facet, 2 facet) x bobot,
+    # mean similarity & produk referensi, plus replay query realistis (fallback otomatis)
+    df = load_clean_catalog()
+    artifact = load_or_build_tfidf(CSV_PATH)
+    print(f"=== BENCHMARK THRESHOLD ALGORITHM TOP-{k} vs FULL SCAN ===")
+    for n in sizes:
+        # Baris sintetis = baris asli yang di-sampling ulang, TF-IDF ikut baris asli
+        idx = np.random.default_rng(42).integers(0, len(df), size=n)
+        sample = normalize_catalog(df.iloc[idx].reset_index(drop=True))
+        catalog = Catalog(None, sample, artifact.matrix[idx], f"synthetic-{n}", None)
+        index, t_build = timed_call(lambda: catalog.topk_index)
+        _, t_lists = timed_call(index._build_lists)
+        print(f"rows={n:>8} build index={t_build * 1000:.1f} ms (termasuk profil), "
+              f"daftar terurut={t_lists * 1000:.1f} ms (saat query threshold pertama)")
+
+        facets = catalog.facet_index
+        subsets = {
+            "tanpa filter": None,
+            "1 facet": filter_positions(facets, "serum", None, None, None, None),
+            "2 facet": filter_positions(facets, None, "oily", "female", None, None),
+        }
+        for label, positions in subsets.items():
+            size = n if positions is None else len(positions)
+            for reference in (None, int(positions[len(positions) // 2]) if positions is not None else n // 2):
+                timings = {"threshold": [], "scan": []}
+                examined = []
+                for alpha, beta, gamma in THRESHOLD_WEIGHTS:
+                    for force in timings:
+                        # Waktu inti seleksi top-k (tanpa DataFrame pemenang, sama di kedua jalur)
+                        timings[force].append(min(timed_call(index.search, positions, alpha, beta, gamma, k,
+                                                             reference, force)[1] for _ in range(3)))
+                    examined.append(index.search(positions, alpha, beta, gamma, k, reference, "threshold")[4].rows_examined)
+                t_ta, t_scan = np.median(timings["threshold"]), np.median(timings["scan"])
+                print(f"rows={n:>8} {label:<12} ({size:>8}) {'referensi' if reference is not None else 'mean':<9}: "
+                      f"scan={t_scan * 1000:7.2f} ms threshold={t_ta * 1000:7.2f} ms ({t_scan / t_ta:5.1f}x) "
+                      f"dibaca {np.mean(examined) / size:6.1%} (min {min(examined) / size:.1%}, max {max(examined) / size:.1%})")
+
+        # Replay query realistis: kebanyakan filter selektif -> fallback full scan
+        queries = replay_queries(catalog, n_queries)
+        before = index.stats()
+        t_auto = t_rank = 0.0
+        for query in queries:
+            positions = filter_positions(facets, query.category, query.skin_type, query.gender,
+                                         query.usage_frequency, query.price_range)
+            _, seconds = timed_call(rank_positions, sample, catalog.tfidf_matrix, positions, query.alpha,
+                                    query.beta, query.gamma, query.k, query.product, profiles=catalog.profiles)
+            t_rank += seconds
+            _, seconds = timed_call(index.rank, sample, positions, query.alpha, query.beta, query.gamma, query.k,
+                                    query.product)
+            t_auto += seconds
+        after = index.stats()
+        n_ta = after["threshold_queries"] - before["threshold_queries"]
+        print(f"rows={n:>8} replay {len(queries)} query: rank_positions={t_rank / len(queries) * 1000:6.3f} ms "
+              f"otomatis={t_auto / len(queries) * 1000:6.3f} ms/query, threshold dipakai {n_ta}/{len(queries)}")
+
+def bench_views(n_queries, depth):
+    # Materialized view per kombinasi facet: ukuran, waktu build, lookup vs live pada replay query
+    catalog = get_catalog(CSV_PATH, compact=False)
+    views, t_build = timed_call(build_views, catalog, depth)
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, VIEW_FILE)
+        np.savez(target, **view_arrays(views))
+        file_kb = os.path.getsize(target) / 1024
+    print(f"=== BENCHMARK MATERIALIZED VIEW TOP-K ({len(views)} kombinasi facet, depth {depth}) ===")
+    print(f"build={t_build:.2f} s entri={len(views.positions)} memori={views.nbytes() / 1024:.1f} KB file={file_kb:.1f} KB")
+
+    queries = replay_queries(catalog, n_queries)
+    served = []
+    live = []
+    for query in queries:
+        result, seconds = timed_call(views.lookup, catalog, query)
+        _, t_live = timed_call(live_query, catalog, query)
+        if result is not None:
+            served.append(seconds)
+            live.append(t_live)
+    print(f"{len(served)}/{len(queries)} query dilayani view (sisanya rentang harga lain -> live)")
+    if served:
+        print(f"view lookup: p50={np.percentile(served, 50) * 1000:6.3f} ms p99={np.percentile(served, 99) * 1000:6.3f} ms | "
+              f"live: p50={np.percentile(live, 50) * 1000:6.3f} ms p99={np.percentile(live, 99) * 1000:6.3f} ms "
+              f"({np.median(live) / np.median(served):.1f}x)")
+
+def _private_memory_mb(pid):
+    # Memori privat proses (Linux, smaps_rollup): tanpa halaman yang masih dibagi dengan
+    # proses induk setelah fork, None jika tidak tersedia
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:"))) / 1024
+    except OSError:
+        return None
+
+def bench_sharding(n_rows, shard_counts, n_queries, by):
+    # Scatter-gather di n proses worker vs jalur satu proses (filter_positions + rank_positions(profiles=...))
+    df = load_clean_catalog()
+    artifact = load_or_build_tfidf(CSV_PATH)
+    idx = np.random.default_rng(42).integers(0, len(df), size=n_rows)
+    sample = normalize_catalog(df.iloc[idx].reset_index(drop=True))
+    catalog = Catalog(None, sample, artifact.matrix[idx], f"synthetic-{n_rows}", None)
+    _ = catalog.profiles, catalog.facet_index
+    queries = replay_queries(catalog, n_queries)
+    # Query tanpa filter & dengan produk referensi: kasus terberat untuk satu proses
+    rng = np.random.default_rng(7)
+    queries += [canonical_query(catalog, k=20, product=int(p)) for p in rng.integers(0, n_rows, size=10)]
+    queries += [canonical_query(catalog, k=20) for _ in range(10)]
+
+    print(f"=== BENCHMARK SHARDING SCATTER-GATHER ({n_rows} baris, partisi {by}, {len(queries)} query, "
+          f"{os.cpu_count()} CPU) ===")
+    single = []
+    for query in queries:
+        single.append(timed_call(lambda: rank_positions(
+            sample, catalog.tfidf_matrix,
+            filter_positions(catalog.facet_index, query.category, query.skin_type, query.gender,
+                             query.usage_frequency, query.price_range),
+            query.alpha, query.beta, query.gamma, query.k, query.product, profiles=catalog.profiles))[1])
+    print(f"satu proses     : p50={np.percentile(single, 50) * 1000:7.2f} ms p99={np.percentile(single, 99) * 1000:7.2f} ms "
+          f"total={sum(single):6.2f} s")
+
+    for n_shards in shard_counts:
+        with ShardedCatalog.split(sample, catalog.tfidf_matrix, n_shards, by) as sharded:
+            timings = [timed_call(sharded.run_query, query)[1] for query in queries]
+            private = [_private_memory_mb(shard.process.pid) for shard in sharded.shards]
+            memory = f" memori privat worker maks={max(private):6.1f} MB" if None not in private else ""
+            print(f"{n_shards} shard{'' if n_shards == 1 else 's':<6}: p50={np.percentile(timings, 50) * 1000:7.2f} ms "
+                  f"p99={np.percentile(timings, 99) * 1000:7.2f} ms total={sum(timings):6.2f} s "
+                  f"({sum(single) / sum(timings):4.1f}x) build={sharded.build_seconds:5.1f} s "
+                  f"ukuran shard {sharded.sizes.min()}-{sharded.sizes.max()}{memory}")
+
+def bench_preference(checkpoints, n_measure, k):
+    # Latency per interaksi like/dislike saat riwayat bertambah: update inkremental O(nnz)
+    # vs hitung ulang profil dari seluruh riwayat, plus re-ranking dengan profil
+    catalog = get_catalog(CSV_PATH, compact=False)
+    matrix = catalog.tfidf_matrix
+    rng = np.random.default_rng(42)
+    profile = PreferenceProfile.for_catalog(catalog)
+    history = []
+    query = canonical_query(catalog, k=k)
+
+    def interact():
+        # 70% like, 30% dislike
+        position, liked = int(rng.integers(len(catalog.df))), rng.random() < 0.7
+        history.append((position, LIKE_WEIGHT if liked else DISLIKE_WEIGHT))
+        return profile.like if liked else profile.dislike, position
+
+    print(f"=== BENCHMARK PROFIL PREFERENSI SESI ({len(catalog.df)} produk, decay {profile.decay}, "
+          f"top-{k} tanpa filter) ===")
+    for size in checkpoints:
+        while len(history) < size:
+            update, position = interact()
+            update(matrix, position)
+
+        # Update inkremental: median n_measure interaksi berikutnya
+        updates = []
+        for _ in range(n_measure):
+            update, position = interact()
+            updates.append(timed_call(update, matrix, position)[1])
+        expected, t_replay = timed_call(replay_profile, matrix, history, profile.decay)
+        diff = float(np.abs(profile.vector() - expected).max())
+        ranks = [timed_call(personalized_query, catalog, query, profile)[1] for _ in range(20)]
+        print(f"riwayat={size:>6}: update={np.median(updates) * 1e6:7.1f} us "
+              f"hitung ulang={t_replay * 1000:9.2f} ms ranking={np.median(ranks) * 1000:6.2f} ms "
+              f"selisih vs hitung ulang={diff:.1e}")
+
+    # Ranking dengan profil (satu mat-vec) vs cosine per produk yang disukai lalu dirata-rata
+    liked = sorted(profile.liked)[:100]
+    _, t_matvec = timed_call(personalized_query, catalog, query, profile)
+    _, t_per_product = timed_call(lambda: [similarity_scores(matrix, position) for position in liked])
+    print(f"similarity {len(liked)} produk disukai: cosine per produk={t_per_product * 1000:.2f} ms "
+          f"vs profil (filter+rank)={t_matvec * 1000:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sistem rekomendasi kosmetik")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_sim = sub.add_parser("similarity", help="mean similarity centroid vs pairwise")
+    p_sim.add_argument("--sizes", type=int, nargs="+", default=[1000, 15000, 150000])
+
+    p_filter = sub.add_parser("filter", help="FacetIndex vs filter_user_preferences (sampel kombinasi facet)")
+    p_filter.add_argument("--price-bands", type=int, default=2)
+    p_filter.add_argument("--queries", type=int, default=500, help="0 = semua kombinasi")
+
+    p_rank = sub.add_parser("rank", help="latency rank_positions vs filter_user_preferences + hybrid_topk")
+    p_rank.add_argument("--repeat", type=int, default=5)
+
+    p_topk = sub.add_parser("topk", help="seleksi top-k numpy (argpartition) vs sort_values")
+    p_topk.add_argument("--sizes", type=int, nargs="+", default=[15000, 150000, 1500000])
+    p_topk.add_argument("--k", type=int, default=20)
+
+    p_batch = sub.add_parser("batch", help="hybrid_topk_batch vs loop per query")
+    p_batch.add_argument("--grid-size", type=int, default=4)
+    p_batch.add_argument("--k", type=int, default=10)
+
+    p_nn = sub.add_parser("neighbors", help="build & query index tetangga terdekat")
+    p_nn.add_argument("--sizes", type=int, nargs="+", default=[15000, 50000, 150000])
+    p_nn.add_argument("--n-neighbors", type=int, default=50)
+    p_nn.add_argument("--queries", type=int, default=2000)
+    p_nn.add_argument("--method", choices=NEIGHBOR_METHODS, default="auto")
+    p_nn.add_argument("--n-probe", type=int, default=N_PROBE)
+    p_nn.add_argument("--recall-sample", type=int, default=500)
+
+    p_pre = sub.add_parser("preprocess", help="preprocess_and_save vs versi streaming")
+    p_pre.add_argument("--sizes", type=int, nargs="+", default=[15000, 150000])
+    p_pre.add_argument("--chunksize", type=int, default=5000)
+
+    p_load = sub.add_parser("catalog-load", help="waktu load & RSS: CSV vs katalog kolumnar")
+    p_load.add_argument("--sizes", type=int, nargs="+", default=[15000, 150000])
+
+    p_ingest = sub.add_parser("ingest", help="ingest inkremental vs build ulang penuh + cek konsistensi")
+    p_ingest.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+
+    p_img = sub.add_parser("images", help="render gambar halaman rekomendasi: jalur lama vs cache memori")
+    p_img.add_argument("--cards", type=int, default=20)
+    p_img.add_argument("--repeat", type=int, default=5)
+    p_img.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    p_http = sub.add_parser("server", help="service HTTP di localhost: cek hasil + throughput & latency")
+    p_http.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    p_http.add_argument("--requests", type=int, default=500)
+
+    p_cache = sub.add_parser("cache", help="replay query: latency p50/p99 dengan & tanpa result cache")
+    p_cache.add_argument("--queries", type=int, default=5000)
+    p_cache.add_argument("--cache-size", type=int, default=1024)
+    p_cache.add_argument("--ttl", type=float, default=600.0)
+
+    p_trace = sub.add_parser("tracing", help="overhead span tracing: mati vs spans vs profile")
+    p_trace.add_argument("--queries", type=int, default=500)
+    p_trace.add_argument("--calls", type=int, default=1_000_000)
+
+    p_metrics = sub.add_parser("metrics", help="metrik ranking batch (ranking_metrics) vs per query")
+    p_metrics.add_argument("--queries", type=int, default=10000)
+    p_metrics.add_argument("--repeat", type=int, default=3)
+
+    p_startup = sub.add_parser("startup", help="waktu import & respons pertama: sklearn eager vs lazy")
+    p_startup.add_argument("--repeat", type=int, default=5)
+
+    p_compact = sub.add_parser("compact", help="memori katalog biasa vs CompactCatalog")
+    p_compact.add_argument("--sizes", type=int, nargs="+", default=[15000, 1500000])
+
+    p_profiles = sub.add_parser("profiles", help="similarity per profil fitur unik vs per produk")
+    p_profiles.add_argument("--sizes", type=int, nargs="+", default=[15000, 150000])
+    p_profiles.add_argument("--repeat", type=int, default=3)
+
+    p_threshold = sub.add_parser("threshold", help="top-k threshold algorithm vs full scan + baris yang dibaca")
+    p_threshold.add_argument("--sizes", type=int, nargs="+", default=[15000, 150000, 1500000])
+    p_threshold.add_argument("--queries", type=int, default=500)
+    p_threshold.add_argument("--k", type=int, default=10)
+
+    p_views = sub.add_parser("views", help="materialized view top-k per kombinasi facet vs live")
+    p_views.add_argument("--queries", type=int, default=2000)
+    p_views.add_argument("--depth", type=int, default=100)
+
+    p_shard = sub.add_parser("sharding", help="katalog ter-shard scatter-gather (1/2/4/8 proses) vs satu proses")
+    p_shard.add_argument("--rows", type=int, default=2_000_000)
+    p_shard.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    p_shard.add_argument("--queries", type=int, default=200)
+    p_shard.add_argument("--by", choices=["hash", "category"], default="hash")
+
+    p_pref = sub.add_parser("preference", help="latency update profil like/dislike vs panjang riwayat")
+    p_pref.add_argument("--checkpoints", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    p_pref.add_argument("--measure", type=int, default=200)
+    p_pref.add_argument("--k", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "similarity":
+        bench_similarity(args.sizes)
+    elif args.command == "filter":
+        bench_filter(args.price_bands, args.queries)
+    elif args.command == "rank":
+        bench_rank(args.repeat)
+    elif args.command == "topk":
+        bench_topk(args.sizes, args.k)
+    elif args.command == "batch":
+        bench_batch(args.grid_size, args.k)
+    elif args.command == "neighbors":
+        bench_neighbors(args.sizes, args.n_neighbors, args.queries, args.method, args.n_probe, args.recall_sample)
+    elif args.command == "preprocess":
+        bench_preprocess(args.sizes, args.chunksize)
+    elif args.command == "catalog-load":
+        bench_catalog_load(args.sizes)
+    elif args.command == "ingest":
+        bench_ingest(args.batch_sizes)
+    elif args.command == "images":
+        bench_images(args.cards, args.repeat, args.workers)
+    elif args.command == "server":
+        bench_server(args.concurrency, args.requests)
+    elif args.command == "cache":
+        bench_cache(args.queries, args.cache_size, args.ttl)
+    elif args.command == "tracing":
+        bench_tracing(args.queries, args.calls)
+    elif args.command == "metrics":
+        bench_metrics(args.queries, args.repeat)
+    elif args.command == "startup":
+        bench_startup(args.repeat)
+    elif args.command == "compact":
+        bench_compact(args.sizes)
+    elif args.command == "profiles":
+        bench_profiles(args.sizes, args.repeat)
+    elif args.command == "threshold":
+        bench_threshold(args.sizes, args.queries, args.k)
+    elif args.command == "views":
+        bench_views(args.queries, args.depth)
+    elif args.command == "sharding":
+        bench_sharding(args.rows, args.shards, args.queries, args.by)
+    elif args.command == "preference":
+        bench_preference(args.checkpoints, args.measure, args.k)
+
+if __name__ == "__main__":
+    main()
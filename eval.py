@@ -1,9 +1,8 @@
-import pandas as pd
 import numpy as np
-from modules.recommendation import hybrid_topk
-from evaluasi_metrik import precision_at_k, recall_at_k, ndcg_at_k
+from modules.recommendation import hybrid_topk, hybrid_topk_batch
+from evaluasi_metrik import precision_at_k, recall_at_k, ndcg_at_k, ranking_metrics
 from modules.user_filter import filter_user_preferences
-from sklearn.feature_extraction.text import TfidfVectorizer
+from modules.catalog import get_catalog
 
 def evaluate_hybrid_topk(df, tfidf_matrix, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None):
     """
@@ -24,7 +23,7 @@ def evaluate_hybrid_topk(df, tfidf_matrix, alpha=0.4, beta=0.2, gamma=0.4, k=10,
 
     # Ground truth internal (tanpa similarity)
     data['weighted_score'] = alpha*data['Rating_norm'] + beta*data['Popularity_norm'] + 0*gamma
-    topk_ground_truth = data.sort_values('weighted_score', ascending=False).head(k)['Product_Name'].tolist()
+    topk_ground_truth = data.sort_values('weighted_score', ascending=False, kind='stable').head(k)['Product_Name'].tolist()
 
     # Top-k rekomendasi hybrid
     topk_recom_df = hybrid_topk(df, tfidf_matrix, alpha=alpha, beta=beta, gamma=gamma, k=k, user_index=user_index)
@@ -37,34 +36,46 @@ def evaluate_hybrid_topk(df, tfidf_matrix, alpha=0.4, beta=0.2, gamma=0.4, k=10,
 
     return precision, recall, ndcg, topk_ground_truth, topk_recom
 
+def evaluate_batch(df, tfidf_matrix, queries):
+    """
+    Evaluasi banyak konfigurasi sekaligus lewat hybrid_topk_batch.
+
+    queries: list dict seperti hybrid_topk_batch (positions, alpha, beta, gamma, k).
+    Ground truth tiap query adalah query yang sama dengan gamma=0
+    (rating+popularity saja), identik dengan evaluate_hybrid_topk.
+    Metrik semua query dihitung sekaligus dengan ranking_metrics.
+
+    Returns:
+        list tuple (precision, recall, ndcg, ground_truth, rekomendasi) per query
+    """
+    truth_queries = [dict(q, gamma=0.0) for q in queries]
+    ranked = hybrid_topk_batch(df, tfidf_matrix, queries + truth_queries)
+
+    recoms, truths = [], []
+    for recom_df, truth_df in zip(ranked[:len(queries)], ranked[len(queries):]):
+        # Subset kosong -> metrik 0 dan list kosong
+        recoms.append([] if recom_df.empty else recom_df['Product_Name'].tolist())
+        truths.append([] if recom_df.empty else truth_df['Product_Name'].tolist())
+
+    metrics = ranking_metrics(recoms, truths, np.array([q.get('k', 10) for q in queries]))
+    return [
+        (float(p), float(r), float(n), truth, recom)
+        for p, r, n, truth, recom in zip(*metrics, truths, recoms)
+    ]
+
 if __name__ == "__main__":
-    # Load dataset
-    df = pd.read_csv("data/skincare_products_clean.csv")
-
-    # Normalisasi teks
-    for col in ['Category','Skin_Type','Gender','Usage_Frequency','Product_Name','Brand','Ingredients']:
-        if col in df.columns:
-            df[col] = df[col].fillna('').astype(str).str.lower().str.strip()
-        else:
-            df[col] = ''
-
-    # Price numeric
-    if 'Price_IDR' in df.columns:
-        df['Price_IDR'] = pd.to_numeric(df['Price_IDR'], errors='coerce').fillna(0)
-    else:
-        df['Price_IDR'] = 0
-
-    # TF-IDF matrix
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(df['combined_features'])
+    # Load katalog (teks sudah dinormalisasi, TF-IDF dari artefak)
+    catalog = get_catalog("data/skincare_products_clean.csv")
+    df = catalog.df
+    tfidf_matrix = catalog.tfidf_matrix
 
     alpha, beta, gamma = 0.4, 0.2, 0.4
 
     # ===== Evaluasi Global Top-20 =====
     top_k_global = 20
-    precision_g, recall_g, ndcg_g, top_sys_g, top_recom_g = evaluate_hybrid_topk(
-        df, tfidf_matrix, alpha, beta, gamma, k=top_k_global
-    )
+    precision_g, recall_g, ndcg_g, top_sys_g, top_recom_g = evaluate_batch(
+        df, tfidf_matrix, [{"positions": None, "alpha": alpha, "beta": beta, "gamma": gamma, "k": top_k_global}]
+    )[0]
     print("\n=== Evaluasi Global Top-20 ===")
     print(f"Precision@{top_k_global}: {precision_g:.4f}")
     print(f"Recall@{top_k_global}: {recall_g:.4f}")
@@ -82,10 +93,7 @@ if __name__ == "__main__":
         {"category":None,"skin_type":None,"gender":None,"usage_frequency":None}, # filter semua kosong
     ]
 
-    all_precisions = []
-    all_recalls = []
-    all_ndcgs = []
-
+    queries = []
     for f in filter_options:
         filtered_df = filter_user_preferences(
             df,
@@ -101,11 +109,13 @@ if __name__ == "__main__":
 
         # batasi top_k jika produk kurang dari k
         k_actual = min(10, len(filtered_df))
-        precision, recall, ndcg, _, _ = evaluate_hybrid_topk(filtered_df, tfidf_matrix,
-                                                            alpha, beta, gamma, k=k_actual)
-        all_precisions.append(precision)
-        all_recalls.append(recall)
-        all_ndcgs.append(ndcg)
+        queries.append({"positions": filtered_df.index.to_numpy(), "alpha": alpha, "beta": beta, "gamma": gamma, "k": k_actual})
+
+    # Semua kombinasi filter dinilai dalam satu batch
+    batch_results = evaluate_batch(df, tfidf_matrix, queries)
+    all_precisions = [r[0] for r in batch_results]
+    all_recalls = [r[1] for r in batch_results]
+    all_ndcgs = [r[2] for r in batch_results]
 
     # Rata-rata metrik untuk semua kombinasi filter
     avg_precision = sum(all_precisions)/len(all_precisions)
@@ -1,3 +1,6 @@
+from collections import namedtuple
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 
@@ -38,3 +41,137 @@ def ndcg_at_k(recommended_ids, relevant_ids, k):
     ideal_dcg = sum(1 / np.log2(i + 2) for i in range(ideal_k))
 
     return dcg / ideal_dcg if ideal_dcg > 0 else 0.0
+
+# ====== Versi batch (array) ======
+
+PAD = -1
+GAINS = ('linear', 'exponential')
+
+RankingMetrics = namedtuple("RankingMetrics", ["precision", "recall", "ndcg"])
+
+@lru_cache(maxsize=16)
+def discount_table(k):
+    # (diskon per posisi, ideal DCG biner: ideal[n] = jumlah n diskon pertama)
+    # Diskon dihitung per skalar dengan ekspresi yang sama seperti ndcg_at_k
+    discounts = np.array([1 / np.log2(i + 2) for i in range(k)], dtype=float)
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])
+    discounts.flags.writeable = False
+    ideal.flags.writeable = False
+    return discounts, ideal
+
+def _pad_codes(codes, lengths, width):
+    matrix = np.full((len(lengths), width), PAD, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    cols = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix[rows, cols] = codes
+    return matrix
+
+def encode_ids(recommended, relevant):
+    # list of list id (hashable apa saja) -> dua matrix kode integer dengan PAD
+    rec_lengths = np.array([len(ids) for ids in recommended], dtype=np.int64)
+    rel_lengths = np.array([len(ids) for ids in relevant], dtype=np.int64)
+    values = [pid for ids in recommended for pid in ids] + [pid for ids in relevant for pid in ids]
+    codes, _ = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    n_rec = int(rec_lengths.sum())
+    return (
+        _pad_codes(codes[:n_rec], rec_lengths, int(rec_lengths.max(initial=0))),
+        _pad_codes(codes[n_rec:], rel_lengths, int(rel_lengths.max(initial=0))),
+    )
+
+def _pad_grades(grades, width):
+    lengths = np.array([len(g) for g in grades], dtype=np.int64)
+    matrix = np.zeros((len(grades), width), dtype=float)
+    mask = np.arange(width) < lengths[:, None]
+    matrix[mask] = np.concatenate([np.asarray(g, dtype=float) for g in grades]) if len(grades) else []
+    return matrix
+
+def ranking_metrics(recommended, relevant, k, grades=None, gain='linear'):
+    """
+    Precision, recall & NDCG untuk banyak query sekaligus.
+
+    recommended : matrix (Q x w) id rekomendasi berurutan, atau list of list
+    relevant    : matrix (Q x m) id ground truth, atau list of list
+    k           : int, atau array (Q,) k per query
+    grades      : opsional, matrix (Q x m) nilai relevansi bertingkat sejajar
+                  dengan relevant (None = biner, semua relevan bernilai 1)
+    gain        : 'linear' (gain = grade) atau 'exponential' (2^grade - 1)
+
+    Matrix id berisi kode integer >= 0 dengan PAD (-1) untuk baris yang lebih
+    pendek; list of list (id apa saja, mis. Product_Name) dikodekan otomatis
+    dengan encode_ids.
+
+    Untuk relevansi biner hasilnya identik (bit per bit) dengan precision_at_k,
+    recall_at_k dan ndcg_at_k per query, termasuk perilakunya:
+    - precision/recall menghitung id unik yang cocok; penyebut precision
+      min(k, panjang rekomendasi), penyebut recall panjang relevant (termasuk duplikat)
+    - DCG menghitung setiap posisi yang cocok (duplikat ikut dihitung), ideal
+      DCG sampai min(len(relevant), k)
+    - relevant kosong -> 0; rekomendasi kosong juga 0 (versi per query error
+      pembagian nol)
+
+    Diskon 1/log2(i+2) diambil dari tabel yang dihitung sekali (discount_table),
+    DCG dijumlahkan berurutan (cumsum) seperti loop aslinya.
+    """
+    if gain not in GAINS:
+        raise ValueError(f"gain harus salah satu dari {GAINS}, bukan {gain!r}")
+    if not isinstance(recommended, np.ndarray) or not isinstance(relevant, np.ndarray):
+        recommended, relevant = encode_ids(recommended, relevant)
+    if grades is not None and not isinstance(grades, np.ndarray):
+        grades = _pad_grades(grades, relevant.shape[1])
+
+    n_queries = recommended.shape[0]
+    k = np.broadcast_to(np.asarray(k, dtype=np.int64), (n_queries,))
+    width = min(recommended.shape[1], int(k.max(initial=0)))
+    rec = recommended[:, :width]
+
+    n_rec = (recommended != PAD).sum(axis=1)
+    n_rel = (relevant != PAD).sum(axis=1)
+    in_k = (np.arange(width) < k[:, None]) & (rec != PAD)
+
+    # Key unik per (query, id) supaya keanggotaan dicek untuk semua query sekaligus
+    n_ids = int(max(recommended.max(initial=PAD), relevant.max(initial=PAD))) + 1
+    row_offset = np.arange(n_queries, dtype=np.int64)[:, None] * n_ids
+    rel_valid = relevant != PAD
+    rel_keys = (row_offset + relevant)[rel_valid]
+    rec_keys = np.where(in_k, row_offset + rec, -1)
+    hit = in_k & np.isin(rec_keys, rel_keys)
+
+    # --- Precision & recall: id unik yang cocok ---
+    unique_hits = np.bincount(np.unique(rec_keys[hit]) // max(n_ids, 1), minlength=n_queries)
+    has_rel = n_rel > 0
+    denom = np.minimum(k, n_rec)
+    precision = np.divide(unique_hits, denom, out=np.zeros(n_queries), where=has_rel & (denom > 0))
+    recall = np.divide(unique_hits, n_rel, out=np.zeros(n_queries), where=has_rel)
+
+    # --- NDCG ---
+    ideal_width = min(int(k.max(initial=0)), relevant.shape[1])
+    discounts, ideal_binary = discount_table(max(width, ideal_width))
+    last = np.minimum(k, width) - 1
+    rows = np.arange(n_queries)
+    ideal_n = np.minimum(n_rel, k)
+
+    if grades is None:
+        gains = hit.astype(float)
+        ideal = ideal_binary[ideal_n]
+    else:
+        grades = np.where(rel_valid, grades, 0.0)
+        if gain == 'exponential':
+            grades = np.exp2(grades) - 1
+        # Grade tertinggi per (query, id) jika id muncul lebih dari sekali
+        order = np.lexsort((grades[rel_valid], rel_keys))
+        keys_sorted = rel_keys[order]
+        last_of_key = np.r_[keys_sorted[1:] != keys_sorted[:-1], True]
+        key_table, grade_table = keys_sorted[last_of_key], grades[rel_valid][order][last_of_key]
+        gains = np.where(hit, grade_table[np.searchsorted(key_table, rec_keys).clip(max=len(key_table) - 1)], 0.0)
+
+        ideal_gains = -np.sort(-grades, axis=1)[:, :ideal_width]
+        ideal_gains = np.where(np.arange(ideal_width) < ideal_n[:, None], ideal_gains, 0.0)
+        ideal_cum = np.cumsum(ideal_gains * discounts[:ideal_width], axis=1)
+        ideal = np.where(ideal_n > 0, ideal_cum[rows, np.maximum(ideal_n - 1, 0)] if ideal_width else 0.0, 0.0)
+
+    # cumsum = penjumlahan berurutan seperti loop dcg += ... (tambah 0.0 tidak mengubah nilai)
+    dcg_cum = np.cumsum(gains * discounts[:width], axis=1)
+    dcg = np.where(last >= 0, dcg_cum[rows, np.maximum(last, 0)] if width else 0.0, 0.0)
+    ndcg = np.divide(dcg, ideal, out=np.zeros(n_queries), where=has_rel & (ideal > 0))
+
+    return RankingMetrics(precision, recall, ndcg)
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+from benchmark import load_clean_catalog, make_synthetic_catalog, replay_queries
+from modules.catalog import CSV_PATH, Catalog, get_catalog
+from modules.columnar import normalize_catalog
+from modules.precompute_similarity import build_tfidf_matrix
+from modules.recommendation import hybrid_topk
+from modules.result_cache import ResultCache, cached_query, run_query
+from modules.user_filter import filter_user_preferences
+
+"""
+    Load test & benchmark latency pipeline rekomendasi.
+
+    Query dibuat dari nilai facet katalog dengan distribusi realistis: sedikit
+    kombinasi sidebar yang populer (Zipf), sebagian memakai rentang harga slider.
+    Query dijalankan oleh `concurrency` worker asyncio sekaligus, lalu dilaporkan
+    throughput, latency p50/p95/p99 dan peak RSS selama run itu. Latency &
+    throughput hanya dari query yang berhasil; query gagal dihitung di
+    `errors` (dengan contoh error pertama), dan run yang semua query-nya gagal
+    dihentikan dengan RuntimeError.
+
+    VmHWM adalah high-water mark seluruh proses dan tidak pernah turun, jadi
+    sebelum tiap run direset lewat /proc/self/clear_refs ("5", Linux >= 4.0):
+    peak_rss_mb = puncak RSS selama run, rss_delta_mb = puncak dikurangi RSS
+    saat run dimulai. Jika reset tidak didukung (mis. macOS), peak_rss_mb
+    tetap puncak kumulatif proses dan peak_rss_reset = false di JSON.
+
+    Target:
+    - pipeline : filter_positions + rank_positions (jalur app.py / server.py)
+    - cached   : pipeline di belakang ResultCache (cache baru per run)
+    - legacy   : filter_user_preferences + hybrid_topk (jalur DataFrame lama)
+    - http     : server.py di localhost, request async lewat koneksi keep-alive
+    - app      : alur penuh app.py lewat Streamlit AppTest (jika tersedia;
+                 selalu berurutan & hanya untuk katalog asli)
+
+    Katalog sintetis (--sizes) dibuat dengan sampling ulang baris katalog asli.
+    Hasil ditulis ke JSON (--output) dan bisa dibandingkan dengan run/commit
+    sebelumnya (--compare).
+
+    Contoh:
+        python loadtest.py --sizes 15000 150000 --concurrency 1 8 --targets pipeline cached http
+        python loadtest.py --output hasil_baru.json --compare hasil_lama.json
+"""
+
+TARGETS = ("pipeline", "cached", "legacy", "http", "app")
+OUTPUT_PATH = "loadtest_results.json"
+
+def _proc_status_mb(field):
+    # Nilai kB dari /proc/self/status (Linux) dalam MB, None jika tidak ada
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    return None
+
+def peak_rss_mb():
+    # VmHWM (Linux), selain itu ru_maxrss (KB di Linux, byte di macOS)
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb():
+    # VmRSS (Linux), None jika tidak tersedia
+    return _proc_status_mb("VmRSS")
+
+def reset_peak_rss():
+    # Reset VmHWM ke RSS saat ini; False jika tidak didukung
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def synthetic_catalog(n_rows, seed=42, csv_path=CSV_PATH):
+    # Katalog asli jika n_rows sama, selain itu sampling ulang baris (distribusi sama)
+    catalog = get_catalog(csv_path)
+    if n_rows == len(catalog):
+        return catalog
+    df = normalize_catalog(make_synthetic_catalog(load_clean_catalog(csv_path), n_rows, seed))
+    return Catalog(None, df, build_tfidf_matrix(df), f"synthetic-{n_rows}-{seed}", None)
+
+def _legacy_query(catalog, query):
+    filtered = filter_user_preferences(catalog.df, query.category, query.skin_type, query.gender,
+                                       query.usage_frequency, query.price_range)
+    return hybrid_topk(filtered, catalog.tfidf_matrix, query.alpha, query.beta, query.gamma, query.k)
+
+def _query_path(query):
+    params = {
+        "category": query.category, "skin_type": query.skin_type, "gender": query.gender,
+        "usage_frequency": query.usage_frequency, "price_min": query.price_range[0],
+        "price_max": query.price_range[1], "alpha": query.alpha, "beta": query.beta,
+        "gamma": query.gamma, "k": query.k,
+    }
+    return "/recommend?" + urlencode({key: value for key, value in params.items() if value is not None})
+
+async def _http_get(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+async def _drive(queries, concurrency, run_one):
+    # `concurrency` worker mengambil query dari iterator bersama; latency query gagal = NaN
+    latencies = np.zeros(len(queries))
+    errors = []
+    pending = iter(enumerate(queries))
+
+    async def worker(slot):
+        async with run_one(slot) as execute:
+            for i, query in pending:
+                start = time.perf_counter()
+                try:
+                    await execute(query)
+                except Exception as e:
+                    errors.append(e)
+                    latencies[i] = np.nan
+                    continue
+                latencies[i] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(slot) for slot in range(concurrency)))
+    return latencies, time.perf_counter() - start, errors
+
+class _ThreadTarget:
+    # Target in-process: fungsi sync dijalankan di thread pool agar worker berjalan bersamaan
+
+    def __init__(self, func, executor):
+        self.func = func
+        self.executor = executor
+
+    def __call__(self, slot):
+        return self
+
+    async def __aenter__(self):
+        return self.execute
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.func, query)
+
+class _HttpTarget:
+    # Satu koneksi keep-alive per worker
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def __call__(self, slot):
+        return _HttpConnection(self.host, self.port)
+
+class _HttpConnection:
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def __aenter__(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self.execute
+
+    async def __aexit__(self, *exc):
+        self.writer.close()
+        await self.writer.wait_closed()
+        return False
+
+    async def execute(self, query):
+        status = await _http_get(self.reader, self.writer, self.host, _query_path(query))
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+
+def _app_runner():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file("app.py", default_timeout=120).run()
+
+    def run(query):
+        for i, value in enumerate([query.category, query.skin_type, query.gender, query.usage_frequency]):
+            at.sidebar.selectbox[i].set_value("All" if value is None else value)
+        at.sidebar.slider[0].set_value(tuple(query.price_range))
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+def run_target(target, catalog, queries, concurrency):
+    if target == "app":
+        # AppTest tidak thread-safe: selalu berurutan
+        concurrency = 1
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    server = None
+    try:
+        if target == "pipeline":
+            runner = _ThreadTarget(lambda query: run_query(catalog, query), executor)
+        elif target == "cached":
+            cache = ResultCache()
+            runner = _ThreadTarget(lambda query: cached_query(catalog, query, cache), executor)
+        elif target == "legacy":
+            runner = _ThreadTarget(lambda query: _legacy_query(catalog, query), executor)
+        elif target == "http":
+            from server import start_in_thread
+
+            server, _ = start_in_thread(cache=None, catalog=catalog)
+            runner = _HttpTarget(*server.server_address[:2])
+        elif target == "app":
+            runner = _ThreadTarget(_app_runner(), executor)
+        else:
+            raise ValueError(f"target tidak dikenal: {target}")
+
+        # Puncak RSS per run: reset high-water mark setelah setup target, sebelum query
+        reset = reset_peak_rss()
+        rss_start = current_rss_mb()
+        # filter_user_preferences mencetak debug per query
+        with contextlib.redirect_stdout(io.StringIO()) if target == "legacy" else contextlib.nullcontext():
+            latencies, elapsed, errors = asyncio.run(_drive(queries, concurrency, runner))
+        peak = peak_rss_mb()
+    finally:
+        executor.shutdown()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    # Latency & throughput hanya dari query yang berhasil; semua gagal = target rusak, bukan angka
+    succeeded = latencies[~np.isnan(latencies)]
+    if len(succeeded) == 0 and len(queries) > 0:
+        raise RuntimeError(f"semua {len(queries)} query target {target} gagal: {errors[0]!r}") from errors[0]
+    return {
+        "target": target,
+        "rows": len(catalog),
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "seconds": elapsed,
+        "throughput": len(succeeded) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": float(succeeded.mean()),
+        "p50_ms": float(np.percentile(succeeded, 50)),
+        "p95_ms": float(np.percentile(succeeded, 95)),
+        "p99_ms": float(np.percentile(succeeded, 99)),
+        "peak_rss_mb": peak,
+        "rss_delta_mb": peak - rss_start if reset and rss_start is not None else None,
+        "peak_rss_reset": reset,
+    }
+
+def app_available():
+    try:
+        import streamlit.testing.v1  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def compare_results(previous, current):
+    # Cocokkan run berdasarkan (target, rows, concurrency)
+    index = {(r["target"], r["rows"], r["concurrency"]): r for r in previous["runs"]}
+    print(f"\n=== PERBANDINGAN dengan {previous.get('commit')} ===")
+    for run in current["runs"]:
+        old = index.get((run["target"], run["rows"], run["concurrency"]))
+        if old is None:
+            continue
+        print(f"{run['target']:<9} rows={run['rows']:>8} c={run['concurrency']:>3} "
+              f"throughput {old['throughput']:8.1f} -> {run['throughput']:8.1f} req/s "
+              f"p99 {old['p99_ms']:8.2f} -> {run['p99_ms']:8.2f} ms")
+
+def _delta(run):
+    return f" (+{run['rss_delta_mb']:.1f})" if run.get("rss_delta_mb") is not None else " (kumulatif)"
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test pipeline rekomendasi")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=["pipeline", "cached", "http"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--compare", help="file JSON hasil run sebelumnya")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+    for n_rows in args.sizes:
+        start = time.perf_counter()
+        catalog = synthetic_catalog(n_rows, args.seed)
+        queries = replay_queries(catalog, args.queries, args.seed)
+        print(f"=== {len(catalog):,} baris (siap dalam {time.perf_counter() - start:.1f} s, "
+              f"{len(set(queries))} query unik) ===")
+
+        for target in args.targets:
+            if target == "app" and (catalog.csv_path is None or not app_available()):
+                print("app      : dilewati (butuh katalog asli & streamlit.testing)")
+                continue
+            for concurrency in (args.concurrency if target != "app" else [1]):
+                run = run_target(target, catalog, queries, concurrency)
+                report["runs"].append(run)
+                print(f"{target:<9}: c={run['concurrency']:>3} throughput={run['throughput']:8.1f} q/s "
+                      f"p50={run['p50_ms']:8.2f} p95={run['p95_ms']:8.2f} p99={run['p99_ms']:8.2f} ms "
+                      f"peak rss={run['peak_rss_mb']:7.1f} MB{_delta(run)} errors={run['errors']}")
+                if run["errors"]:
+                    print(f"{'':<9}  {run['errors']}/{run['queries']} query gagal (latency tanpa query gagal), "
+                          f"contoh: {run['first_error']}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nHasil tersimpan di: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from modules.columnar import load_catalog_frame
+from modules.model_store import file_hash, load_or_build_tfidf
+from modules.neighbors import NEIGHBORS_IDS_FILE, load_or_build_neighbors
+from modules.profiles import PROFILE_OF_FILE, load_or_build_profiles
+from modules.recommendation import score_columns
+from modules.threshold_topk import ThresholdIndex
+from modules.topk_views import load_views, views_available
+from modules.tracing import span, traced
+from modules.user_filter import FACET_COLUMNS, FacetIndex
+
+"""
+    Katalog produk yang di-cache sekali per proses.
+
+    Streamlit menjalankan ulang app.py di setiap interaksi widget, tetapi modul
+    Python hanya di-import sekali per proses server. Cache di level modul ini
+    dipakai bersama oleh semua sesi/tab, sehingga tiap rerun hanya melakukan
+    filter dan ranking.
+
+    Catalog menyimpan:
+    - df            : DataFrame yang sudah dinormalisasi (teks lowercase, harga numerik),
+                      dari artefak kolumnar jika ada (kolom teks bertipe categorical)
+    - tfidf_matrix  : TF-IDF matrix dari artefak tersimpan
+    - facet_values  : nilai unik per kolom facet (untuk pilihan sidebar)
+    - price_min/max : batas harga untuk slider
+    - score_columns : (Rating, Number_of_Reviews) float64 read-only, dikonversi sekali
+                      (argumen columns rank_positions)
+    - facet_index   : FacetIndex untuk filter tanpa copy DataFrame
+    - neighbors     : NeighborIndex item-to-item (dibangun/dimuat saat pertama dipakai)
+    - profiles      : FeatureProfiles, baris TF-IDF identik digabung (dimuat saat pertama dipakai)
+    - topk_index    : ThresholdIndex, top-k threshold algorithm / full scan (dibangun saat pertama dipakai)
+    - views         : TopkViews per kombinasi facet jika sudah dibangun (python -m modules.topk_views),
+                      None jika tidak ada
+
+    Cache dicek ulang berdasarkan mtime & ukuran file; jika berubah, hash isi
+    file dibandingkan dan katalog dimuat ulang hanya jika isinya memang berbeda.
+
+    CompactCatalog (opsional, SKINCARE_COMPACT_CATALOG=1 atau compact=True)
+    menyimpan katalog yang sama dengan memori lebih kecil:
+    - kolom redundan dibuang (combined_features, Image_URL, Price)
+    - teks sebagai kode categorical terkecil + daftar kategori (string di-intern sekali)
+    - numerik sebagai integer terkecil / float32 jika lossless (Rating tetap float64
+      karena desimalnya tidak bisa direpresentasikan float32 tanpa mengubah nilai)
+    - TF-IDF float32 CSR dengan indices/indptr int32
+    - semua array read-only; df adalah view tanpa copy di atas array tersebut
+    Skor similarity dihitung dalam float32, sehingga bisa berbeda ~1e-7 dari
+    katalog biasa (urutan top-k hanya berubah untuk skor yang hampir seri).
+"""
+
+CSV_PATH = "data/skincare_products_clean.csv"
+COMPACT_ENV = "SKINCARE_COMPACT_CATALOG"
+COMPACT_DROP_COLUMNS = ['combined_features', 'Image_URL', 'Price']
+
+_CACHE = {}
+_LOCK = threading.Lock()
+_UNLOADED = object()
+
+class Catalog:
+
+    compact = False
+
+    def __init__(self, csv_path, df, tfidf_matrix, content_hash, signature, artifact_path=None,
+                 facet_index=None, neighbors=None):
+        self.csv_path = csv_path
+        self.df = df
+        self.tfidf_matrix = tfidf_matrix
+        self.content_hash = content_hash
+        self.signature = signature
+        self.artifact_path = artifact_path
+        self._neighbors = neighbors
+        self._profiles = None
+        self._topk_index = None
+        self._views = _UNLOADED
+        self._score_columns = None
+
+        self.facet_values = {
+            col: sorted(df[col].dropna().unique().tolist()) for col in FACET_COLUMNS
+        }
+        self.price_min = float(df['Price_IDR'].min()) if len(df) > 0 else 0.0
+        self.price_max = float(df['Price_IDR'].max()) if len(df) > 0 else 0.0
+        # facet_index/neighbors bisa diberikan langsung (hasil patch ingest inkremental)
+        self.facet_index = facet_index if facet_index is not None else FacetIndex(df)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def cache_key(self):
+        # Key result cache: isi katalog (juga katalog in-memory tanpa CSV); versi compact
+        # (float32) punya skor sendiri
+        return self.content_hash, self.compact
+
+    @property
+    def neighbors(self):
+        if self._neighbors is None:
+            with _LOCK:
+                if self._neighbors is None:
+                    self._neighbors = load_or_build_neighbors(self.tfidf_matrix, self.artifact_path)
+        return self._neighbors
+
+    @property
+    def profiles(self):
+        if self._profiles is None:
+            with _LOCK:
+                if self._profiles is None:
+                    self._profiles = load_or_build_profiles(self.tfidf_matrix, self.artifact_path)
+        return self._profiles
+
+    @property
+    def score_columns(self):
+        if self._score_columns is None:
+            # Satu tuple, dipasang sekali: pembaca tanpa lock tidak melihat setengah jadi
+            self._score_columns = tuple(_readonly(values) for values in score_columns(self.df))
+        return self._score_columns
+
+    @property
+    def topk_index(self):
+        if self._topk_index is None:
+            profiles = self.profiles
+            rating, reviews = self.score_columns
+            with _LOCK:
+                if self._topk_index is None:
+                    self._topk_index = ThresholdIndex(rating, reviews, profiles)
+        return self._topk_index
+
+    @property
+    def views(self):
+        if self._views is _UNLOADED:
+            with _LOCK:
+                if self._views is _UNLOADED:
+                    self._views = load_views(self.artifact_path) if views_available(self.artifact_path) else None
+        return self._views
+
+def _readonly(values):
+    # View read-only (flag array asal tidak ikut berubah)
+    values = np.asarray(values).view()
+    values.flags.writeable = False
+    return values
+
+def _smallest_code_dtype(codes, n_categories):
+    # Kode categorical (-1 = NaN) dengan dtype signed terkecil yang muat
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes.astype(np.int64, copy=False)
+
+def _compact_column(series):
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+        categorical = pd.Categorical(series) if series.dtype == object else series.array
+        # Kategori yang tidak terpakai dibuang, string di-intern agar dipakai bersama
+        categorical = categorical.remove_unused_categories()
+        categories = pd.Index([sys.intern(str(c)) for c in categorical.categories], dtype=object)
+        codes = _readonly(_smallest_code_dtype(np.asarray(categorical.codes), len(categories)))
+        return pd.Categorical.from_codes(codes, categories=categories)
+    values = series.to_numpy()
+    if values.dtype.kind == 'f':
+        as_f32 = values.astype(np.float32)
+        if np.array_equal(as_f32.astype(values.dtype), values, equal_nan=True):
+            values = as_f32
+    elif values.dtype.kind in 'iu':
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if len(values) == 0 or (info.min <= values.min() and values.max() <= info.max):
+                values = values.astype(dtype, copy=False)
+                break
+    return _readonly(values)
+
+def compact_tfidf(tfidf_matrix):
+    # float32 CSR, indices & indptr int32 (indptr int64 jika nnz melebihi int32), read-only
+    index_dtype = np.int32 if tfidf_matrix.nnz < np.iinfo(np.int32).max else np.int64
+    matrix = csr_matrix(
+        (
+            _readonly(np.asarray(tfidf_matrix.data, dtype=np.float32)),
+            _readonly(np.asarray(tfidf_matrix.indices, dtype=np.int32)),
+            _readonly(np.asarray(tfidf_matrix.indptr, dtype=index_dtype)),
+        ),
+        shape=tfidf_matrix.shape, copy=False,
+    )
+    return matrix
+
+def _string_bytes(values, seen):
+    # Ukuran objek string unik (id yang sama hanya dihitung sekali)
+    total = 0
+    for value in values:
+        if id(value) not in seen:
+            seen.add(id(value))
+            total += sys.getsizeof(value)
+    return total
+
+def frame_memory(df):
+    # Memori DataFrame termasuk isi string (object/categorical), dalam byte
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class CompactCatalog(Catalog):
+
+    compact = True
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        columns = [col for col in catalog.df.columns if col not in COMPACT_DROP_COLUMNS]
+        data = {col: _compact_column(catalog.df[col]) for col in columns}
+        df = pd.DataFrame(data, index=pd.RangeIndex(len(catalog.df)), copy=False)
+        return cls(catalog.csv_path, df, compact_tfidf(catalog.tfidf_matrix), catalog.content_hash,
+                   catalog.signature, catalog.artifact_path, facet_index=catalog.facet_index,
+                   neighbors=catalog._neighbors)
+
+    @property
+    def neighbors(self):
+        # Index tersimpan dipakai apa adanya; jika belum ada, dibangun dari matrix float32
+        # tanpa disimpan agar artefak tetap berasal dari matrix float64
+        if self._neighbors is None:
+            with _LOCK:
+                if self._neighbors is None:
+                    path = self.artifact_path
+                    if path is not None and not os.path.exists(os.path.join(path, NEIGHBORS_IDS_FILE)):
+                        path = None
+                    self._neighbors = load_or_build_neighbors(self.tfidf_matrix, path)
+        return self._neighbors
+
+    @property
+    def profiles(self):
+        # Pemetaan profil tersimpan dipakai (baris profil diambil dari matrix float32);
+        # jika belum ada, dibangun tanpa disimpan seperti neighbors
+        if self._profiles is None:
+            with _LOCK:
+                if self._profiles is None:
+                    path = self.artifact_path
+                    if path is not None and not os.path.exists(os.path.join(path, PROFILE_OF_FILE)):
+                        path = None
+                    self._profiles = load_or_build_profiles(self.tfidf_matrix, path)
+        return self._profiles
+
+    @property
+    def views(self):
+        # View dibangun dari katalog float64; skor compact (float32) selalu dihitung live
+        return None
+
+    def column(self, name):
+        # View read-only: kode categorical atau array numerik, tanpa copy
+        values = self.df[name].array
+        return values.codes if isinstance(values, pd.Categorical) else self.df[name].to_numpy()
+
+    def rows(self, positions, columns=None):
+        # DataFrame kecil (copy) hanya untuk baris yang diminta, mis. untuk ditampilkan
+        frame = self.df.iloc[np.asarray(positions)]
+        return (frame if columns is None else frame[columns]).copy()
+
+    def memory_report(self):
+        """
+        Rincian memori per komponen dalam byte:
+        kolom (kode/array + string kategori), tfidf (data/indices/indptr),
+        facet_index (bitset + urutan harga), neighbors (jika sudah dibangun), total.
+        """
+        report = {}
+        seen = set()
+        for col in self.df.columns:
+            values = self.df[col].array
+            if isinstance(values, pd.Categorical):
+                report[f"column:{col}"] = values.codes.nbytes + _string_bytes(values.categories, seen)
+            else:
+                report[f"column:{col}"] = self.df[col].to_numpy().nbytes
+        matrix = self.tfidf_matrix
+        report["tfidf:data"] = matrix.data.nbytes
+        report["tfidf:indices"] = matrix.indices.nbytes
+        report["tfidf:indptr"] = matrix.indptr.nbytes
+        index = self.facet_index
+        report["facet_index"] = sum(bits.nbytes for bitsets in index.bitsets.values() for bits in bitsets)
+        if index.has_price:
+            report["facet_index"] += index.price_order.nbytes + index.price_sorted.nbytes
+        if self._neighbors is not None:
+            report["neighbors"] = self._neighbors.ids.nbytes + self._neighbors.scores.nbytes
+        if self._profiles is not None:
+            profiles = self._profiles
+            report["profiles"] = (profiles.profile_of.nbytes + profiles.first.nbytes + profiles.counts.nbytes
+                                  + profiles.matrix.data.nbytes + profiles.matrix.indices.nbytes
+                                  + profiles.matrix.indptr.nbytes)
+        report["total"] = sum(report.values())
+        return report
+
+def catalog_memory(catalog):
+    # Rincian memori yang sebanding untuk Catalog biasa: DataFrame + TF-IDF + FacetIndex
+    matrix = catalog.tfidf_matrix
+    index = catalog.facet_index
+    report = {
+        "dataframe": frame_memory(catalog.df),
+        "tfidf": matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes,
+        "facet_index": sum(bits.nbytes for bitsets in index.bitsets.values() for bits in bitsets)
+        + (index.price_order.nbytes + index.price_sorted.nbytes if index.has_price else 0),
+    }
+    report["total"] = sum(report.values())
+    return report
+
+def compact_enabled():
+    return os.environ.get(COMPACT_ENV, "").strip().lower() in ("1", "true", "yes")
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+@traced("load")
+def load_catalog(csv_path=CSV_PATH):
+    # Muat katalog tanpa cache
+    signature = file_signature(csv_path)
+    artifact = load_or_build_tfidf(csv_path)
+    # Artefak kolumnar jika tersedia, CSV + normalisasi jika tidak
+    df = load_catalog_frame(csv_path, content_hash=artifact.content_hash)
+    with span("load.index"):
+        return Catalog(csv_path, df, artifact.matrix, artifact.content_hash, signature, artifact.path)
+
+def get_catalog(csv_path=CSV_PATH, compact=None):
+    # Katalog bersama per proses, dimuat ulang jika isi file berubah
+    # compact=None -> ikut SKINCARE_COMPACT_CATALOG
+    compact = compact_enabled() if compact is None else compact
+    key = (os.path.abspath(csv_path), compact)
+    signature = file_signature(csv_path)
+    cached = _CACHE.get(key)
+    if cached is not None and cached.signature == signature:
+        return cached
+
+    with _LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None and cached.signature == signature:
+            return cached
+        if cached is not None and cached.content_hash == file_hash(csv_path):
+            # mtime berubah (mis. file di-touch) tapi isi sama
+            cached.signature = signature
+            return cached
+        catalog = load_catalog(csv_path)
+        if compact:
+            catalog = CompactCatalog.from_catalog(catalog)
+        _CACHE[key] = catalog
+        return catalog
+
+def replace_catalog(catalog):
+    # Pasang katalog yang sudah diperbarui di tempat (mis. hasil modules.ingest);
+    # versi compact yang sedang dipakai ikut diganti
+    path = os.path.abspath(catalog.csv_path)
+    with _LOCK:
+        _CACHE[(path, False)] = catalog
+        if (path, True) in _CACHE:
+            _CACHE[(path, True)] = CompactCatalog.from_catalog(catalog)
+
+def clear_catalog_cache():
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,321 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from modules.tracing import span, traced
+
+"""
+    Format katalog kolumnar biner (NumPy .npy per kolom) pengganti CSV clean.
+
+    Artefak dibuat saat preprocessing dari CSV clean yang sudah dinormalisasi
+    (sama persis dengan hasil normalize_catalog(pd.read_csv(csv))), sehingga
+    loader tidak perlu parsing CSV maupun normalisasi ulang:
+
+        data/skincare_products_clean.columnar/
+            schema.json          : hash CSV sumber, jumlah baris, encoding tiap kolom
+            <kolom>.npy          : data kolom
+            <kolom>.categories.json : kategori (khusus kolom teks)
+
+    Encoding kolom:
+    - category : teks -> kode int8/int16/int32 + daftar kategori (dimuat sebagai pd.Categorical)
+    - int      : integer terkecil yang muat (int8..int64)
+    - float    : float32 jika round-trip lossless, selain itu float64
+    - scaled   : float dengan <= MAX_DECIMALS desimal disimpan sebagai integer x 10^d,
+                 dimuat kembali sebagai float64 yang identik dengan hasil parsing CSV
+    - bool     : bool
+
+    Loader mendukung proyeksi kolom (hanya file kolom yang diminta yang dibaca)
+    dan kembali ke CSV jika artefak tidak ada atau hash CSV tidak cocok.
+"""
+
+TEXT_COLUMNS = ['Category', 'Skin_Type', 'Gender', 'Usage_Frequency', 'Product_Name', 'Brand', 'Ingredients']
+SCHEMA_FILE = "schema.json"
+COLUMNAR_SUFFIX = ".columnar"
+MAX_DECIMALS = 4
+
+def normalize_catalog(df):
+    # --- Normalisasi teks ---
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].fillna('').astype(str).str.strip().str.lower()
+        else:
+            df[col] = ''
+
+    # Price numeric safety
+    if 'Price_IDR' in df.columns:
+        df['Price_IDR'] = pd.to_numeric(df['Price_IDR'], errors='coerce').fillna(0)
+    else:
+        df['Price_IDR'] = 0
+    return df
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + COLUMNAR_SUFFIX
+
+def _smallest_int_dtype(values, candidates=(np.int8, np.int16, np.int32, np.int64)):
+    lo = values.min() if len(values) > 0 else 0
+    hi = values.max() if len(values) > 0 else 0
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+def _encode_float(values):
+    # Pilih representasi lossless terkecil untuk kolom float64
+    as_f32 = values.astype(np.float32)
+    if np.array_equal(as_f32.astype(np.float64), values, equal_nan=True):
+        return {"encoding": "float"}, as_f32
+
+    if not np.isnan(values).any():
+        for decimals in range(1, MAX_DECIMALS + 1):
+            scale = 10 ** decimals
+            scaled = np.round(values * scale)
+            if np.abs(scaled).max() < 2**53 and np.array_equal(scaled / scale, values):
+                ints = scaled.astype(np.int64)
+                return {"encoding": "scaled", "decimals": decimals}, ints.astype(_smallest_int_dtype(ints))
+
+    return {"encoding": "float"}, values
+
+class _ColumnEncoder:
+    # Akumulasi satu kolom dari beberapa chunk
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.parts = []
+        self.category_codes = {}
+
+    def append(self, series):
+        if self.kind == "category":
+            # Kode lokal chunk dipetakan ke kode global (urutan kemunculan pertama)
+            codes, uniques = pd.factorize(series)
+            mapping = np.array(
+                [self.category_codes.setdefault(u, len(self.category_codes)) for u in uniques] + [-1],
+                dtype=np.int64,
+            )
+            self.parts.append(mapping[codes])
+        elif self.kind == "bool":
+            self.parts.append(series.to_numpy(dtype=bool))
+        elif self.kind == "int":
+            self.parts.append(series.to_numpy(dtype=np.int64))
+        else:
+            self.parts.append(series.to_numpy(dtype=np.float64))
+
+    def finish(self):
+        values = np.concatenate(self.parts) if self.parts else np.array([], dtype=np.int64)
+        if self.kind == "category":
+            categories = list(self.category_codes)
+            dtype = _smallest_int_dtype(np.array([-1, len(categories)]))
+            return {"encoding": "category", "categories": categories}, values.astype(dtype)
+        if self.kind == "bool":
+            return {"encoding": "bool"}, values
+        if self.kind == "int":
+            return {"encoding": "int"}, values.astype(_smallest_int_dtype(values))
+        return _encode_float(values)
+
+def _column_kind(dtypes):
+    if all(pd.api.types.is_bool_dtype(d) for d in dtypes):
+        return "bool"
+    if all(pd.api.types.is_integer_dtype(d) for d in dtypes):
+        return "int"
+    if all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d) for d in dtypes):
+        return "float"
+    return "category"
+
+def build_columnar(csv_path, content_hash, out_dir=None, chunksize=100_000):
+    """
+    Bangun artefak kolumnar dari CSV clean, dibaca per chunk.
+
+    Pass 1 menyamakan dtype antar chunk, pass 2 menormalisasi tiap chunk
+    (normalize_catalog) lalu mengkodekan kolomnya.
+    """
+    out_dir = out_dir or columnar_path(csv_path)
+
+    chunk_dtypes = {}
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        for col, dtype in normalize_catalog(chunk).dtypes.items():
+            chunk_dtypes.setdefault(col, []).append(dtype)
+
+    # Kolom yang seluruh chunk-nya kosong (NaN) tetap float, seperti read_csv satu file
+    encoders = {col: _ColumnEncoder(_column_kind(dtypes)) for col, dtypes in chunk_dtypes.items()}
+    n_rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk = normalize_catalog(chunk)
+        for col, encoder in encoders.items():
+            encoder.append(chunk[col])
+        n_rows += len(chunk)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-columnar-", dir=parent)
+    try:
+        schema = {"content_hash": content_hash, "n_rows": n_rows, "columns": {}}
+        for i, (col, encoder) in enumerate(encoders.items()):
+            meta, values = encoder.finish()
+            meta["file"] = f"{i:02d}.npy"
+            categories = meta.pop("categories", None)
+            if categories is not None:
+                meta["categories_file"] = f"{i:02d}.categories.json"
+                with open(os.path.join(tmp_dir, meta["categories_file"]), "w") as f:
+                    json.dump(categories, f)
+            np.save(os.path.join(tmp_dir, meta["file"]), values)
+            schema["columns"][col] = meta
+        with open(os.path.join(tmp_dir, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f, indent=1)
+
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return out_dir
+
+def _decode(values, meta):
+    # Nilai kolom tersimpan -> kode (category/bool/int apa adanya) atau float64
+    if meta["encoding"] == "scaled":
+        return values / 10 ** meta["decimals"]
+    if meta["encoding"] == "float":
+        return values.astype(np.float64)
+    return values
+
+def _encoding_kind(meta):
+    return {"scaled": "float"}.get(meta["encoding"], meta["encoding"])
+
+def patch_columnar(csv_path, content_hash, old_hash, source, new_rows):
+    """
+    Perbarui artefak kolumnar setelah ingest tanpa parsing ulang CSV.
+
+    source   : posisi tiap baris baru di gabungan [baris lama; new_rows]
+    new_rows : baris CSV clean yang ditambah/diubah (belum dinormalisasi)
+
+    Hanya file kolom yang isinya berubah yang ditulis (nama file baru, schema.json
+    terakhir, file lama yang tidak dipakai lagi dihapus). Kategori yang tidak
+    terpakai lagi dibiarkan di daftar kategori. Mengembalikan None jika artefak
+    tidak ada, bukan untuk old_hash, atau tipe kolom berubah (mis. teks di kolom
+    numerik); pemanggil lalu memakai build_columnar.
+    """
+    path = columnar_path(csv_path)
+    if not os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        return None
+    schema = read_schema(path)
+    if schema["content_hash"] != old_hash:
+        return None
+    new_rows = normalize_catalog(new_rows.copy())
+    if list(new_rows.columns) != list(schema["columns"]):
+        return None
+    new_kinds = {col: _column_kind([dtype]) for col, dtype in new_rows.dtypes.items()}
+    source = np.asarray(source, dtype=np.int64)
+
+    files = {}
+    for col, meta in schema["columns"].items():
+        kind = _encoding_kind(meta)
+        if len(new_rows) > 0 and new_kinds[col] != kind and {kind, new_kinds[col]} != {"int", "float"}:
+            return None
+        old_values = np.load(os.path.join(path, meta["file"]))
+        if kind == "category":
+            with open(os.path.join(path, meta["categories_file"])) as f:
+                categories = json.load(f)
+            encoder = _ColumnEncoder("category")
+            encoder.category_codes = {c: i for i, c in enumerate(categories)}
+            encoder.append(new_rows[col])
+            combined = np.concatenate([old_values.astype(np.int64), *encoder.parts])[source]
+            unchanged = len(encoder.category_codes) == len(categories)
+            encoder.parts = [combined]
+            new_meta, values = encoder.finish()
+        else:
+            # int + float (baris baru dengan desimal/NaN) -> float, seperti read_csv satu file
+            kind = "float" if len(new_rows) > 0 and new_kinds[col] != kind else kind
+            encoder = _ColumnEncoder(kind)
+            encoder.parts = [_decode(old_values, meta)]
+            encoder.append(new_rows[col])
+            encoder.parts = [np.concatenate(encoder.parts)[source]]
+            new_meta, values = encoder.finish()
+            unchanged = _encoding_kind(meta) == kind
+        if unchanged and len(values) == len(old_values) and np.array_equal(_decode(values, new_meta),
+                                                                            _decode(old_values, meta)):
+            continue
+        files[col] = (new_meta, values)
+
+    written = []
+    try:
+        for col, (new_meta, values) in files.items():
+            stem = f"{os.path.splitext(schema['columns'][col]['file'])[0].split('-')[0]}-{content_hash[:8]}"
+            new_meta["file"] = f"{stem}.npy"
+            categories = new_meta.pop("categories", None)
+            if categories is not None:
+                new_meta["categories_file"] = f"{stem}.categories.json"
+                with open(os.path.join(path, new_meta["categories_file"]), "w") as f:
+                    json.dump(categories, f)
+                written.append(new_meta["categories_file"])
+            np.save(os.path.join(path, new_meta["file"]), values)
+            written.append(new_meta["file"])
+            schema["columns"][col] = new_meta
+        schema["content_hash"] = content_hash
+        schema["n_rows"] = len(source)
+        tmp_schema = os.path.join(path, f".{SCHEMA_FILE}.tmp")
+        with open(tmp_schema, "w") as f:
+            json.dump(schema, f, indent=1)
+        os.replace(tmp_schema, os.path.join(path, SCHEMA_FILE))
+    except BaseException:
+        for name in written:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(path, name))
+        raise
+
+    referenced = {SCHEMA_FILE} | {name for meta in schema["columns"].values()
+                                  for name in (meta["file"], meta.get("categories_file")) if name}
+    for name in os.listdir(path):
+        if name not in referenced:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(path, name))
+    return path
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+def load_columnar(path, columns=None):
+    schema = read_schema(path)
+    columns = list(schema["columns"]) if columns is None else columns
+
+    data = {}
+    for col in columns:
+        meta = schema["columns"][col]
+        values = np.load(os.path.join(path, meta["file"]))
+        encoding = meta["encoding"]
+        if encoding == "category":
+            with open(os.path.join(path, meta["categories_file"])) as f:
+                categories = json.load(f)
+            data[col] = pd.Categorical.from_codes(values, categories=categories)
+        elif encoding == "scaled":
+            data[col] = values / 10 ** meta["decimals"]
+        elif encoding == "float":
+            data[col] = values.astype(np.float64)
+        else:
+            data[col] = values
+    # Array baru dimuat dan tidak dipakai di tempat lain, jadi tidak perlu di-copy
+    # (copy saat konsolidasi blok menggandakan peak memori untuk katalog besar)
+    return pd.DataFrame(data, index=pd.RangeIndex(schema["n_rows"]), copy=False)
+
+@traced("load.frame")
+def load_catalog_frame(csv_path, columns=None, content_hash=None):
+    """
+    Muat DataFrame katalog yang sudah dinormalisasi.
+
+    Memakai artefak kolumnar jika ada (dan hash CSV cocok bila content_hash
+    diberikan); jika tidak, parsing CSV + normalize_catalog seperti sebelumnya.
+    """
+    path = columnar_path(csv_path)
+    if os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        schema = read_schema(path)
+        if content_hash is None or schema["content_hash"] == content_hash:
+            return load_columnar(path, columns)
+
+    with span("load.read_csv"):
+        raw = pd.read_csv(csv_path)
+    df = normalize_catalog(raw)
+    return df if columns is None else df[columns]
@@ -1,5 +1,11 @@
+import time
+
+import numpy as np
 import pandas as pd
 
+from modules.columnar import build_columnar
+from modules.model_store import file_hash
+
 """
     Preprocessing dataset kosmetik dan menyimpannya ke file baru.
 
@@ -11,37 +17,46 @@ import pandas as pd
     - Standarisasi teks (lowercase & strip)
     - Buat fitur gabungan untuk sistem rekomendasi
     - Tambahkan kolom Image_URL kosong
+
+    preprocess_and_save_streaming memproses file per chunk (memori terbatas)
+    dengan hasil yang sama persis.
+
+    Kedua versi juga menulis artefak katalog kolumnar (modules/columnar.py)
+    di samping CSV clean, sehingga aplikasi tidak perlu parsing CSV saat start.
+
+    Jika ada journal ingest untuk CSV output (modules/ingest.py), batch-batch
+    ingest diputar ulang di atas hasil preprocessing sebelum artefak kolumnar
+    dibuat, sehingga produk yang ditambah/diubah/dihapus lewat ingest tetap
+    berlaku. Replay memuat CSV clean penuh ke memori (seperti ingest).
 """
 
 USD_TO_IDR = 15000  # kurs USD ke IDR
 
-def preprocess_and_save(csv_input, csv_output):
-    df = pd.read_csv(csv_input)
+RENAME_COLUMNS = {
+    'Price_USD': 'Price',
+    'Gender_Target': 'Gender',
+    'Main_Ingredient': 'Ingredients',
+}
+TEXT_COLUMNS = ['Category','Skin_Type','Gender','Usage_Frequency','Ingredients']
+NUMERIC_COLUMNS = ['Price','Rating','Number_of_Reviews']
 
+def _clean_frame(df, medians):
     # Hapus baris jika Product_Name atau Brand kosong
     df.dropna(subset=['Product_Name','Brand'], inplace=True)
 
     # Rename kolom agar konsisten
-    rename_dict = {}
-    if 'Price_USD' in df.columns:
-        rename_dict['Price_USD'] = 'Price'
-    if 'Gender_Target' in df.columns:
-        rename_dict['Gender_Target'] = 'Gender'
-    if 'Main_Ingredient' in df.columns:
-        rename_dict['Main_Ingredient'] = 'Ingredients'
+    rename_dict = {old: new for old, new in RENAME_COLUMNS.items() if old in df.columns}
     df.rename(columns=rename_dict, inplace=True)
 
     # Isi missing value teks opsional
-    text_cols = ['Category','Skin_Type','Gender','Usage_Frequency','Ingredients']
-    for col in text_cols:
+    for col in TEXT_COLUMNS:
         if col in df.columns:
             df[col] = df[col].fillna('').str.lower().str.strip()
 
-    # Isi missing value numerik
-    numeric_cols = ['Price','Rating','Number_of_Reviews']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna(df[col].median())
+    # Isi missing value numerik (median dihitung dari seluruh data, bukan per chunk)
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns and col in medians:
+            df[col] = df[col].fillna(medians[col])
 
     # Konversi Price USD ke IDR
     if 'Price' in df.columns:
@@ -61,9 +76,120 @@ def preprocess_and_save(csv_input, csv_output):
 
     # Kolom kosong untuk URL gambar
     df['Image_URL'] = ''
+    return df
+
+def preprocess_and_save(csv_input, csv_output):
+    df = pd.read_csv(csv_input)
+
+    # Median dihitung setelah baris tanpa Product_Name/Brand dibuang
+    valid = df.dropna(subset=['Product_Name','Brand']).rename(columns=RENAME_COLUMNS)
+    medians = {col: valid[col].median() for col in NUMERIC_COLUMNS if col in valid.columns}
 
+    df = _clean_frame(df, medians)
     df.to_csv(csv_output, index=False)
     print(f"Data clean tersimpan di: {csv_output}")
+    replay_ingest(csv_output)
+    save_columnar(csv_output)
+
+def replay_ingest(csv_output):
+    # Import di sini: modules.ingest meng-import modul ini
+    from modules.ingest import replay_journal
+
+    n_batches = replay_journal(csv_output)
+    if n_batches:
+        print(f"{n_batches} batch ingest dari journal diterapkan ulang")
+    return n_batches
+
+def save_columnar(csv_output):
+    # Artefak kolumnar diberi hash CSV clean agar loader bisa mendeteksi artefak basi
+    path = build_columnar(csv_output, file_hash(csv_output))
+    print(f"Katalog kolumnar tersimpan di: {path}")
+    return path
+
+def _unified_dtypes(chunk_dtypes):
+    # dtype per kolom harus sama dengan hasil read_csv satu file penuh,
+    # mis. chunk tanpa NaN terbaca int64 padahal file penuh terbaca float64
+    dtypes = {}
+    for col, kinds in chunk_dtypes.items():
+        if len(kinds) <= 1:
+            continue
+        numeric = all(pd.api.types.is_numeric_dtype(k) and not pd.api.types.is_bool_dtype(k) for k in kinds)
+        dtypes[col] = 'float64' if numeric else 'object'
+    return dtypes
+
+def median_from_counts(counts):
+    """
+    Median dari Series jumlah kemunculan (index = nilai, tanpa NaN), sama dengan
+    Series.median() atas nilai aslinya: jumlah genap -> rata-rata dua nilai tengah.
+    """
+    if counts.empty:
+        return np.nan
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=float)
+    cumulative = np.cumsum(counts.to_numpy(dtype=np.int64))
+    n = cumulative[-1]
+    # Nilai pada peringkat r (mulai 0) = nilai pertama dengan jumlah kumulatif > r
+    lower = values[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, n // 2, side='right')]
+    return lower if lower == upper else (lower + upper) / 2
+
+def preprocess_and_save_streaming(csv_input, csv_output, chunksize=5000):
+    """
+    Versi streaming preprocess_and_save untuk file besar, hasil byte-identik.
+
+    - Pass 1: baca per chunk untuk menyamakan dtype antar chunk dan mencari
+      kolom numerik yang punya missing value
+    - Pass 2 (hanya jika ada missing value numerik): hitung jumlah kemunculan
+      tiap nilai kolom tersebut per chunk lalu digabung, median eksak diambil
+      dari jumlah kumulatif (median_from_counts)
+    - Pass 3: bersihkan per chunk dan tulis ke output secara bertahap
+
+    Memori dibatasi ukuran chunk + jumlah nilai unik kolom numerik yang perlu
+    diisi median (Rating satu desimal, jumlah review & harga dalam rentang
+    terbatas), bukan jumlah baris file.
+    """
+    start = time.perf_counter()
+
+    chunk_dtypes = {}
+    columns_with_nan = set()
+    for chunk in pd.read_csv(csv_input, chunksize=chunksize):
+        for col, dtype in chunk.dtypes.items():
+            chunk_dtypes.setdefault(col, set()).add(dtype)
+        valid = chunk.dropna(subset=['Product_Name','Brand']).rename(columns=RENAME_COLUMNS)
+        for col in NUMERIC_COLUMNS:
+            if col in valid.columns and valid[col].isna().any():
+                columns_with_nan.add(col)
+    dtypes = _unified_dtypes(chunk_dtypes)
+
+    medians = {}
+    if columns_with_nan:
+        raw_columns = {RENAME_COLUMNS.get(c, c): c for c in chunk_dtypes}
+        usecols = ['Product_Name', 'Brand'] + [raw_columns[c] for c in columns_with_nan]
+        counts = {col: pd.Series(dtype=np.int64) for col in columns_with_nan}
+        for chunk in pd.read_csv(csv_input, chunksize=chunksize, usecols=usecols, dtype=dtypes):
+            valid = chunk.dropna(subset=['Product_Name','Brand']).rename(columns=RENAME_COLUMNS)
+            for col in columns_with_nan:
+                chunk_counts = valid[col].astype(float).value_counts()
+                counts[col] = counts[col].add(chunk_counts, fill_value=0).astype(np.int64)
+        medians = {col: median_from_counts(c) for col, c in counts.items()}
+
+    n_rows = 0
+    for i, chunk in enumerate(pd.read_csv(csv_input, chunksize=chunksize, dtype=dtypes)):
+        chunk = _clean_frame(chunk, medians)
+        chunk.to_csv(csv_output, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        n_rows += len(chunk)
+
+    elapsed = time.perf_counter() - start
+    rate = n_rows / elapsed if elapsed > 0 else 0.0
+    print(f"Data clean tersimpan di: {csv_output} ({n_rows} baris, {rate:,.0f} baris/detik)")
+    replay_ingest(csv_output)
+    save_columnar(csv_output)
+    return n_rows
 
 if __name__ == "__main__":
-    preprocess_and_save('data/skincare_products.csv', 'data/skincare_products_clean.csv')
+    import sys
+
+    if "--streaming" in sys.argv:
+        preprocess_and_save_streaming('data/skincare_products.csv', 'data/skincare_products_clean.csv')
+    else:
+        preprocess_and_save('data/skincare_products.csv', 'data/skincare_products_clean.csv')
@@ -1,7 +1,14 @@
 # modules/output_visualization.py
 from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import io
 import os
 
+import numpy as np
+
+from modules.tracing import traced
+
 """
     Generate dummy image untuk produk yang tidak memiliki gambar asli.
 
@@ -20,39 +27,107 @@ import os
 
     Output:
     - Mengembalikan path file gambar yang dihasilkan
+
+    Untuk aplikasi dipakai dummy_image_bytes: PNG disimpan di LRU cache memori
+    per nama produk, sehingga rerun Streamlit tidak menyentuh filesystem.
+    Background gradasi hanya dirender sekali per ukuran. prerender_images
+    membuat semua gambar katalog sekaligus secara paralel:
+        python -m modules.image --workers 4
 """
 
-def generate_dummy_image(product_name, image_dir='data/images', size=(200, 200)):
+IMAGE_DIR = 'data/images'
+IMAGE_CACHE_SIZE = 4096
 
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
-    
+def image_filename(product_name, image_dir=IMAGE_DIR):
     # Nama file unik berdasarkan product_name
     safe_name = "".join(c if c.isalnum() else "_" for c in product_name.lower())
-    filename = os.path.join(image_dir, f"{safe_name}.png")
-    
+    return os.path.join(image_dir, f"{safe_name}.png")
+
+@lru_cache(maxsize=8)
+def _gradient(size):
+    # Gradient sederhana (vertikal): abu ke biru, sama dengan versi per-baris ImageDraw.line
+    shade = (200 + 50 * np.arange(size[1]) / size[1]).astype(np.uint8)
+    pixels = np.repeat(shade[:, None], size[0], axis=1)
+    return Image.fromarray(np.stack([pixels] * 3, axis=-1), 'RGB')
+
+@traced("image.render")
+def render_dummy_image(product_name, size=(200, 200)):
+    img = _gradient(tuple(size)).copy()
+    draw = ImageDraw.Draw(img)
+
+    # Text: nama produk, truncate max 15 karakter
+    text = product_name[:15] + '...' if len(product_name) > 15 else product_name
+    try:
+        font = ImageFont.load_default()
+        w, h = draw.textbbox((0, 0), text, font=font)[2:]  # ukuran text
+        draw.text(((size[0]-w)/2, (size[1]-h)/2), text, fill=(0,0,0), font=font)
+    except:
+        draw.text((10, 10), text, fill=(0, 0, 0))
+    return img
+
+@traced("image.encode")
+def encode_png(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+@traced("image.generate")
+def generate_dummy_image(product_name, image_dir=IMAGE_DIR, size=(200, 200)):
+
+    if not os.path.exists(image_dir):
+        os.makedirs(image_dir)
+
+    filename = image_filename(product_name, image_dir)
+
     if not os.path.exists(filename):
-        # Buat image
-        img = Image.new('RGB', size)
-        draw = ImageDraw.Draw(img)
-
-        # Gradient sederhana (vertikal)
-        for y in range(size[1]):
-            r = int(200 + (50 * y / size[1]))   # abu ke biru
-            g = int(200 + (50 * y / size[1]))
-            b = int(200 + (50 * y / size[1]))
-            draw.line([(0, y), (size[0], y)], fill=(r, g, b))
-
-        # Text: nama produk, truncate max 15 karakter
-        text = product_name[:15] + '...' if len(product_name) > 15 else product_name
-        try:
-            font = ImageFont.load_default()
-            w, h = draw.textbbox((0, 0), text, font=font)[2:]  # ukuran text
-            draw.text(((size[0]-w)/2, (size[1]-h)/2), text, fill=(0,0,0), font=font)
-        except:
-            draw.text((10, 10), text, fill=(0, 0, 0))
-        
         # Simpan file
-        img.save(filename)
-    
+        render_dummy_image(product_name, size).save(filename)
+
     return filename
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def dummy_image_bytes(product_name, size=(200, 200), image_dir=IMAGE_DIR):
+    # PNG dari hasil pre-render jika ada, selain itu dirender langsung di memori
+    filename = image_filename(product_name, image_dir)
+    if os.path.exists(filename):
+        with open(filename, 'rb') as f:
+            return f.read()
+    return encode_png(render_dummy_image(product_name, size))
+
+def clear_image_cache():
+    dummy_image_bytes.cache_clear()
+
+def _render_chunk(product_names, image_dir, size):
+    return sum(generate_dummy_image(name, image_dir, size) is not None for name in product_names)
+
+def prerender_images(product_names, image_dir=IMAGE_DIR, size=(200, 200), workers=1, chunk_size=64):
+    # Render semua placeholder katalog yang belum ada di disk
+    os.makedirs(image_dir, exist_ok=True)
+    names = sorted({str(name) for name in product_names})
+    todo = [name for name in names if not os.path.exists(image_filename(name, image_dir))]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    if workers <= 1:
+        rendered = sum(_render_chunk(chunk, image_dir, size) for chunk in chunks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = sum(pool.map(_render_chunk, chunks, [image_dir] * len(chunks), [size] * len(chunks)))
+    return rendered, len(names)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from modules.columnar import load_catalog_frame
+
+    parser = argparse.ArgumentParser(description="Pre-render dummy image semua produk katalog")
+    parser.add_argument("--csv", default="data/skincare_products_clean.csv")
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    names = load_catalog_frame(args.csv, columns=['Product_Name'])['Product_Name'].unique()
+    rendered, total = prerender_images(names, args.image_dir, workers=args.workers)
+    print(f"{rendered} gambar baru dari {total} produk unik dalam {time.perf_counter() - start:.2f} detik "
+          f"-> {args.image_dir}")
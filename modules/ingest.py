@@ -0,0 +1,388 @@
+import argparse
+import io
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+
+from modules.catalog import CSV_PATH, Catalog, file_signature, get_catalog, replace_catalog
+from modules.columnar import (
+    SCHEMA_FILE, build_columnar, columnar_path, load_catalog_frame, load_columnar, normalize_catalog, patch_columnar,
+)
+from modules.data_preprocessing import NUMERIC_COLUMNS, _clean_frame
+from modules.model_store import (
+    artifact_path, build_tfidf_artifact, file_hash, load_tfidf_artifact,
+    load_vectorizer, remove_stale_artifacts, write_tfidf_artifact,
+)
+from modules.neighbors import (
+    EXACT_MAX_ROWS, NEIGHBORS_IDS_FILE, build_neighbors, load_neighbors, neighbor_recall, patch_neighbors, save_neighbors,
+)
+from modules.precompute_similarity import fit_tfidf
+from modules.user_filter import FACET_COLUMNS, FacetIndex
+
+"""
+    Ingest inkremental katalog: tambah / ubah / hapus produk tanpa fitting ulang TF-IDF.
+
+    Produk diidentifikasi dengan key (Product_Name, Brand), dibandingkan setelah
+    lowercase & strip. Key di dataset tidak unik, jadi update/delete berlaku
+    untuk SEMUA baris dengan key tersebut:
+    - delete : semua baris dengan key dihapus
+    - upsert : jika key sudah ada, semua barisnya diganti isi baris baru (posisi
+               tetap); jika belum ada, baris ditambahkan di akhir katalog
+
+    Baris baru memakai format dataset mentah (skincare_products.csv) dan
+    dibersihkan dengan _clean_frame yang sama seperti preprocessing (median
+    numerik diambil dari katalog clean saat ini).
+
+    Setelah perubahan:
+    - CSV clean ditulis ulang hanya mulai dari baris pertama yang berubah
+      (batch yang hanya menambah produk = append ke akhir file)
+    - katalog kolumnar dipatch: hanya file kolom yang isinya berubah yang ditulis
+      (patch_columnar), tanpa parsing ulang CSV
+    - baris TF-IDF baru di-transform dengan vocabulary & idf yang tersimpan,
+      lalu disambung ke matrix lama (tanpa fit ulang). Artefak TF-IDF berversi
+      per hash CSV dan tidak diubah di tempat, jadi array CSR-nya (biner,
+      ~12 byte per nnz) tetap ditulis utuh ke folder versi baru
+    - FacetIndex dan index tetangga dipatch (FacetIndex.patched, patch_neighbors)
+
+    Data mentah (skincare_products.csv) tidak diubah. Tiap batch dicatat di
+    journal <csv clean>.ingest.jsonl (append, baris yang sudah dibersihkan +
+    key yang dihapus); preprocessing memutar ulang journal itu (replay_journal)
+    setelah membangun CSV clean dari data mentah, sehingga produk hasil ingest
+    tidak hilang. Hapus journal untuk membuang semua perubahan ingest.
+
+    Kebijakan refit: dari frekuensi dokumen terbaru dihitung idf "seharusnya";
+    jika perubahan relatif idf terbesar > idf_threshold, atau proporsi token
+    baris baru yang tidak ada di vocabulary > oov_threshold, TF-IDF di-fit ulang
+    penuh (index tetangga lalu dibangun ulang saat pertama dipakai).
+
+    check_consistency membandingkan state inkremental dengan build ulang penuh.
+
+    Contoh:
+        python -m modules.ingest --upsert produk_baru.csv --delete hapus.csv --check
+"""
+
+IDF_DRIFT_THRESHOLD = 0.05
+OOV_THRESHOLD = 0.01
+JOURNAL_SUFFIX = ".ingest.jsonl"
+RECALL_SAMPLE = 200
+
+IngestResult = namedtuple(
+    "IngestResult",
+    ["catalog", "appended", "updated", "deleted", "refit", "idf_drift", "oov_ratio", "seconds"],
+)
+
+def product_keys(df):
+    name = df['Product_Name'].fillna('').astype(str).str.strip().str.lower()
+    brand = df['Brand'].fillna('').astype(str).str.strip().str.lower()
+    return name + '\x1f' + brand
+
+def clean_rows(rows, clean):
+    # Bersihkan baris mentah seperti preprocessing, lalu round-trip CSV agar
+    # dtype & nilainya sama dengan baris yang dibaca ulang dari file clean
+    medians = {col: clean[col].median() for col in NUMERIC_COLUMNS if col in clean.columns}
+    cleaned = _clean_frame(rows.copy(), medians).reindex(columns=clean.columns)
+    # Key yang muncul lebih dari sekali dalam satu batch: baris terakhir yang dipakai
+    cleaned = cleaned[~product_keys(cleaned).duplicated(keep='last')]
+    buffer = io.StringIO()
+    cleaned.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+def idf_drift(matrix, idf):
+    # Perubahan relatif terbesar antara idf tersimpan dan idf dari data terbaru
+    n_docs = matrix.shape[0]
+    doc_freq = np.bincount(matrix.indices, minlength=len(idf))
+    current = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+    idf = np.asarray(idf)
+    return float(np.max(np.abs(current - idf) / idf)) if len(idf) > 0 else 0.0
+
+def oov_ratio(vectorizer, texts):
+    analyzer = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    total = unknown = 0
+    for text in texts:
+        for token in analyzer(text):
+            total += 1
+            unknown += token not in vocabulary
+    return unknown / total if total > 0 else 0.0
+
+MergedRows = namedtuple("MergedRows", ["frame", "source", "changed", "old_to_new", "updated", "appended", "deleted"])
+
+def merge_rows(clean, new_rows, delete_keys):
+    """
+    Gabungkan baris clean dengan baris upsert (sudah dibersihkan) dan key yang dihapus.
+
+    Returns MergedRows:
+        frame      : DataFrame clean baru
+        source     : posisi tiap baris baru di gabungan [clean; new_rows]
+        changed    : posisi baru produk yang diubah/ditambah
+        old_to_new : posisi baru tiap posisi lama, -1 jika dihapus atau diubah
+        updated, appended, deleted : jumlah baris
+    """
+    keys = product_keys(clean)
+    n_old = len(clean)
+    new_keys = product_keys(new_rows)
+
+    # --- Posisi baru: baris lama yang tersisa (urutan tetap), lalu baris tambahan ---
+    kept = np.flatnonzero(~keys.isin(delete_keys).to_numpy())
+    row_of_key = pd.Series(np.arange(len(new_rows)), index=new_keys.to_numpy())
+    kept_source = row_of_key.reindex(keys.to_numpy()[kept]).to_numpy()
+    updated = np.flatnonzero(~np.isnan(kept_source))
+    appended_rows = np.setdiff1d(np.arange(len(new_rows)), kept_source[updated].astype(np.int64))
+
+    # Sumber tiap posisi baru di gabungan [clean; new_rows]
+    source = np.concatenate([kept, n_old + appended_rows])
+    source[updated] = n_old + kept_source[updated].astype(np.int64)
+    changed = np.concatenate([updated, np.arange(len(kept), len(source))])
+
+    old_to_new = np.full(n_old, -1, dtype=np.int64)
+    old_to_new[kept] = np.arange(len(kept))
+    old_to_new[kept[updated]] = -1
+
+    frame = pd.concat([clean, new_rows], ignore_index=True).iloc[source].reset_index(drop=True)
+    return MergedRows(frame, source, changed, old_to_new, len(updated), len(appended_rows), n_old - len(kept))
+
+def journal_path(csv_path):
+    return os.path.splitext(csv_path)[0] + JOURNAL_SUFFIX
+
+def append_journal(csv_path, new_rows, delete_keys):
+    # Satu baris JSON per batch: baris upsert yang sudah dibersihkan (teks CSV) + key yang dihapus
+    entry = {"rows": new_rows.to_csv(index=False) if len(new_rows) > 0 else "", "deletes": sorted(delete_keys)}
+    with open(journal_path(csv_path), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def replay_journal(csv_path):
+    """
+    Terapkan ulang semua batch ingest di journal ke CSV clean (dipanggil preprocessing
+    setelah CSV clean dibangun ulang dari data mentah). Hasilnya sama dengan CSV clean
+    setelah ingest yang sama. Returns jumlah batch, 0 jika tidak ada journal.
+    """
+    path = journal_path(csv_path)
+    if not os.path.exists(path):
+        return 0
+    clean = pd.read_csv(csv_path)
+    n_batches = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            new_rows = pd.read_csv(io.StringIO(entry["rows"])) if entry["rows"] else clean.iloc[:0]
+            frame = merge_rows(clean, new_rows, set(entry["deletes"])).frame
+            # Round-trip CSV seperti ingest yang membaca ulang CSV clean tiap batch
+            clean = pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+            n_batches += 1
+    clean.to_csv(csv_path, index=False)
+    return n_batches
+
+def _row_offsets(path):
+    # Offset byte awal tiap baris data CSV (elemen terakhir = akhir file); newline di dalam kutip diabaikan
+    with open(path, "rb") as f:
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+    in_quotes = np.cumsum(data == ord('"')) % 2 == 1
+    return np.flatnonzero((data == ord("\n")) & ~in_quotes) + 1
+
+def write_changed_rows(csv_path, clean, merged):
+    """
+    Tulis CSV clean baru mulai dari baris pertama yang berubah; baris sebelumnya
+    tidak ditulis ulang (batch yang hanya menambah produk = append). Jika dtype
+    kolom berubah (format angka baris lama ikut berubah) atau file tidak sesuai
+    clean, seluruh file ditulis ulang. Returns jumlah baris yang ditulis.
+    """
+    frame = merged.frame
+    moved = np.flatnonzero(merged.source[:len(clean)] != np.arange(min(len(clean), len(merged.source))))
+    first = int(moved[0]) if len(moved) > 0 else min(len(clean), len(merged.source))
+    offsets = _row_offsets(csv_path)
+    if (list(frame.dtypes) != list(clean.dtypes) or len(offsets) != len(clean) + 1
+            or offsets[-1] != os.path.getsize(csv_path)):
+        frame.to_csv(csv_path, index=False)
+        return len(frame)
+    with open(csv_path, "r+b") as f:
+        f.seek(int(offsets[first]))
+        f.truncate()
+        f.write(frame.iloc[first:].to_csv(index=False, header=False).encode())
+    return len(frame) - first
+
+def apply_changes(csv_path=CSV_PATH, upserts=None, deletes=None, idf_threshold=IDF_DRIFT_THRESHOLD,
+                  oov_threshold=OOV_THRESHOLD):
+    """
+    Terapkan perubahan ke katalog dan artefaknya.
+
+    upserts : DataFrame baris mentah (format skincare_products.csv), boleh None
+    deletes : DataFrame dengan kolom Product_Name & Brand, boleh None
+    Delete diterapkan lebih dulu, baru upsert.
+
+    Returns:
+        IngestResult (catalog baru juga dipasang di cache get_catalog)
+    """
+    start = time.perf_counter()
+    # Katalog penuh (float64, semua kolom): matrix lama dipakai untuk menulis artefak baru
+    old = get_catalog(csv_path, compact=False)
+    clean = pd.read_csv(csv_path)
+
+    new_rows = clean_rows(upserts, clean) if upserts is not None and len(upserts) > 0 else clean.iloc[:0]
+    delete_keys = set(product_keys(deletes)) if deletes is not None else set()
+    merged = merge_rows(clean, new_rows, delete_keys)
+    source, changed, old_to_new = merged.source, merged.changed, merged.old_to_new
+
+    # --- TF-IDF: transform baris baru dengan vocabulary & idf lama ---
+    artifact = load_tfidf_artifact(old.artifact_path)
+    vectorizer = load_vectorizer(artifact)
+    texts = new_rows['combined_features'].fillna('').astype(str)
+    block = vectorizer.transform(texts) if len(texts) > 0 else csr_matrix((0, len(artifact.vocabulary)))
+    matrix = vstack([old.tfidf_matrix, block], format='csr')[source]
+    matrix.sort_indices()
+
+    drift = idf_drift(matrix, artifact.idf)
+    oov = oov_ratio(vectorizer, texts)
+    refit = drift > idf_threshold or oov > oov_threshold
+
+    # Index tetangga hanya dipatch jika sudah pernah dibangun; setelah refit
+    # semua skor berubah, jadi dibiarkan dibangun ulang saat pertama dipakai
+    previous = None
+    if not refit:
+        if old._neighbors is not None:
+            previous = old._neighbors
+        elif os.path.exists(os.path.join(old.artifact_path, NEIGHBORS_IDS_FILE)):
+            # Tanpa mmap: folder artefak lama dihapus di bawah
+            previous = load_neighbors(old.artifact_path, mmap=False)
+
+    write_changed_rows(csv_path, clean, merged)
+    append_journal(csv_path, new_rows, delete_keys)
+    artifact_dir = os.path.dirname(old.artifact_path)
+    content_hash = file_hash(csv_path)
+    target = artifact_path(content_hash, artifact_dir)
+    if refit:
+        build_tfidf_artifact(csv_path, artifact_dir, content_hash)
+    else:
+        write_tfidf_artifact(target, matrix, artifact.vocabulary, artifact.idf, content_hash, artifact.fit_hash,
+                             csv_path)
+    remove_stale_artifacts(content_hash, artifact_dir, csv_path)
+    if patch_columnar(csv_path, content_hash, old.content_hash, source, new_rows) is None:
+        build_columnar(csv_path, content_hash)
+
+    new_artifact = load_tfidf_artifact(target)
+    df = load_catalog_frame(csv_path, content_hash=content_hash)
+    facet_index = old.facet_index.patched(df, old_to_new, changed)
+
+    neighbors = None
+    if previous is not None:
+        neighbors = patch_neighbors(previous, new_artifact.matrix, old_to_new, changed)
+        save_neighbors(neighbors, target)
+
+    catalog = Catalog(csv_path, df, new_artifact.matrix, content_hash, file_signature(csv_path), target,
+                      facet_index=facet_index, neighbors=neighbors)
+    replace_catalog(catalog)
+
+    return IngestResult(catalog, merged.appended, merged.updated, merged.deleted, refit, drift, oov,
+                        time.perf_counter() - start)
+
+def _facet_masks(index):
+    # {(kolom, nilai): mask} tanpa nilai yang tidak punya produk lagi
+    masks = {}
+    for col in FACET_COLUMNS:
+        for value, bits in zip(index.values[col], index.bitsets[col]):
+            mask = np.unpackbits(bits, count=index.n_rows).astype(bool)
+            if mask.any():
+                masks[(col, value)] = mask
+    return masks
+
+def _matrix_diff(a, b):
+    # Selisih absolut terbesar, None jika shape (vocabulary) berbeda
+    if a.shape != b.shape:
+        return None
+    diff = abs(a - b)
+    return float(diff.max()) if diff.nnz > 0 else 0.0
+
+def check_consistency(catalog):
+    """
+    Bandingkan state katalog (hasil ingest) dengan build ulang penuh dari CSV clean.
+
+    - tfidf_frozen : selisih maks matrix vs transform ulang seluruh CSV dengan vocab/idf
+                     tersimpan (~1e-16: fit_transform & transform sklearn sendiri berbeda 1 ulp)
+    - tfidf_refit  : selisih maks matrix vs fit ulang TF-IDF, None jika vocabulary berbeda
+                     (besarnya sebanding idf_drift selama belum refit)
+    - idf_drift    : drift idf tersimpan terhadap data saat ini
+    - facets       : FacetIndex hasil patch == FacetIndex(df) (mask per nilai & urutan harga)
+    - neighbors    : index tetangga == build_neighbors(matrix, method='exact'), None jika
+                     belum dibangun atau katalog di atas EXACT_MAX_ROWS (index aproksimasi)
+    - neighbors_recall : recall index tetangga aproksimasi pada sampel RECALL_SAMPLE produk,
+                     None jika index exact atau belum dibangun
+    - columnar     : katalog kolumnar == normalize_catalog(read_csv), None jika belum ada
+    """
+    clean = pd.read_csv(catalog.csv_path)
+    texts = clean['combined_features'].fillna('').astype(str)
+    artifact = load_tfidf_artifact(catalog.artifact_path)
+
+    frozen = load_vectorizer(artifact).transform(texts).tocsr()
+    frozen.sort_indices()
+    _, refit = fit_tfidf(clean)
+    refit.sort_indices()
+
+    fresh_index = FacetIndex(catalog.df)
+    index = catalog.facet_index
+    patched_masks, fresh_masks = _facet_masks(index), _facet_masks(fresh_index)
+    facets = (
+        patched_masks.keys() == fresh_masks.keys()
+        and all(np.array_equal(patched_masks[key], fresh_masks[key]) for key in fresh_masks)
+        and np.array_equal(index.price_order, fresh_index.price_order)
+        and np.array_equal(index.price_sorted, fresh_index.price_sorted)
+    )
+
+    neighbors = recall = None
+    if catalog._neighbors is not None and catalog.tfidf_matrix.shape[0] <= EXACT_MAX_ROWS:
+        rebuilt = build_neighbors(catalog.tfidf_matrix, catalog._neighbors.n_neighbors, method='exact')
+        neighbors = (np.array_equal(catalog._neighbors.ids, rebuilt.ids)
+                     and np.array_equal(catalog._neighbors.scores, rebuilt.scores))
+    elif catalog._neighbors is not None:
+        rows = np.random.default_rng(0).choice(catalog.tfidf_matrix.shape[0], size=RECALL_SAMPLE, replace=False)
+        recall = neighbor_recall(catalog._neighbors, catalog.tfidf_matrix, rows)
+
+    columnar = None
+    path = columnar_path(catalog.csv_path)
+    if os.path.exists(os.path.join(path, SCHEMA_FILE)):
+        expected = normalize_catalog(clean.copy())
+        stored = load_columnar(path)
+        columnar = list(expected.columns) == list(stored.columns) and all(
+            expected[col].astype(object).equals(stored[col].astype(object)) for col in expected.columns
+        )
+
+    return {
+        "rows": len(clean),
+        "tfidf_frozen": _matrix_diff(catalog.tfidf_matrix, frozen),
+        "tfidf_refit": _matrix_diff(catalog.tfidf_matrix, refit),
+        "idf_drift": idf_drift(catalog.tfidf_matrix, artifact.idf),
+        "facets": bool(facets),
+        "neighbors": neighbors,
+        "neighbors_recall": recall,
+        "columnar": columnar,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest inkremental katalog produk")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--upsert", help="CSV baris produk mentah (format skincare_products.csv)")
+    parser.add_argument("--delete", help="CSV dengan kolom Product_Name, Brand")
+    parser.add_argument("--idf-threshold", type=float, default=IDF_DRIFT_THRESHOLD)
+    parser.add_argument("--oov-threshold", type=float, default=OOV_THRESHOLD)
+    parser.add_argument("--check", action="store_true", help="bandingkan hasil dengan build ulang penuh")
+    args = parser.parse_args()
+
+    upserts = pd.read_csv(args.upsert) if args.upsert else None
+    deletes = pd.read_csv(args.delete) if args.delete else None
+    result = apply_changes(args.csv, upserts, deletes, args.idf_threshold, args.oov_threshold)
+    print(f"+{result.appended} baru, ~{result.updated} diubah, -{result.deleted} dihapus "
+          f"dalam {result.seconds:.2f} detik (idf drift {result.idf_drift:.4f}, "
+          f"oov {result.oov_ratio:.4f}, refit={result.refit})")
+
+    if args.check:
+        for name, value in check_consistency(result.catalog).items():
+            print(f"{name:<13}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from modules.precompute_similarity import fit_tfidf
+from modules.profiles import PROFILE_FIRST_FILE, PROFILE_OF_FILE, build_profiles
+from modules.tracing import traced
+
+"""
+    Penyimpanan artefak model TF-IDF yang persisten dan berversi.
+
+    Artefak disimpan per hash isi CSV clean:
+        data/artifacts/tfidf-<hash>/
+            meta.json    : hash, shape, jumlah nnz, fit_hash (hash CSV saat vocab/idf di-fit;
+                           berbeda dari hash jika artefak dipatch lewat ingest inkremental),
+                           source (path absolut CSV asal); ditulis terakhir, jadi folder
+                           tanpa meta.json dianggap artefak tidak lengkap
+            vocab.json   : daftar term urut sesuai index kolom
+            idf.npy      : bobot idf per term
+            data.npy, indices.npy, indptr.npy : komponen CSR matrix
+            profile_of.npy, profile_first.npy  : profil fitur unik (modules/profiles.py)
+
+    File .npy dibuka dengan memory-map, sehingga semua proses (Streamlit,
+    eval.py, tuning.py) berbagi page cache yang sama tanpa fitting ulang.
+    Jika isi CSV berubah, hash berubah dan artefak dibangun ulang otomatis;
+    artefak lama dari CSV yang sama (source) dihapus, artefak CSV lain
+    (katalog sintetis benchmark, server --csv) tidak disentuh.
+
+    File turunan yang dibangun belakangan (index tetangga, profil, view top-k)
+    hanya ditambahkan ke artefak lengkap lewat save_into_artifact.
+"""
+
+ARTIFACT_DIR = "data/artifacts"
+ARTIFACT_PREFIX = "tfidf-"
+META_FILE = "meta.json"
+HASH_LENGTH = 16
+
+TfidfArtifact = namedtuple(
+    "TfidfArtifact", ["matrix", "vocabulary", "idf", "content_hash", "path", "fit_hash"], defaults=(None,)
+)
+
+def file_hash(path, chunk_size=1 << 20):
+    # Hash sha256 isi file, dibaca per chunk agar hemat memori
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+def artifact_path(content_hash, artifact_dir=ARTIFACT_DIR):
+    return os.path.join(artifact_dir, f"{ARTIFACT_PREFIX}{content_hash}")
+
+def artifact_complete(path):
+    return path is not None and os.path.exists(os.path.join(path, META_FILE))
+
+def save_into_artifact(path, files):
+    """
+    Tambahkan file ke artefak TF-IDF yang sudah lengkap. files: {nama file: array
+    (np.save) atau dict array (np.savez)}. Ditulis ke folder sementara di dalam
+    artefak lalu dipindah per file dengan os.replace. Folder artefak tidak pernah
+    dibuat di sini, supaya artefak yang hilang tidak muncul lagi tanpa meta.json.
+    """
+    if not artifact_complete(path):
+        raise FileNotFoundError(f"artefak TF-IDF tidak lengkap (tanpa {META_FILE}): {path}")
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=path)
+    try:
+        for name, values in files.items():
+            if isinstance(values, dict):
+                np.savez(os.path.join(tmp_dir, name), **values)
+            else:
+                np.save(os.path.join(tmp_dir, name), values)
+        for name in files:
+            os.replace(os.path.join(tmp_dir, name), os.path.join(path, name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def build_tfidf_artifact(csv_path, artifact_dir=ARTIFACT_DIR, content_hash=None):
+    content_hash = content_hash or file_hash(csv_path)
+    target = artifact_path(content_hash, artifact_dir)
+
+    df = pd.read_csv(csv_path, usecols=['combined_features'])
+    vectorizer, matrix = fit_tfidf(df)
+    vocabulary = vectorizer.get_feature_names_out().tolist()
+    return write_tfidf_artifact(target, matrix, vocabulary, vectorizer.idf_, content_hash, content_hash, csv_path)
+
+def write_tfidf_artifact(target, matrix, vocabulary, idf, content_hash, fit_hash, source=None):
+    matrix.sort_indices()
+
+    # Tulis ke folder sementara lalu rename, supaya proses lain tidak membaca artefak setengah jadi
+    artifact_dir = os.path.dirname(target)
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=artifact_dir)
+    try:
+        with open(os.path.join(tmp_dir, "vocab.json"), "w") as f:
+            json.dump(list(vocabulary), f)
+        np.save(os.path.join(tmp_dir, "idf.npy"), np.asarray(idf))
+        np.save(os.path.join(tmp_dir, "data.npy"), matrix.data)
+        np.save(os.path.join(tmp_dir, "indices.npy"), matrix.indices)
+        np.save(os.path.join(tmp_dir, "indptr.npy"), matrix.indptr)
+        profiles = build_profiles(matrix)
+        np.save(os.path.join(tmp_dir, PROFILE_OF_FILE), profiles.profile_of)
+        np.save(os.path.join(tmp_dir, PROFILE_FIRST_FILE), profiles.first)
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({"content_hash": content_hash, "shape": list(matrix.shape), "nnz": int(matrix.nnz),
+                       "fit_hash": fit_hash, "source": None if source is None else os.path.abspath(source)}, f)
+
+        if artifact_complete(target):
+            # Sudah dibangun proses lain selama kita fitting
+            shutil.rmtree(tmp_dir)
+        else:
+            if os.path.exists(target):
+                # Folder tanpa meta.json (build terputus / file turunan tanpa artefak): ganti
+                shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp_dir, target)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return target
+
+def load_tfidf_artifact(path, mmap=True):
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "vocab.json")) as f:
+        vocabulary = json.load(f)
+
+    idf = np.load(os.path.join(path, "idf.npy"), mmap_mode=mmap_mode)
+    data = np.load(os.path.join(path, "data.npy"), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(path, "indices.npy"), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode=mmap_mode)
+    matrix = csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False)
+
+    fit_hash = meta.get("fit_hash", meta["content_hash"])
+    return TfidfArtifact(matrix, vocabulary, idf, meta["content_hash"], path, fit_hash)
+
+def artifact_source(path):
+    # Path absolut CSV asal artefak (None untuk artefak lama / tidak lengkap)
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f).get("source")
+    except (OSError, ValueError):
+        return None
+
+def remove_stale_artifacts(keep_hash, artifact_dir=ARTIFACT_DIR, source=None):
+    # Hapus artefak versi lama dari CSV yang sama (source); artefak CSV lain dibiarkan
+    if source is None or not os.path.isdir(artifact_dir):
+        return
+    source = os.path.abspath(source)
+    for name in os.listdir(artifact_dir):
+        path = os.path.join(artifact_dir, name)
+        if (name.startswith(ARTIFACT_PREFIX) and name != f"{ARTIFACT_PREFIX}{keep_hash}"
+                and artifact_source(path) == source):
+            shutil.rmtree(path, ignore_errors=True)
+
+@traced("load.tfidf")
+def load_or_build_tfidf(csv_path="data/skincare_products_clean.csv", artifact_dir=ARTIFACT_DIR, mmap=True):
+    # Artefak dicari berdasarkan hash isi CSV, dibangun ulang jika belum ada (stale)
+    content_hash = file_hash(csv_path)
+    path = artifact_path(content_hash, artifact_dir)
+    if not artifact_complete(path):
+        build_tfidf_artifact(csv_path, artifact_dir, content_hash)
+        remove_stale_artifacts(content_hash, artifact_dir, csv_path)
+    return load_tfidf_artifact(path, mmap=mmap)
+
+def load_vectorizer(artifact):
+    # Rekonstruksi TfidfVectorizer dari vocabulary & idf tersimpan, tanpa fitting ulang
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(stop_words='english', vocabulary=artifact.vocabulary)
+    vectorizer.idf_ = np.asarray(artifact.idf)
+    return vectorizer
+
+if __name__ == "__main__":
+    csv_path = "data/skincare_products_clean.csv"
+    content_hash = file_hash(csv_path)
+    path = build_tfidf_artifact(csv_path, content_hash=content_hash)
+    remove_stale_artifacts(content_hash, source=csv_path)
+    print(f"Artefak TF-IDF tersimpan di: {path}")
@@ -0,0 +1,309 @@
+import os
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from modules.model_store import artifact_complete, save_into_artifact
+from modules.tfidf_encoder import l2_normalize
+
+"""
+    Index tetangga terdekat (item-to-item) yang dihitung sekali dari TF-IDF matrix.
+
+    Untuk tiap produk disimpan N produk paling mirip (cosine similarity):
+    - ids    : int32  (n_produk x N), -1 jika tetangga kurang dari N
+    - scores : float32 (n_produk x N), urut turun; skor sama diurutkan id terkecil
+
+    Dua cara build (method):
+    - 'exact': per chunk baris, similarity chunk dihitung sebagai X (sparse, n x V)
+      dikali chunk^T (dense, V x c) sehingga memori puncak dibatasi
+      max_chunk_cells. Waktu O(n^2): ~3.5 s untuk 15k produk, ~44 s untuk 50k
+      (`python benchmark.py neighbors`), jadi tidak layak untuk jutaan produk.
+    - 'ivf' (aproksimasi, inverted file): produk dikelompokkan ke n_lists sel
+      dengan spherical k-means; produk di satu sel hanya dibandingkan dengan
+      anggota n_probe sel yang centroid-nya paling mirip dengan centroid sel
+      itu, lalu kandidat dinilai ulang dengan cosine exact. Waktu ~O(n^2 *
+      n_probe / n_lists). Skor yang tersimpan exact; yang bisa terlewat adalah
+      tetangga di sel yang tidak di-probe. Dengan n_probe = n_lists hasilnya
+      identik dengan 'exact'.
+    - 'auto' (bawaan): exact sampai EXACT_MAX_ROWS produk (katalog bawaan ~15k
+      tetap exact), ivf di atasnya.
+
+    neighbor_recall mengukur recall index terhadap top-N exact pada sampel
+    produk (tetangga dihitung benar jika skornya >= skor ke-N exact, jadi
+    pilihan di antara skor seri tidak dihitung salah).
+
+    Query "produk mirip X" hanya membaca satu baris array (mikrodetik) dan bisa
+    digabung dengan hasil filter facet (positions / mask). Hasil terfilter
+    hanya memuat produk dari N tetangga tersimpan.
+"""
+
+NEIGHBORS_IDS_FILE = "neighbors_ids.npy"
+NEIGHBORS_SCORES_FILE = "neighbors_scores.npy"
+NEIGHBOR_METHODS = ('auto', 'exact', 'ivf')
+EXACT_MAX_ROWS = 20_000
+N_PROBE = 8
+KMEANS_ITERATIONS = 5
+
+class NeighborIndex:
+
+    def __init__(self, ids, scores):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def n_neighbors(self):
+        return self.ids.shape[1]
+
+    def similar(self, product, n=10, allowed=None):
+        """
+        Produk paling mirip dengan posisi global `product` (tidak termasuk dirinya).
+
+        allowed: opsional, posisi global urut naik (hasil filter_positions) atau
+                 boolean mask sepanjang katalog untuk membatasi hasil ke subset.
+
+        Returns:
+            (ids, scores) sebanyak maksimal n
+        """
+        ids = self.ids[product]
+        scores = self.scores[product]
+        valid = ids >= 0
+        if allowed is not None:
+            allowed = np.asarray(allowed)
+            if allowed.dtype == bool:
+                valid &= allowed[np.where(valid, ids, 0)]
+            elif len(allowed) == 0:
+                valid[:] = False
+            else:
+                # binary search id tetangga di posisi subset yang sudah urut
+                loc = np.minimum(np.searchsorted(allowed, ids), len(allowed) - 1)
+                valid &= allowed[loc] == ids
+        keep = np.flatnonzero(valid)[:n]
+        return ids[keep], scores[keep]
+
+def _row_topn(row, n_neighbors):
+    # Top-N satu baris, skor sama diurutkan berdasarkan id terkecil
+    n = len(row)
+    k = min(n_neighbors, n)
+    if k < n:
+        threshold = np.partition(row, n - k)[n - k]
+        candidates = np.flatnonzero(row >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -row[candidates]))[:k]
+    return candidates[order]
+
+def normalized_rows(tfidf_matrix):
+    return l2_normalize(tfidf_matrix).astype(np.float32).tocsr()
+
+def _topn_rows(x, rows, n_neighbors, n_keep, max_chunk_cells, verbose=False):
+    # Top-N lengkap untuk baris `rows` (posisi global) terhadap seluruh katalog
+    n_rows = x.shape[0]
+    ids = np.full((len(rows), n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), n_neighbors), dtype=np.float32)
+    chunk = max(1, max_chunk_cells // max(n_rows, 1))
+
+    start_time = time.perf_counter()
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start + chunk]
+        # (n x V) @ (V x c) -> dense n x c, lalu transpose jadi c x n
+        sims = np.asarray(x @ x[block].T.toarray()).T
+        # Produk tidak dihitung sebagai tetangga dirinya sendiri
+        sims[np.arange(len(block)), block] = -np.inf
+
+        for i, row in enumerate(sims):
+            top = _row_topn(row, n_keep)
+            ids[start + i, :len(top)] = top
+            scores[start + i, :len(top)] = row[top]
+
+        if verbose:
+            print(f"{start + len(block)}/{len(rows)} baris ({time.perf_counter() - start_time:.1f} s)")
+
+    return ids, scores
+
+def _nearest_lists(x, centroids, max_chunk_cells):
+    # Sel dengan centroid paling mirip untuk tiap baris (dot product, baris & centroid bernorma 1)
+    assign = np.empty(x.shape[0], dtype=np.int64)
+    chunk = max(1, max_chunk_cells // max(len(centroids), 1))
+    for start in range(0, x.shape[0], chunk):
+        assign[start:start + chunk] = np.asarray(x[start:start + chunk] @ centroids.T).argmax(axis=1)
+    return assign
+
+def _ivf_lists(x, n_lists, n_iter, seed, max_chunk_cells):
+    # Spherical k-means: centroid = rata-rata anggota dinormalisasi, sel kosong memakai centroid lama
+    rng = np.random.default_rng(seed)
+    centroids = x[np.sort(rng.choice(x.shape[0], size=n_lists, replace=False))].toarray()
+    for _ in range(n_iter):
+        assign = _nearest_lists(x, centroids, max_chunk_cells)
+        members = csr_matrix((np.ones(len(assign), dtype=np.float32), (assign, np.arange(len(assign)))),
+                             shape=(n_lists, x.shape[0]))
+        sums = np.asarray((members @ x).todense())
+        norms = np.linalg.norm(sums, axis=1)
+        filled = norms > 0
+        centroids[filled] = sums[filled] / norms[filled, None]
+    return centroids, _nearest_lists(x, centroids, max_chunk_cells)
+
+def _ivf_topn(x, n_neighbors, n_keep, n_lists, n_probe, seed, max_chunk_cells, verbose=False):
+    n_rows = x.shape[0]
+    ids = np.full((n_rows, n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, n_neighbors), dtype=np.float32)
+    centroids, assign = _ivf_lists(x, n_lists, KMEANS_ITERATIONS, seed, max_chunk_cells)
+    order = np.argsort(assign, kind='stable')
+    bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+    # Sel yang di-probe per sel (termasuk dirinya), urut dari centroid paling mirip
+    probes = np.argsort(-(centroids @ centroids.T), axis=1, kind='stable')[:, :n_probe]
+
+    start_time = time.perf_counter()
+    for cell in range(n_lists):
+        members = order[bounds[cell]:bounds[cell + 1]]
+        if len(members) == 0:
+            continue
+        # Kandidat urut id, sehingga sort stabil mengurutkan skor seri berdasarkan id terkecil
+        candidates = np.unique(np.concatenate([order[bounds[p]:bounds[p + 1]] for p in np.append(probes[cell], cell)]))
+        x_cand = x[candidates]
+        keep = min(n_keep, len(candidates) - 1)
+        chunk = max(1, max_chunk_cells // len(candidates))
+        for start in range(0, len(members), chunk):
+            block = members[start:start + chunk]
+            # Dijumlah per term kandidat seperti build exact, jadi skornya identik bit-per-bit
+            sims = np.asarray(x_cand @ x[block].T.toarray()).T
+            sims[np.arange(len(block)), np.searchsorted(candidates, block)] = -np.inf
+            top = np.argsort(-sims, axis=1, kind='stable')[:, :keep]
+            ids[block, :keep] = candidates[top]
+            scores[block, :keep] = np.take_along_axis(sims, top, axis=1)
+
+        if verbose and (cell + 1) % max(1, n_lists // 20) == 0:
+            print(f"{cell + 1}/{n_lists} sel ({time.perf_counter() - start_time:.1f} s)")
+
+    return ids, scores
+
+def build_neighbors(tfidf_matrix, n_neighbors=50, max_chunk_cells=1 << 24, verbose=False, method='auto',
+                    n_lists=None, n_probe=N_PROBE, seed=0):
+    """
+    Index N tetangga per produk. method: 'exact', 'ivf' (aproksimasi), atau 'auto'
+    (exact sampai EXACT_MAX_ROWS baris). n_lists (bawaan sqrt(n)) dan n_probe
+    hanya dipakai 'ivf'.
+    """
+    if method not in NEIGHBOR_METHODS:
+        raise ValueError(f"method harus salah satu dari {NEIGHBOR_METHODS}, bukan {method!r}")
+    n_rows = tfidf_matrix.shape[0]
+    x = normalized_rows(tfidf_matrix)
+    n_keep = min(n_neighbors, max(n_rows - 1, 0))
+    if method == 'auto':
+        method = 'exact' if n_rows <= EXACT_MAX_ROWS else 'ivf'
+    if method == 'ivf' and n_rows > 0:
+        n_lists = min(n_rows, n_lists if n_lists is not None else int(np.ceil(np.sqrt(n_rows))))
+        ids, scores = _ivf_topn(x, n_neighbors, n_keep, n_lists, min(n_probe, n_lists), seed, max_chunk_cells, verbose)
+    else:
+        ids, scores = _topn_rows(x, np.arange(n_rows), n_neighbors, n_keep, max_chunk_cells, verbose)
+    return NeighborIndex(ids, scores)
+
+def neighbor_recall(index, tfidf_matrix, rows, max_chunk_cells=1 << 24):
+    """
+    Recall index terhadap top-N exact untuk posisi `rows`: jumlah tetangga tersimpan
+    yang skor exact-nya >= skor ke-N exact, dibagi jumlah tetangga exact.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    x = normalized_rows(tfidf_matrix)
+    n_neighbors = index.n_neighbors
+    n_keep = min(n_neighbors, max(x.shape[0] - 1, 0))
+    exact_ids, exact_scores = _topn_rows(x, rows, n_neighbors, n_keep, max_chunk_cells)
+    hits = total = 0
+    for i, row in enumerate(rows):
+        expected = exact_ids[i] >= 0
+        if not expected.any():
+            continue
+        kth = exact_scores[i][expected][-1]
+        found = index.ids[row] >= 0
+        hits += int(np.count_nonzero(index.scores[row][found] >= kth))
+        total += int(np.count_nonzero(expected))
+    return hits / total if total > 0 else 1.0
+
+def patch_neighbors(index, tfidf_matrix, old_to_new, changed, max_chunk_cells=1 << 24):
+    """
+    Perbarui index tetangga setelah produk ditambah/diubah/dihapus, tanpa build ulang.
+
+    old_to_new : posisi baru untuk tiap posisi lama, -1 jika produk dihapus atau
+                 diubah (vektornya berganti)
+    changed    : posisi baru produk yang diubah/ditambah
+
+    - Baris yang berubah dan baris yang daftar tetangganya memuat produk yang
+      dihapus/diubah dihitung ulang penuh (tetangga ke-N berikutnya tidak diketahui)
+    - Baris lain cukup digabung dengan skor terhadap produk yang berubah, karena
+      skor ke produk lain tidak berubah
+
+    Hasil identik dengan build_neighbors(method='exact') pada matrix baru. Untuk
+    index 'ivf', baris yang dihitung ulang menjadi exact dan baris lain tetap
+    aproksimasi (ditambah kandidat produk yang berubah).
+    """
+    n_rows = tfidf_matrix.shape[0]
+    n_neighbors = index.n_neighbors
+    n_keep = min(n_neighbors, max(n_rows - 1, 0))
+    if n_keep < n_neighbors or len(old_to_new) - 1 < n_neighbors:
+        # Katalog lebih kecil dari N: daftar tidak penuh, lebih sederhana build ulang
+        return build_neighbors(tfidf_matrix, n_neighbors, max_chunk_cells)
+
+    x = normalized_rows(tfidf_matrix)
+    changed = np.asarray(changed, dtype=np.int64)
+    ids = np.full((n_rows, n_neighbors), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, n_neighbors), dtype=np.float32)
+
+    survivors = np.flatnonzero(old_to_new >= 0)
+    new_pos = old_to_new[survivors]
+    remapped = old_to_new[np.asarray(index.ids[survivors])]
+    stale = (remapped < 0).any(axis=1)
+    ids[new_pos] = remapped
+    scores[new_pos] = index.scores[survivors]
+
+    fresh = new_pos[~stale]
+    if len(changed) > 0 and len(fresh) > 0:
+        chunk = max(1, max_chunk_cells // len(fresh))
+        x_fresh_t = x[fresh].T.tocsr()
+        for start in range(0, len(changed), chunk):
+            block = changed[start:start + chunk]
+            # Skor (baris fresh -> kandidat block), dijumlah dengan urutan term yang
+            # sama seperti build_neighbors sehingga nilainya identik bit-per-bit
+            block_scores = (x[block] @ x_fresh_t).toarray().T
+            cand_ids = np.hstack([ids[fresh], np.broadcast_to(block.astype(np.int32), block_scores.shape)])
+            cand_scores = np.hstack([scores[fresh], block_scores])
+            order = np.lexsort((cand_ids, -cand_scores), axis=-1)[:, :n_neighbors]
+            ids[fresh] = np.take_along_axis(cand_ids, order, axis=1)
+            scores[fresh] = np.take_along_axis(cand_scores, order, axis=1)
+
+    recompute = np.concatenate([changed, new_pos[stale]])
+    if len(recompute) > 0:
+        ids[recompute], scores[recompute] = _topn_rows(x, recompute, n_neighbors, n_keep, max_chunk_cells)
+
+    return NeighborIndex(ids, scores)
+
+def save_neighbors(index, path):
+    # Hanya ke artefak TF-IDF lengkap (ada meta.json), FileNotFoundError jika tidak
+    save_into_artifact(path, {NEIGHBORS_IDS_FILE: index.ids, NEIGHBORS_SCORES_FILE: index.scores})
+
+def load_neighbors(path, mmap=True):
+    mmap_mode = "r" if mmap else None
+    ids = np.load(os.path.join(path, NEIGHBORS_IDS_FILE), mmap_mode=mmap_mode)
+    scores = np.load(os.path.join(path, NEIGHBORS_SCORES_FILE), mmap_mode=mmap_mode)
+    return NeighborIndex(ids, scores)
+
+def load_or_build_neighbors(tfidf_matrix, path, n_neighbors=50):
+    # path = folder artefak TF-IDF, jadi index ikut versi hash CSV
+    if path is None:
+        return build_neighbors(tfidf_matrix, n_neighbors)
+    if os.path.exists(os.path.join(path, NEIGHBORS_IDS_FILE)):
+        index = load_neighbors(path)
+        if index.n_neighbors >= n_neighbors:
+            return index
+    index = build_neighbors(tfidf_matrix, n_neighbors)
+    if artifact_complete(path):
+        # Artefak yang sudah dihapus/tidak lengkap tidak dibuat ulang sepotong; index tetap dipakai di memori
+        save_neighbors(index, path)
+    return index
+
+if __name__ == "__main__":
+    from modules.model_store import load_or_build_tfidf
+
+    artifact = load_or_build_tfidf("data/skincare_products_clean.csv")
+    index = build_neighbors(artifact.matrix, verbose=True)
+    save_neighbors(index, artifact.path)
+    print(f"Index tetangga tersimpan di: {artifact.path}")
@@ -1,14 +1,22 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
 from scipy.sparse import csr_matrix
 
-# Membangun TF-IDF matrix dari kolom 'combined_features' dataframe.
-def build_tfidf_matrix(df):
+from modules.tracing import traced
+
+# Fit TF-IDF vectorizer dan kembalikan (vectorizer, matrix) agar vocabulary/idf bisa disimpan.
+@traced("tfidf.fit")
+def fit_tfidf(df):
+    # scikit-learn hanya di-import saat fitting (startup aplikasi cukup memuat artefak)
+    from sklearn.feature_extraction.text import TfidfVectorizer
 
     # Inisialisasi TF-IDF vectorizer, stop_words='english' agar kata umum seperti 'and', 'the' diabaikan
     tfidf = TfidfVectorizer(stop_words='english')
 
     # Fit dan transform teks menjadi TF-IDF matrix
     matrix = tfidf.fit_transform(df['combined_features'])
-    
+
     # Konversi ke format sparse agar hemat memori dan cepat untuk similarity
-    return csr_matrix(matrix)
+    return tfidf, csr_matrix(matrix)
+
+# Membangun TF-IDF matrix dari kolom 'combined_features' dataframe.
+def build_tfidf_matrix(df):
+    return fit_tfidf(df)[1]
@@ -0,0 +1,173 @@
+import numpy as np
+
+from modules.recommendation import rank_positions
+from modules.user_filter import filter_positions
+
+"""
+    Profil preferensi per sesi dari like/dislike produk.
+
+    Profil adalah jumlah berbobot baris TF-IDF (dinormalisasi L2) produk yang
+    disukai (+1) / tidak disukai (-1), dengan peluruhan: setiap interaksi baru
+    mengalikan profil lama dengan `decay` sebelum baris produk ditambahkan,
+
+        v <- decay * v + bobot * x
+
+    sehingga interaksi lama makin kecil pengaruhnya.
+
+    Tiap produk punya paling banyak satu tanda (like atau dislike), sama
+    dengan status tombol di app.py:
+    - like/dislike ulang pada produk yang sudah bertanda sama: tidak berubah
+    - berpindah like <-> dislike: kontribusi lama (yang sudah meluruh)
+      dihapus dulu, lalu tanda baru ditambahkan sebagai interaksi baru
+    - produk dengan baris TF-IDF nol tidak bisa diberi tanda (liked/disliked
+      tidak berubah, sama dengan replay_profile yang melewatinya)
+
+    Update O(nnz baris produk), tidak bergantung panjang riwayat:
+    - peluruhan disimpan sebagai faktor skala (v = scale * raw), jadi cukup
+      scale *= decay; baris produk ditambahkan ke raw dengan bobot / scale
+    - koefisien tiap tanda di raw (bobot / scale saat ditambahkan) disimpan,
+      sehingga kontribusinya bisa dihapus tanpa melihat riwayat
+    - raw dikalikan balik ke skala 1 hanya jika scale sudah sangat kecil
+      (jarang, O(jumlah fitur + jumlah tanda))
+
+    Norma v dihitung dari vektornya saat unit_vector (O(jumlah fitur), sekali
+    per query), bukan diperbarui inkremental: like lalu dislike produk dengan
+    baris TF-IDF identik (decay=1) meninggalkan sisa pembulatan di norma inkremental
+    (~1e-8) yang lolos batas absolut, sehingga vektor noise ikut dinormalisasi.
+    Profil dianggap kosong jika norma <= MIN_NORM relatif terhadap total bobot
+    interaksi (juga meluruh), karena sisa pembulatan sebanding total itu.
+
+    Ranking memakai vektor satuan profil (unit_vector) sebagai `preference`
+    di rank_positions: Similarity_norm = cosine tiap produk terhadap profil,
+    satu sparse mat-vec per query. Tanpa interaksi (atau jika like/dislike
+    saling meniadakan), ranking kembali ke mean similarity biasa.
+"""
+
+DECAY = 0.9
+LIKE_WEIGHT = 1.0
+DISLIKE_WEIGHT = -1.0
+# Batas bawah faktor skala sebelum raw dikalikan balik (raw ~ bobot / scale)
+MIN_SCALE = 1e-100
+# Norma di bawah MIN_NORM x total |bobot| (meluruh) dianggap profil kosong
+MIN_NORM = 1e-9
+
+class PreferenceProfile:
+
+    def __init__(self, n_features, decay=DECAY, content_hash=None):
+        if not 0.0 < decay <= 1.0:
+            raise ValueError(f"decay harus di (0, 1], bukan {decay!r}")
+        self.raw = np.zeros(n_features, dtype=np.float64)
+        self.scale = 1.0
+        # Total |bobot| interaksi dengan peluruhan yang sama seperti v (batas relatif profil kosong)
+        self.weight = 0.0
+        self.decay = float(decay)
+        # Hash katalog asal; profil tidak berlaku lagi jika katalog (kosakata TF-IDF) berubah
+        self.content_hash = content_hash
+        self.liked = set()
+        self.disliked = set()
+        # posisi -> (bobot, koefisien di raw) tanda yang sedang berlaku
+        self._marks = {}
+        self.interactions = 0
+
+    @classmethod
+    def for_catalog(cls, catalog, decay=DECAY):
+        return cls(catalog.tfidf_matrix.shape[1], decay, catalog.content_hash)
+
+    def matches(self, catalog):
+        return self.content_hash == catalog.content_hash and len(self.raw) == catalog.tfidf_matrix.shape[1]
+
+    @property
+    def norm(self):
+        # Dihitung dari vektor (bukan inkremental) agar pembatalan like/dislike benar-benar 0
+        return float(np.sqrt(self.raw @ self.raw)) * self.scale
+
+    def update(self, tfidf_matrix, position, weight):
+        # v <- decay * v + weight * x, x = baris TF-IDF produk (norma 1); O(nnz baris).
+        # Tanda sama = no-op; tanda berlawanan dihapus dulu dari v. True jika tanda diterapkan
+        # (False untuk tanda sama atau baris TF-IDF nol, yang tidak bisa memberi tanda)
+        previous = self._marks.get(position)
+        if previous is not None and previous[0] == weight:
+            return False
+        start, end = tfidf_matrix.indptr[position], tfidf_matrix.indptr[position + 1]
+        columns = tfidf_matrix.indices[start:end]
+        values = np.asarray(tfidf_matrix.data[start:end], dtype=np.float64)
+        length = np.sqrt(values @ values)
+        if length == 0:
+            return False
+        values = values / length
+
+        if previous is not None:
+            self.raw[columns] -= previous[1] * values
+        self.scale *= self.decay
+        self.weight = self.decay * self.weight + abs(weight)
+        if self.scale < MIN_SCALE:
+            self._rescale()
+        coefficient = weight / self.scale
+        self.raw[columns] += coefficient * values
+        self._marks[position] = (weight, coefficient)
+        self.interactions += 1
+        return True
+
+    def _rescale(self):
+        self.raw *= self.scale
+        self._marks = {position: (weight, coefficient * self.scale)
+                       for position, (weight, coefficient) in self._marks.items()}
+        self.scale = 1.0
+
+    def like(self, tfidf_matrix, position):
+        # Status tombol hanya berubah jika tanda diterapkan ke profil
+        if self.update(tfidf_matrix, position, LIKE_WEIGHT):
+            self.disliked.discard(position)
+            self.liked.add(position)
+
+    def dislike(self, tfidf_matrix, position):
+        if self.update(tfidf_matrix, position, DISLIKE_WEIGHT):
+            self.liked.discard(position)
+            self.disliked.add(position)
+
+    def vector(self):
+        # Profil v (belum dinormalisasi)
+        return self.raw * self.scale
+
+    def unit_vector(self):
+        # v / ||v||, atau None jika profil kosong
+        norm = self.norm
+        if norm <= MIN_NORM * self.weight:
+            return None
+        return self.raw * (self.scale / norm)
+
+def replay_profile(tfidf_matrix, history, decay=DECAY):
+    # Hitung ulang profil dari seluruh riwayat klik [(posisi, bobot), ...] dengan aturan tanda
+    # yang sama (ulang = no-op, pindah = hapus kontribusi lama): O(panjang riwayat x jumlah fitur), untuk cek
+    vector = np.zeros(tfidf_matrix.shape[1], dtype=np.float64)
+    marks = {}
+    step = 0
+    for position, weight in history:
+        previous = marks.get(position)
+        if previous is not None and previous[0] == weight:
+            continue
+        row = tfidf_matrix[position].toarray().ravel().astype(np.float64)
+        length = np.sqrt(row @ row)
+        if length == 0:
+            continue
+        row /= length
+        if previous is not None:
+            # Kontribusi lama sudah meluruh sebanyak interaksi sejak ditambahkan
+            vector -= previous[0] * decay ** (step - previous[1]) * row
+        vector = decay * vector + weight * row
+        step += 1
+        marks[position] = (weight, step)
+    return vector
+
+def personalized_query(catalog, query, profile):
+    """
+    Seperti live_query tetapi similarity terhadap profil preferensi sesi
+    (query.product diabaikan). Hasil tidak di-cache karena spesifik per sesi.
+    Profil kosong -> ranking biasa (mean similarity).
+    """
+    positions = filter_positions(catalog.facet_index, query.category, query.skin_type, query.gender,
+                                 query.usage_frequency, query.price_range)
+    preference = profile.unit_vector() if profile is not None else None
+    top = rank_positions(catalog.df, catalog.tfidf_matrix, positions, query.alpha, query.beta, query.gamma, query.k,
+                         profiles=catalog.profiles, preference=preference, columns=catalog.score_columns)
+    return len(positions), top
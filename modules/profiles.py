@@ -0,0 +1,207 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.tfidf_encoder import l2_normalize
+from modules.tracing import traced
+
+"""
+    Profil fitur unik: baris TF-IDF yang identik digabung jadi satu profil.
+
+    combined_features hanya dibentuk dari empat kolom berkardinalitas rendah
+    (Category, Skin_Type, Usage_Frequency, Ingredients), sehingga ribuan produk
+    punya baris TF-IDF yang sama persis (15.000 produk -> ~3.300 profil).
+
+    - profile_of : int32 (n_produk), profil tiap produk
+    - first      : int32 (n_profil), posisi produk pertama tiap profil
+    - counts     : jumlah produk per profil
+    - matrix     : baris profil yang sudah dinormalisasi L2 (n_profil x V)
+
+    Similarity dihitung pada profil lalu disebar ke produk:
+    - terhadap produk referensi: cosine profil referensi vs semua profil,
+      identik bit per bit dengan perhitungan per produk (normalisasi & dot
+      product per baris tidak bergantung baris lain)
+    - mean similarity: centroid dijumlahkan dari baris profil tiap produk subset
+      dengan urutan yang sama seperti mean(axis=0) scipy pada matrix per produk,
+      lalu dot product per profil; identik bit per bit dengan perhitungan per
+      produk untuk matrix float64 (dtype artefak TF-IDF), sehingga skor dan
+      urutan produk yang seri juga sama
+
+    Profil disimpan bersama artefak TF-IDF (profile_of.npy, profile_first.npy)
+    saat model dibangun; jika belum ada, dibangun dari matrix saat dipakai.
+"""
+
+PROFILE_OF_FILE = "profile_of.npy"
+PROFILE_FIRST_FILE = "profile_first.npy"
+CENTROID_CHUNK = 1 << 16
+
+class FeatureProfiles:
+
+    def __init__(self, profile_of, first, tfidf_matrix):
+        self.profile_of = profile_of
+        self.first = first
+        self.counts = np.bincount(profile_of, minlength=len(first))
+        self.matrix = l2_normalize(tfidf_matrix[np.asarray(first)])
+
+    @property
+    def n_profiles(self):
+        return len(self.first)
+
+    @property
+    def compression(self):
+        # Jumlah produk per profil (rasio kompresi baris)
+        return len(self.profile_of) / self.n_profiles if self.n_profiles else 1.0
+
+    def subset_counts(self, positions=None):
+        # Jumlah produk subset per profil
+        if positions is None:
+            return self.counts
+        return np.bincount(self.profile_of[positions], minlength=self.n_profiles)
+
+    def centroid(self, positions=None):
+        """
+        Rata-rata baris ternormalisasi produk subset, identik dengan
+        l2_normalize(tfidf_matrix[positions]).mean(axis=0) untuk matrix float64:
+        scipy mengalikan data dengan 1/n lalu menjumlahkan baris berurutan per
+        kolom, jadi elemen baris profil tiap produk ditambahkan (np.add.at,
+        berurutan) dengan urutan produk yang sama, per blok CENTROID_CHUNK produk.
+        """
+        profiles = self.profile_of if positions is None else self.profile_of[positions]
+        matrix = self.matrix
+        scaled = matrix.data * (1.0 / len(profiles))
+        starts, ends = matrix.indptr[:-1], matrix.indptr[1:]
+        centroid = np.zeros(matrix.shape[1], dtype=np.float64)
+        for begin in range(0, len(profiles), CENTROID_CHUNK):
+            chunk = profiles[begin:begin + CENTROID_CHUNK]
+            lengths = ends[chunk] - starts[chunk]
+            elements = np.repeat(starts[chunk] - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+            np.add.at(centroid, matrix.indices[elements], scaled[elements])
+        return centroid.astype(matrix.dtype, copy=False)
+
+    def profile_similarity(self, positions=None, reference=None, counts=None):
+        """
+        Similarity per profil: terhadap profil `reference`, atau mean similarity
+        terhadap subset `positions` (profil yang tidak ada di subset bernilai 0).
+        counts: subset_counts(positions) jika sudah dihitung pemanggil.
+        """
+        if reference is not None:
+            return (self.matrix[int(reference)] @ self.matrix.T).toarray().ravel()
+
+        counts = self.subset_counts(positions) if counts is None else counts
+        present = np.flatnonzero(counts)
+        sims = np.zeros(self.n_profiles, dtype=self.matrix.dtype)
+        sims[present] = self.matrix[present] @ self.centroid(positions)
+        return sims
+
+    @traced("rank.similarity")
+    def vector_similarity(self, vector, positions=None):
+        # Cosine tiap produk subset terhadap vektor dense bernorma 1 (satu mat-vec per profil)
+        sims = np.asarray(self.matrix @ vector).ravel()
+        return sims[self.profile_of if positions is None else self.profile_of[positions]]
+
+    @traced("rank.similarity")
+    def similarity(self, positions=None, local_idx=None):
+        """
+        Similarity tiap produk di subset (posisi global urut naik, None = seluruh
+        katalog), setara similarity_scores pada tfidf_matrix[positions].
+        local_idx: index lokal produk referensi di subset (opsional).
+        """
+        profiles = self.profile_of if positions is None else self.profile_of[positions]
+        if local_idx is not None:
+            return self.profile_similarity(reference=profiles[local_idx])[profiles]
+        return self.profile_similarity(positions)[profiles]
+
+def _row_hashes(tfidf_matrix):
+    # Hash 64-bit per baris dari pasangan (kolom, nilai); indeks kolom urut per baris
+    indptr = np.asarray(tfidf_matrix.indptr)
+    lengths = np.diff(indptr)
+    data = np.ascontiguousarray(tfidf_matrix.data, dtype=np.float64)
+    element = pd.util.hash_array(
+        pd.util.hash_array(np.asarray(tfidf_matrix.indices, dtype=np.uint64)) ^ data.view(np.uint64)
+    )
+    sums = np.zeros(len(lengths), dtype=np.uint64)
+    nonempty = lengths > 0
+    if element.size:
+        sums[nonempty] = np.add.reduceat(element, indptr[:-1][nonempty])
+    return pd.util.hash_array(sums ^ lengths.astype(np.uint64))
+
+def _same_rows(tfidf_matrix, rows, others):
+    # True jika baris rows[i] identik dengan baris others[i] (indeks & nilai)
+    indptr = np.asarray(tfidf_matrix.indptr)
+    lengths = np.diff(indptr)
+    if not np.array_equal(lengths[rows], lengths[others]):
+        return False
+    row_lengths = lengths[rows]
+    offsets = np.arange(row_lengths.sum()) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+    a = np.repeat(indptr[rows], row_lengths) + offsets
+    b = np.repeat(indptr[others], row_lengths) + offsets
+    return (np.array_equal(tfidf_matrix.indices[a], tfidf_matrix.indices[b])
+            and np.array_equal(tfidf_matrix.data[a], tfidf_matrix.data[b]))
+
+def build_profiles(tfidf_matrix):
+    # Kelompokkan baris identik; id profil urut kemunculan pertama
+    tfidf_matrix = tfidf_matrix.tocsr()
+    if not tfidf_matrix.has_sorted_indices:
+        tfidf_matrix = tfidf_matrix.sorted_indices()
+    codes, _ = pd.factorize(_row_hashes(tfidf_matrix))
+    n_profiles = int(codes.max()) + 1 if len(codes) else 0
+    first = np.full(n_profiles, len(codes), dtype=np.int64)
+    np.minimum.at(first, codes, np.arange(len(codes)))
+
+    if not _same_rows(tfidf_matrix, np.arange(len(codes)), first[codes]):
+        # Tabrakan hash (sangat jarang): kelompokkan ulang berdasarkan isi baris
+        keys = [
+            tfidf_matrix.indices[start:end].tobytes() + tfidf_matrix.data[start:end].tobytes()
+            for start, end in zip(tfidf_matrix.indptr[:-1], tfidf_matrix.indptr[1:])
+        ]
+        codes, _ = pd.factorize(pd.Series(keys, dtype=object))
+        first = np.full(int(codes.max()) + 1, len(codes), dtype=np.int64)
+        np.minimum.at(first, codes, np.arange(len(codes)))
+
+    return FeatureProfiles(codes.astype(np.int32), first.astype(np.int32), tfidf_matrix)
+
+def save_profiles(profiles, path):
+    # Hanya ke artefak TF-IDF lengkap (ada meta.json), FileNotFoundError jika tidak;
+    # import lokal karena model_store memakai modul ini saat menulis artefak
+    from modules.model_store import save_into_artifact
+
+    save_into_artifact(path, {PROFILE_OF_FILE: profiles.profile_of, PROFILE_FIRST_FILE: profiles.first})
+
+def load_profiles(path, tfidf_matrix, mmap=True):
+    mmap_mode = "r" if mmap else None
+    profile_of = np.load(os.path.join(path, PROFILE_OF_FILE), mmap_mode=mmap_mode)
+    first = np.load(os.path.join(path, PROFILE_FIRST_FILE), mmap_mode=mmap_mode)
+    return FeatureProfiles(profile_of, first, tfidf_matrix)
+
+def load_or_build_profiles(tfidf_matrix, path):
+    # path = folder artefak TF-IDF; artefak lama tanpa file profil dilengkapi saat pertama dipakai
+    from modules.model_store import artifact_complete
+
+    if path is None:
+        return build_profiles(tfidf_matrix)
+    if os.path.exists(os.path.join(path, PROFILE_OF_FILE)):
+        return load_profiles(path, tfidf_matrix)
+    profiles = build_profiles(tfidf_matrix)
+    if artifact_complete(path):
+        # Artefak yang sudah dihapus/tidak lengkap tidak dibuat ulang sepotong; profil tetap dipakai di memori
+        save_profiles(profiles, path)
+    return profiles
+
+def check_profiles(tfidf_matrix, profiles=None, positions=None):
+    # Bandingkan similarity via profil dengan perhitungan per produk (harus identik)
+    from modules.recommendation import similarity_scores
+
+    profiles = profiles or build_profiles(tfidf_matrix)
+    subset = tfidf_matrix if positions is None else tfidf_matrix[positions]
+    mean_equal = np.array_equal(profiles.similarity(positions), similarity_scores(subset))
+    ref_equal = np.array_equal(profiles.similarity(positions, 0), similarity_scores(subset, 0))
+    return {"products": len(profiles.profile_of), "profiles": profiles.n_profiles,
+            "compression": profiles.compression, "mean_equal": mean_equal, "reference_equal": ref_equal}
+
+if __name__ == "__main__":
+    from modules.model_store import load_or_build_tfidf
+
+    artifact = load_or_build_tfidf("data/skincare_products_clean.csv")
+    for name, value in check_profiles(artifact.matrix).items():
+        print(f"{name:<16}: {value}")
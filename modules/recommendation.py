@@ -1,6 +1,9 @@
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 import pandas as pd
 
+from modules.tfidf_encoder import cosine_similarity, l2_normalize
+from modules.tracing import traced
+
 """
     Sistem rekomendasi hybrid top-k berbasis rating, popularitas, dan similarity TF-IDF.
 
@@ -10,51 +13,295 @@ import pandas as pd
         alpha, beta, gamma : bobot untuk rating, popularitas, similarity
         k            : jumlah produk teratas yang ingin direkomendasikan
         user_index   : index global produk referensi (opsional), untuk preferensi user
+        sim_mode     : cara menghitung mean similarity
+                       - 'centroid' : dot product tiap baris dengan centroid subset, O(nnz) waktu & O(n) memori
+                       - 'pairwise' : rata-rata matrix cosine n x n (cara lama, O(n^2) memori)
+        profiles     : FeatureProfiles (opsional, rank_positions & hybrid_topk_batch), similarity
+                       'centroid' / produk referensi dihitung per profil fitur unik lalu
+                       disebar ke produk, tanpa slicing tfidf_matrix
+        preference   : vektor preferensi user (dense, panjang = jumlah fitur TF-IDF, norma 1;
+                       rank_positions), Similarity_norm = cosine tiap produk terhadap vektor ini
+                       (satu sparse mat-vec), menggantikan user_index & mean similarity
 
     Returns:
         DataFrame top-k produk dengan kolom weighted_score
+        (skor sama diurutkan berdasarkan urutan baris, deterministik)
+
+    Catatan: label index df dipakai sebagai posisi baris global di tfidf_matrix,
+    jadi subset hasil filter harus mempertahankan index aslinya.
+    Untuk pipeline filter -> ranking berbasis posisi, gunakan rank_positions.
 """
 
-def hybrid_topk(df, tfidf_matrix, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None):
+SIM_MODES = ('centroid', 'pairwise')
+SCORE_COLUMNS = ['Rating_norm', 'Popularity_norm', 'Similarity_norm', 'weighted_score']
 
-    if df.empty:
-        return pd.DataFrame()
-    
-    data = df.copy()
-    
+def mean_similarity(tfidf_subset):
+    # Rata-rata cosine baris i terhadap semua baris j = x_i . (1/n * sum_j x_j)
+    # dengan x sudah dinormalisasi L2, sehingga cukup satu dot product terhadap centroid
+    normed = l2_normalize(tfidf_subset)
+    centroid = np.asarray(normed.mean(axis=0)).ravel()
+    return np.asarray(normed @ centroid).ravel()
+
+def pairwise_mean_similarity(tfidf_subset):
+    # Cara lama: materialisasi matrix cosine n x n lalu rata-rata per baris
+    return cosine_similarity(tfidf_subset, tfidf_subset).mean(axis=1)
+
+@traced("rank.similarity")
+def similarity_scores(tfidf_subset, local_idx=None, sim_mode='centroid'):
+    if sim_mode not in SIM_MODES:
+        raise ValueError(f"sim_mode harus salah satu dari {SIM_MODES}, bukan {sim_mode!r}")
+
+    if local_idx is not None:
+        # similarity terhadap produk referensi user
+        return cosine_similarity(tfidf_subset[local_idx], tfidf_subset).flatten()
+    # tanpa produk referensi, pakai mean similarity
+    if sim_mode == 'centroid':
+        return mean_similarity(tfidf_subset)
+    return pairwise_mean_similarity(tfidf_subset)
+
+@traced("rank.similarity")
+def preference_similarity(tfidf_subset, preference):
+    # Cosine tiap baris terhadap vektor preferensi bernorma 1: satu sparse mat-vec
+    return np.asarray(l2_normalize(tfidf_subset) @ preference).ravel()
+
+def component_scores(rating, reviews):
     # --- Normalisasi rating dan popularity ---
     # Rating dibagi 5 agar dalam range [0,1]
-    data['Rating_norm'] = data['Rating'] / 5
+    rating_norm = rating / 5
 
     # Popularitas berdasarkan jumlah review, dinormalisasi dengan max review
-    max_reviews = data['Number_of_Reviews'].max()
-    data['Popularity_norm'] = data['Number_of_Reviews'] / max_reviews if max_reviews > 0 else 0
+    max_reviews = np.nanmax(reviews) if len(reviews) > 0 else 0
+    popularity_norm = reviews / max_reviews if max_reviews > 0 else np.zeros(len(reviews))
+    return rating_norm, popularity_norm
+
+def weighted_scores(rating_norm, popularity_norm, sim_scores, alpha, beta, gamma):
+    # Menggabungkan rating, popularitas, dan similarity sesuai bobot
+    return alpha * rating_norm + beta * popularity_norm + gamma * sim_scores
+
+def topk_indices(scores, k):
+    """
+    Index top-k skor tertinggi, urut turun. Skor sama diurutkan berdasarkan
+    index terkecil (deterministik, setara sort stabil).
+
+    argpartition mencari kandidat O(n), lalu hanya kandidat (k + skor seri di
+    batas) yang diurutkan.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.array([], dtype=np.int64)
 
-    # --- Similarity ---
+    # NaN selalu di urutan terakhir
+    keys = np.where(np.isnan(scores), -np.inf, scores)
+    if k < n:
+        kth = np.argpartition(-keys, k - 1)[:k]
+        threshold = keys[kth].min()
+        candidates = np.flatnonzero(keys >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -keys[candidates]))
+    return candidates[order[:k]]
+
+def score_columns(df, rows=None):
+    # (Rating, Number_of_Reviews) float untuk posisi rows (None = seluruh df);
+    # baris diambil dulu baru dikonversi, jadi subset kecil tidak mengonversi seluruh kolom
+    rating = df['Rating'].to_numpy()
+    reviews = df['Number_of_Reviews'].to_numpy()
+    if rows is not None:
+        rating = rating[rows]
+        reviews = reviews[rows]
+    return rating.astype(float, copy=False), reviews.astype(float, copy=False)
+
+def _weighted_topk(df, rows, sim_scores, alpha, beta, gamma, k, columns=None):
+    # rows: posisi baris df yang dinilai (None = seluruh df)
+    # columns: (rating, reviews) float seluruh katalog yang sudah di-cache (Catalog.score_columns)
+    if columns is None:
+        rating, reviews = score_columns(df, rows)
+    elif rows is None:
+        rating, reviews = columns
+    else:
+        rating, reviews = columns[0][rows], columns[1][rows]
+
+    rating_norm, popularity_norm = component_scores(rating, reviews)
+    scores = weighted_scores(rating_norm, popularity_norm, sim_scores, alpha, beta, gamma)
+
+    # --- Ambil top-k, DataFrame hanya dibuat untuk pemenang ---
+    top = topk_indices(scores, k)
+    return _winners_frame(df, rows, top, rating_norm, popularity_norm, sim_scores, scores)
+
+def score_frame(df, rows, rating_norm, popularity_norm, sim_scores, scores):
+    # Baris df (posisi) + kolom komponen skor; satu concat lebih murah dari empat assignment kolom
+    winners = df.iloc[rows]
+    existing = [col for col in SCORE_COLUMNS if col in winners.columns]
+    if existing:
+        winners = winners.drop(columns=existing)
+    components = pd.DataFrame(dict(zip(SCORE_COLUMNS, [rating_norm, popularity_norm, sim_scores, scores])),
+                              index=winners.index)
+    return pd.concat([winners, components], axis=1)
+
+def _winners_frame(df, rows, top, rating_norm, popularity_norm, sim_scores, scores):
+    return score_frame(df, top if rows is None else rows[top], rating_norm[top], popularity_norm[top],
+                       sim_scores[top], scores[top])
+
+def _resolve_positions(n_rows, positions, user_index):
+    # Kembalikan (positions, local_idx); positions None = seluruh katalog
+    if positions is not None:
+        positions = np.asarray(positions)
+        if len(positions) == n_rows:
+            # posisi unik & urut sepanjang katalog = seluruh katalog
+            positions = None
+
+    if positions is None:
+        local_idx = user_index if user_index is not None and 0 <= user_index < n_rows else None
+        return None, local_idx
+
+    local_idx = None
     if user_index is not None:
-        # mapping user_index global ke index lokal filtered df
-        if user_index in df.index:
-            local_idx = df.index.get_loc(user_index)
-            tfidf_subset = tfidf_matrix[df.index, :]
-            sim_scores = cosine_similarity(tfidf_subset[local_idx], tfidf_subset).flatten()
-        else:
-            # jika user_index tidak ada di subset, pakai mean similarity
-            tfidf_subset = tfidf_matrix[df.index, :]
-            sim_scores = cosine_similarity(tfidf_subset, tfidf_subset).mean(axis=1)
+        # binary search pada posisi yang sudah urut
+        loc = int(np.searchsorted(positions, user_index))
+        if loc < len(positions) and positions[loc] == user_index:
+            local_idx = loc
+    return positions, local_idx
+
+def _resolve_subset(tfidf_matrix, positions, user_index):
+    # Kembalikan (positions, tfidf_subset, local_idx); positions None = seluruh katalog
+    positions, local_idx = _resolve_positions(tfidf_matrix.shape[0], positions, user_index)
+    return positions, tfidf_matrix if positions is None else tfidf_matrix[positions], local_idx
+
+def _subset_similarity(tfidf_matrix, positions, user_index, sim_mode, profiles, preference=None):
+    # (positions, sim_scores) untuk subset; sim_scores None jika subset kosong
+    if preference is not None:
+        positions, _ = _resolve_positions(tfidf_matrix.shape[0], positions, None)
+        if positions is not None and len(positions) == 0:
+            return positions, None
+        if profiles is not None:
+            return positions, profiles.vector_similarity(preference, positions)
+        return positions, preference_similarity(tfidf_matrix if positions is None else tfidf_matrix[positions],
+                                                preference)
+
+    if profiles is not None and sim_mode == 'centroid':
+        positions, local_idx = _resolve_positions(tfidf_matrix.shape[0], positions, user_index)
+        if positions is not None and len(positions) == 0:
+            return positions, None
+        return positions, profiles.similarity(positions, local_idx)
+
+    positions, tfidf_subset, local_idx = _resolve_subset(tfidf_matrix, positions, user_index)
+    if tfidf_subset.shape[0] == 0:
+        return positions, None
+    return positions, similarity_scores(tfidf_subset, local_idx, sim_mode)
+
+@traced("rank")
+def rank_positions(df, tfidf_matrix, positions=None, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None, sim_mode='centroid',
+                   profiles=None, preference=None, columns=None):
+    """
+    Ranking hybrid untuk subset katalog yang dinyatakan sebagai posisi global.
+
+    df dan tfidf_matrix adalah katalog penuh (baris ke-i df = baris ke-i matrix),
+    positions adalah array posisi baris urut naik (hasil filter_positions) atau
+    None untuk seluruh katalog. TF-IDF matrix hanya di-slice sekali, dan tidak
+    di-slice sama sekali jika subset = seluruh katalog. user_index juga posisi global.
+    Dengan profiles (FeatureProfiles), similarity dihitung per profil fitur unik.
+    Dengan preference (vektor preferensi sesi, lihat modules/preference.py),
+    similarity = cosine terhadap vektor itu.
+    columns (Catalog.score_columns) = kolom Rating & Number_of_Reviews float
+    seluruh katalog yang sudah dikonversi, sehingga tiap query hanya mengambil
+    baris subset.
+    """
+    positions, sim_scores = _subset_similarity(tfidf_matrix, positions, user_index, sim_mode, profiles, preference)
+    if sim_scores is None:
+        return pd.DataFrame()
+
+    return _weighted_topk(df, positions, sim_scores, alpha, beta, gamma, k, columns)
+
+@traced("rank")
+def hybrid_topk(df, tfidf_matrix, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None, sim_mode='centroid'):
+
+    if df.empty:
+        return pd.DataFrame()
+
+    # Label index df dianggap posisi global baris di tfidf_matrix
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1 and len(df) == tfidf_matrix.shape[0]:
+        tfidf_subset = tfidf_matrix
     else:
         tfidf_subset = tfidf_matrix[df.index, :]
-        sim_scores = cosine_similarity(tfidf_subset, tfidf_subset).mean(axis=1)
 
-    # Normalisasi similarity
-    data['Similarity_norm'] = sim_scores
+    # mapping user_index global ke index lokal filtered df
+    local_idx = df.index.get_loc(user_index) if user_index is not None and user_index in df.index else None
 
-    # --- Weighted score ---
-    # Menggabungkan rating, popularitas, dan similarity sesuai bobot
-    data['weighted_score'] = (
-        alpha * data['Rating_norm'] +
-        beta  * data['Popularity_norm'] +
-        gamma * data['Similarity_norm']
-    )
-
-    # --- Ambil top-k produk berdasarkan weighted_score ---
-    return data.sort_values('weighted_score', ascending=False).head(k)
+    sim_scores = similarity_scores(tfidf_subset, local_idx, sim_mode)
+    return _weighted_topk(df, None, sim_scores, alpha, beta, gamma, k)
+
+def _subset_key(positions, user_index):
+    if positions is None:
+        return (None, user_index)
+    return (np.asarray(positions).tobytes(), user_index)
+
+@traced("rank")
+def hybrid_topk_batch(df, tfidf_matrix, queries, sim_mode='centroid', max_block_cells=1 << 24, profiles=None):
+    """
+    Ranking hybrid untuk banyak query sekaligus.
+
+    queries: list dict dengan key
+        positions  : posisi global subset (urut naik), None = seluruh katalog
+        alpha, beta, gamma, k : bobot dan jumlah rekomendasi (default sama dengan hybrid_topk)
+        user_index : posisi global produk referensi (opsional)
+
+    Komponen yang tidak bergantung bobot (rating, popularitas, similarity)
+    dihitung sekali per subset unik. Skor semua bobot untuk satu subset dihitung
+    sebagai perkalian bobot (Q x 3) dengan fitur (3 x n), diproses per blok query
+    agar ukuran matrix skor tidak melebihi max_block_cells.
+
+    Returns:
+        list DataFrame top-k, urut sesuai queries (hasil identik dengan rank_positions)
+    """
+    groups = {}
+    for qi, query in enumerate(queries):
+        key = _subset_key(query.get('positions'), query.get('user_index'))
+        groups.setdefault(key, []).append(qi)
+
+    results = [None] * len(queries)
+    rating_all, reviews_all = score_columns(df)
+
+    for query_ids in groups.values():
+        first = queries[query_ids[0]]
+        positions, sim_scores = _subset_similarity(
+            tfidf_matrix, first.get('positions'), first.get('user_index'), sim_mode, profiles)
+
+        if sim_scores is None:
+            for qi in query_ids:
+                results[qi] = pd.DataFrame()
+            continue
+
+        # --- Komponen independen bobot, sekali per subset ---
+        rating, reviews = (rating_all, reviews_all) if positions is None else (rating_all[positions], reviews_all[positions])
+        rating_norm, popularity_norm = component_scores(rating, reviews)
+        weights = np.array([
+            [queries[qi].get('alpha', 0.4), queries[qi].get('beta', 0.2), queries[qi].get('gamma', 0.4)]
+            for qi in query_ids
+        ])
+
+        # --- Skor (Q x 3) x (3 x n) per blok query ---
+        # Dijumlahkan per suku dengan urutan yang sama seperti weighted_scores
+        # supaya skor bit-identik dengan ranking per query
+        block = max(1, max_block_cells // len(sim_scores))
+        for start in range(0, len(query_ids), block):
+            block_ids = query_ids[start:start + block]
+            w = weights[start:start + block]
+            scores = (
+                w[:, 0:1] * rating_norm +
+                w[:, 1:2] * popularity_norm +
+                w[:, 2:3] * sim_scores
+            )
+            tops = [topk_indices(scores[j], queries[qi].get('k', 10)) for j, qi in enumerate(block_ids)]
+
+            # Satu DataFrame untuk semua pemenang di blok, lalu dipotong per query
+            top = np.concatenate(tops)
+            block_scores = np.concatenate([scores[j, t] for j, t in enumerate(tops)])
+            winners = score_frame(df, top if positions is None else positions[top], rating_norm[top],
+                                  popularity_norm[top], sim_scores[top], block_scores)
+            offset = 0
+            for qi, t in zip(block_ids, tops):
+                results[qi] = winners.iloc[offset:offset + len(t)]
+                offset += len(t)
+
+    return results
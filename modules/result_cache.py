@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from modules.user_filter import filter_positions
+
+"""
+    Cache hasil rekomendasi (filter + ranking) per query kanonik.
+
+    Pengguna praktis hanya memakai sedikit kombinasi facet (pilihan sidebar
+    terbatas), jadi hasil filter_positions + rank_positions disimpan di cache
+    LRU berbatas dengan TTL, dipakai bersama semua sesi/thread dalam satu proses.
+
+    Key kanonik (canonical_query):
+    - facet di-lowercase & strip, "all"/kosong = None (filter juga case-insensitive)
+    - rentang harga dipotong ke price_min/price_max katalog (tidak mengubah produk
+      yang lolos filter); selain itu dipakai persis. Nilai slider sudah berada di
+      grid PRICE_STEP sehingga query dari UI tetap berbagi entri, sedangkan rentang
+      bebas dari server.py mendapat entri sendiri dan tidak pernah kehilangan
+      produk di dalam rentang yang diminta
+    - bobot dibulatkan WEIGHT_DECIMALS desimal, k, produk referensi
+
+    Query kanonik itu juga yang dihitung, sehingga hasil dari cache selalu sama
+    dengan menghitung ulang query yang sama. Entri disimpan per isi katalog
+    (catalog.cache_key: content hash + compact, juga untuk katalog in-memory
+    tanpa CSV), karena katalog compact (float32) berbagi content hash dengan
+    katalog float64 tetapi skornya berbeda. Jika isi katalog berubah, key-nya
+    ikut berubah: entri lama tidak pernah dipakai lagi dan keluar lewat
+    LRU/TTL.
+
+    DataFrame hasil dipakai bersama, jangan diubah di tempat.
+"""
+
+PRICE_STEP = 5000.0
+WEIGHT_DECIMALS = 6
+CACHE_SIZE = 1024
+CACHE_TTL = 600.0
+
+Query = namedtuple(
+    "Query",
+    ["category", "skin_type", "gender", "usage_frequency", "price_range", "alpha", "beta", "gamma", "k", "product"],
+)
+
+def _facet(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return None if value in ("", "all") else value
+
+def clip_range(price_range, price_min, price_max):
+    # Potong ke rentang harga katalog; rentang terbalik dibiarkan (hasil kosong)
+    low, high = (float(p) for p in price_range)
+    if not (math.isfinite(low) and math.isfinite(high)):
+        raise ValueError(f"harga harus bilangan berhingga, bukan {price_range!r}")
+    if low > high:
+        return low, high
+    return float(min(max(low, price_min), price_max)), float(min(max(high, price_min), price_max))
+
+def canonical_query(catalog, category=None, skin_type=None, gender=None, usage_frequency=None,
+                    price_range=None, alpha=0.4, beta=0.2, gamma=0.4, k=10, product=None):
+    if price_range is None:
+        price_range = (catalog.price_min, catalog.price_max)
+    low, high = clip_range(price_range, catalog.price_min, catalog.price_max)
+    if not all(math.isfinite(float(w)) for w in (alpha, beta, gamma)):
+        raise ValueError(f"bobot harus bilangan berhingga, bukan {(alpha, beta, gamma)!r}")
+    return Query(
+        _facet(category), _facet(skin_type), _facet(gender), _facet(usage_frequency),
+        (low, high),
+        round(float(alpha), WEIGHT_DECIMALS), round(float(beta), WEIGHT_DECIMALS), round(float(gamma), WEIGHT_DECIMALS),
+        int(k), None if product is None else int(product),
+    )
+
+def run_query(catalog, query):
+    # Pipeline tanpa cache: (jumlah produk lolos filter, DataFrame top-k)
+    # Query bobot default + rentang harga penuh dijawab dari materialized view jika sudah dibangun
+    views = catalog.views
+    if views is not None:
+        served = views.lookup(catalog, query)
+        if served is not None:
+            return served
+    return live_query(catalog, query)
+
+def live_query(catalog, query):
+    # Filter + ranking live (tanpa view)
+    positions = filter_positions(catalog.facet_index, query.category, query.skin_type, query.gender,
+                                 query.usage_frequency, query.price_range)
+    # Threshold algorithm untuk subset besar, full scan untuk subset kecil; hasil = rank_positions(profiles=...)
+    top = catalog.topk_index.rank(catalog.df, positions, alpha=query.alpha, beta=query.beta, gamma=query.gamma,
+                                  k=query.k, user_index=query.product)
+    return len(positions), top
+
+class ResultCache:
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        # Entri di-key (catalog key, query)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, catalog_key, query):
+        with self._lock:
+            key = (catalog_key, query)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, catalog_key, query, value):
+        with self._lock:
+            key = (catalog_key, query)
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "expirations": self.expirations,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+        }
+
+# Cache bersama per proses (Streamlit & server.py)
+RESULT_CACHE = ResultCache()
+
+def cached_query(catalog, query, cache=RESULT_CACHE):
+    # Returns (matched, top, hit)
+    if cache is None:
+        return (*run_query(catalog, query), False)
+    value = cache.get(catalog.cache_key, query)
+    if value is not None:
+        return (*value, True)
+    value = run_query(catalog, query)
+    cache.put(catalog.cache_key, query, value)
+    return (*value, False)
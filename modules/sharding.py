@@ -0,0 +1,383 @@
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.profiles import build_profiles
+from modules.recommendation import score_frame, topk_indices, weighted_scores
+from modules.tracing import traced
+from modules.user_filter import FacetIndex, filter_positions
+
+"""
+    Katalog ter-shard: filter + similarity + ranking scatter-gather di beberapa
+    proses worker.
+
+    Katalog dibagi menjadi shard independen (hash Product_Name + Brand, atau per
+    Category). Tiap shard memegang potongan df, potongan TF-IDF matrix (sebagai
+    profil fitur unik lokal, modules/profiles.py) dan FacetIndex miliknya
+    sendiri di proses worker terpisah. Koordinator tidak menyimpan df, matrix,
+    maupun profil: hanya posisi global & kategori per shard. Satu query
+    dijalankan dalam tiga fase:
+
+    1. scatter: tiap shard memfilter produknya lalu mengembalikan jumlah produk
+       lolos filter, jumlah parsial centroid (sum baris TF-IDF ternormalisasi
+       subset, vektor sepanjang kosakata), max Number_of_Reviews subset, dan
+       baris ternormalisasi produk referensi (jika lolos filter di shard itu)
+    2. koordinator menggabungkan statistik global: centroid = jumlah semua
+       parsial / jumlah produk (atau baris referensi), max review = max dari
+       max. Tiap shard menghitung similarity profil lokalnya terhadap vektor itu
+       (mat-vec di worker), menilai produknya dengan normalisasi global, lalu
+       mengembalikan top-k lokal
+    3. gather: top-k lokal digabung urut (-skor, posisi global); baris
+       DataFrame hanya diambil untuk pemenang global dari shard pemiliknya
+
+    Normalisasi popularitas & centroid mean similarity sama dengan katalog
+    utuh, jadi top-k gabungan sama dengan rank_positions(profiles=...). Hanya
+    urutan penjumlahan centroid yang berbeda (pembulatan ~1e-16), sehingga
+    skor bisa berbeda di digit terakhir dan produk yang skornya seri dalam
+    TIE_TOLERANCE boleh bertukar tempat (same_topk); check_sharded memeriksa
+    itu, diuji di tests/test_sharding.py.
+
+    Data utuh hanya dibutuhkan saat membagi (ShardedCatalog.split). Untuk
+    katalog yang tidak muat satu proses, potongan bisa dibaca terpisah dan
+    diberikan satu per satu ke ShardedCatalog(parts): tiap potongan langsung
+    dikirim ke worker-nya dan tidak disimpan koordinator.
+
+    Satu query menyimpan state fase 1 di tiap shard dan memakai pipe yang
+    sama, jadi rank() diserialkan dengan lock: aman dipanggil dari banyak
+    thread (mis. ThreadingHTTPServer), tetapi query antar thread tidak berjalan
+    paralel.
+
+    Contoh:
+        with ShardedCatalog.split(df, tfidf_matrix, n_shards=4) as sharded:
+            matched, top = sharded.run_query(query)
+"""
+
+SHARD_KEYS = ("hash", "category")
+# Selisih skor maksimum yang dianggap seri saat dibandingkan dengan jalur satu proses
+TIE_TOLERANCE = 1e-12
+
+def shard_assignment(df, n_shards, by="hash"):
+    # Nomor shard tiap baris df
+    if by not in SHARD_KEYS:
+        raise ValueError(f"by harus salah satu dari {SHARD_KEYS}, bukan {by!r}")
+    if by == "hash":
+        keys = df[["Product_Name", "Brand"]].astype(str)
+        return (pd.util.hash_pandas_object(keys, index=False).to_numpy() % n_shards).astype(np.int64)
+
+    # Category utuh ke satu shard; kategori terbesar dulu ke shard paling kosong
+    codes, uniques = pd.factorize(_categories(df))
+    sizes = np.bincount(codes, minlength=len(uniques))
+    load = np.zeros(n_shards, dtype=np.int64)
+    shard_of_code = np.zeros(len(uniques), dtype=np.int64)
+    for code in np.argsort(-sizes, kind="stable"):
+        shard_of_code[code] = int(np.argmin(load))
+        load[shard_of_code[code]] += sizes[code]
+    return shard_of_code[codes]
+
+def _categories(df):
+    return df["Category"].fillna("").astype(str).str.strip().str.lower()
+
+class Shard:
+    """
+    Satu potongan katalog. positions = posisi global baris shard (urut naik),
+    tfidf_matrix = baris TF-IDF shard (baris ke-i = baris ke-i df); disimpan
+    sebagai profil fitur unik lokal.
+    """
+
+    def __init__(self, df, positions, tfidf_matrix):
+        self.df = df
+        self.positions = positions
+        self.profiles = build_profiles(tfidf_matrix)
+        self.facet_index = FacetIndex(df)
+        self.rating = df["Rating"].to_numpy(dtype=float)
+        self.reviews = df["Number_of_Reviews"].to_numpy(dtype=float)
+        self._local = None
+        self._top = None
+
+    def scatter(self, category, skin_type, gender, usage_frequency, price_range, user_index):
+        # Fase 1: (jumlah lolos filter, jumlah parsial centroid, max review, baris referensi atau None)
+        local = filter_positions(self.facet_index, category, skin_type, gender, usage_frequency, price_range)
+        self._local = local
+        self._top = None
+        reviews = self.reviews[local]
+        max_reviews = np.nan if np.isnan(reviews).all() else np.nanmax(reviews)
+        profile_of = self.profiles.profile_of
+        matrix = self.profiles.matrix
+        reference = None
+        if user_index is not None:
+            loc = int(np.searchsorted(self.positions, user_index))
+            if loc < len(self.positions) and self.positions[loc] == user_index:
+                inside = np.searchsorted(local, loc)
+                if inside < len(local) and local[inside] == loc:
+                    reference = matrix[int(profile_of[loc])].toarray().ravel()
+        # Sum baris ternormalisasi subset = jumlah produk per profil x baris profil
+        counts = np.bincount(profile_of[local], minlength=self.profiles.n_profiles)
+        present = np.flatnonzero(counts)
+        partial = np.asarray(matrix[present].T @ counts[present].astype(matrix.dtype)).ravel()
+        return len(local), partial, max_reviews, reference
+
+    def gather(self, vector, max_reviews, alpha, beta, gamma, k):
+        # Fase 2: similarity terhadap centroid/referensi global + top-k lokal -> (posisi global, skor) atau None
+        local = self._local
+        self._local = None
+        if local is None or len(local) == 0:
+            return None
+        rating_norm = self.rating[local] / 5
+        reviews = self.reviews[local]
+        popularity_norm = reviews / max_reviews if max_reviews > 0 else np.zeros(len(local))
+        sim_scores = self.profiles.vector_similarity(vector, local)
+        scores = weighted_scores(rating_norm, popularity_norm, sim_scores, alpha, beta, gamma)
+        top = topk_indices(scores, k)
+        self._top = (local[top], rating_norm[top], popularity_norm[top], sim_scores[top], scores[top])
+        return self.positions[local[top]], scores[top]
+
+    def winners(self, take):
+        # Fase 3: DataFrame untuk entri top-k lokal ke-`take` yang masuk top-k global
+        rows, *components = (values[take] for values in self._top)
+        self._top = None
+        return score_frame(self.df, rows, *components)
+
+def _serve(conn):
+    # Loop proses worker: bangun Shard dari data pertama yang diterima, lalu
+    # terima (nama method, argumen) dan kirim hasil atau exception
+    shard = Shard(*conn.recv())
+    conn.send((True, None))
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        method, args = message
+        try:
+            conn.send((True, getattr(shard, method)(*args)))
+        except Exception as exc:
+            conn.send((False, exc))
+    conn.close()
+
+class _ShardProcess:
+    # Data shard dikirim lewat pipe setelah proses jalan, jadi proses utama tidak ikut menyimpannya
+
+    def __init__(self, context, data, categories):
+        self.categories = categories
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.conn.send(data)
+
+    def send(self, method, *args):
+        self.conn.send((method, args))
+
+    def result(self):
+        ok, value = self.conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join(timeout=5)
+        self.conn.close()
+
+class _LocalShard:
+    # Shard di proses yang sama (processes=False), antarmuka sama dengan _ShardProcess
+
+    def __init__(self, data, categories):
+        self.shard = Shard(*data)
+        self.categories = categories
+        self._result = None
+
+    def send(self, method, *args):
+        self._result = getattr(self.shard, method)(*args)
+
+    def result(self):
+        result, self._result = self._result, None
+        return result
+
+    def close(self):
+        pass
+
+class ShardedCatalog:
+    """
+    Koordinator scatter-gather. parts = iterable (df shard, posisi global urut
+    naik, TF-IDF shard), dibaca satu per satu dan langsung dikirim ke worker.
+    by="category" mengarahkan query ber-Category hanya ke shard yang memegangnya.
+    processes=False menjalankan semua shard di proses ini (untuk cek & debug).
+    """
+
+    def __init__(self, parts, by="hash", processes=True):
+        if by not in SHARD_KEYS:
+            raise ValueError(f"by harus salah satu dari {SHARD_KEYS}, bukan {by!r}")
+        self.by = by
+        start = time.perf_counter()
+        context = multiprocessing.get_context()
+        self.shards = []
+        sizes = []
+        for df, positions, tfidf_matrix in parts:
+            categories = set(_categories(df)) if by == "category" else None
+            data = (df, np.asarray(positions), tfidf_matrix)
+            self.shards.append(_ShardProcess(context, data, categories) if processes else _LocalShard(data, categories))
+            sizes.append(len(positions))
+        # Tunggu semua worker selesai membangun profil & FacetIndex shard-nya (paralel)
+        for shard in self.shards:
+            shard.result()
+        self.build_seconds = time.perf_counter() - start
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.n_rows = int(self.sizes.sum())
+        # Satu query scatter-gather sekaligus per koordinator (state shard & pipe bersama)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def split(cls, df, tfidf_matrix, n_shards=4, by="hash", processes=True):
+        # Bagi katalog utuh (baris ke-i df = baris ke-i tfidf_matrix) menjadi n_shards
+        assignment = shard_assignment(df, n_shards, by)
+        tfidf_matrix = tfidf_matrix.tocsr()
+
+        def parts():
+            for shard_id in range(n_shards):
+                positions = np.flatnonzero(assignment == shard_id)
+                yield df.iloc[positions], positions, tfidf_matrix[positions]
+
+        return cls(parts(), by, processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            for shard in self.shards:
+                shard.close()
+            self.shards = []
+
+    def _targets(self, category):
+        # Partisi per Category: hanya shard yang memegang kategori itu yang ditanya
+        if self.by != "category" or category is None:
+            return self.shards
+        category = str(category).strip().lower()
+        return [shard for shard in self.shards if category in shard.categories]
+
+    @traced("rank.sharded")
+    def rank(self, category=None, skin_type=None, gender=None, usage_frequency=None, price_range=None,
+             alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None):
+        """
+        (jumlah produk lolos filter, DataFrame top-k), sama dengan filter_positions
+        + rank_positions(profiles=...) pada katalog utuh sampai skor seri dalam
+        TIE_TOLERANCE. Thread-safe (diserialkan).
+        """
+        with self._lock:
+            return self._rank(category, skin_type, gender, usage_frequency, price_range, alpha, beta, gamma, k,
+                              user_index)
+
+    def _rank(self, category, skin_type, gender, usage_frequency, price_range, alpha, beta, gamma, k, user_index):
+        targets = self._targets(category)
+        for shard in targets:
+            shard.send("scatter", category, skin_type, gender, usage_frequency, price_range, user_index)
+        stats = [shard.result() for shard in targets]
+        matched = sum(stat[0] for stat in stats)
+        if matched == 0:
+            return 0, pd.DataFrame()
+
+        # --- Statistik global: centroid dari jumlah parsial tiap shard, atau baris referensi ---
+        max_reviews = np.fmax.reduce([stat[2] for stat in stats])
+        vector = next((stat[3] for stat in stats if stat[3] is not None), None)
+        if vector is None:
+            vector = np.sum([stat[1] for stat in stats], axis=0) * (1.0 / matched)
+
+        # Shard tanpa produk lolos filter mengembalikan None (tetap dipanggil untuk mengosongkan state fase 1)
+        for shard in targets:
+            shard.send("gather", vector, max_reviews, alpha, beta, gamma, k)
+        partials = [(shard, partial) for shard, partial in ((shard, shard.result()) for shard in targets)
+                    if partial is not None]
+
+        # --- Merge top-k lokal: skor turun, posisi global naik (NaN di akhir) ---
+        positions = np.concatenate([partial[0] for _, partial in partials])
+        scores = np.concatenate([partial[1] for _, partial in partials])
+        source = np.repeat(np.arange(len(partials)), [len(partial[0]) for _, partial in partials])
+        rank_in_shard = np.concatenate([np.arange(len(partial[0])) for _, partial in partials])
+        keys = np.where(np.isnan(scores), -np.inf, scores)
+        order = np.lexsort((positions, -keys))[:k]
+
+        # --- Baris DataFrame hanya diambil untuk pemenang global, dari shard pemiliknya ---
+        winners = source[order]
+        senders = []
+        for i in np.unique(winners):
+            partials[i][0].send("winners", rank_in_shard[order[winners == i]])
+            senders.append(partials[i][0])
+        frames = [shard.result() for shard in senders]
+        # Frame tersusun per shard (urut peringkat di dalamnya); kembalikan ke urutan peringkat global
+        return matched, pd.concat(frames).iloc[np.argsort(np.argsort(winners, kind="stable"))]
+
+    def run_query(self, query):
+        # Query kanonik result_cache -> (jumlah produk lolos filter, DataFrame top-k)
+        return self.rank(query.category, query.skin_type, query.gender, query.usage_frequency, query.price_range,
+                         query.alpha, query.beta, query.gamma, query.k, query.product)
+
+def _tied(a, b, tolerance):
+    return abs(a - b) <= tolerance or (np.isnan(a) and np.isnan(b))
+
+def same_topk(top, expected, tolerance=TIE_TOLERANCE, ranked=None):
+    """
+    True jika top sama dengan expected (top-k jalur satu proses) kecuali urutan
+    produk yang skornya seri: skor per peringkat sama dalam toleransi dan tiap
+    kelompok peringkat yang skornya seri di expected berisi posisi yang sama.
+    Kelompok seri terakhir (di batas k) boleh berisi produk lain yang seri di
+    luar expected; skornya diperiksa di ranked (peringkat satu proses yang lebih
+    panjang, mis. seluruh subset). Tanpa ranked posisinya harus sama.
+    """
+    if len(top) != len(expected) or top.index.has_duplicates:
+        return False
+    if len(top) == 0:
+        return True
+    expected_scores = expected["weighted_score"].to_numpy(dtype=float)
+    if not np.allclose(top["weighted_score"].to_numpy(dtype=float), expected_scores,
+                       rtol=0, atol=tolerance, equal_nan=True):
+        return False
+
+    # Kelompok seri: peringkat berurutan yang skornya dalam toleransi dari awal kelompok
+    starts = [0]
+    for i in range(1, len(expected_scores)):
+        if not _tied(expected_scores[i], expected_scores[starts[-1]], tolerance):
+            starts.append(i)
+    bounds = starts + [len(expected_scores)]
+    ids, expected_ids = top.index.to_numpy(), expected.index.to_numpy()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        extra = set(ids[start:end]) - set(expected_ids[start:end])
+        if not extra:
+            continue
+        if end < len(expected_scores) or ranked is None:
+            return False
+        ranked_scores = ranked["weighted_score"]
+        if any(position not in ranked_scores.index
+               or not _tied(float(ranked_scores[position]), expected_scores[start], tolerance)
+               for position in extra):
+            return False
+    return True
+
+def check_sharded(catalog, sharded, queries):
+    # Bandingkan dengan jalur satu proses -> (query identik persis, query berbeda di luar seri skor)
+    from modules.recommendation import rank_positions
+
+    identical = mismatches = 0
+    for query in queries:
+        positions = filter_positions(catalog.facet_index, query.category, query.skin_type, query.gender,
+                                     query.usage_frequency, query.price_range)
+        expected = rank_positions(catalog.df, catalog.tfidf_matrix, positions, query.alpha, query.beta, query.gamma,
+                                  query.k, query.product, profiles=catalog.profiles, columns=catalog.score_columns)
+        matched, top = sharded.run_query(query)
+        if matched != len(positions):
+            mismatches += 1
+        elif not same_topk(top, expected):
+            # Produk seri di batas k bisa berbeda: periksa skornya di peringkat seluruh subset
+            ranked = rank_positions(catalog.df, catalog.tfidf_matrix, positions, query.alpha, query.beta,
+                                    query.gamma, len(positions), query.product, profiles=catalog.profiles,
+                                    columns=catalog.score_columns)
+            mismatches += not same_topk(top, expected, ranked=ranked)
+        elif top.index.equals(expected.index):
+            identical += 1
+    return identical, mismatches
@@ -0,0 +1,165 @@
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, issparse
+
+"""
+    Encoder TF-IDF ringan (NumPy/SciPy saja) dari vocabulary & idf tersimpan.
+
+    Mereproduksi TfidfVectorizer(stop_words='english').transform dari
+    scikit-learn untuk artefak model_store:
+    - lowercase, token = regex (?u)\\b\\w\\w+\\b, hanya term di vocabulary
+      (stop words sudah tidak ada di vocabulary hasil fit)
+    - tf = jumlah kemunculan, dikali idf (smooth idf dari fit)
+    - normalisasi L2 per baris dengan urutan penjumlahan yang sama seperti
+      sklearn (indeks kolom urut), sehingga hasilnya identik bit per bit
+
+    l2_normalize dan cosine_similarity adalah pengganti sklearn.preprocessing.normalize
+    dan sklearn.metrics.pairwise.cosine_similarity untuk matrix sparse dengan hasil
+    identik, sehingga jalur aplikasi (load katalog, filter, ranking) tidak perlu
+    meng-import scikit-learn. sklearn hanya di-import saat fitting vocabulary
+    (precompute_similarity.fit_tfidf) atau verifikasi.
+
+    Teks katalog sangat berulang (kombinasi kategori, skin type, usage,
+    ingredient), jadi tokenisasi dilakukan sekali per teks unik. Teks kosong
+    (None/NaN) diperlakukan sebagai "" seperti normalize_catalog.
+
+    Jalur aplikasi memuat matrix TF-IDF langsung dari artefak, jadi
+    TfidfEncoder saat ini hanya dipakai untuk verifikasi (tests/test_tfidf_encoder.py)
+    & benchmark (`python benchmark.py startup`); yang dipakai runtime adalah l2_normalize
+    dan cosine_similarity.
+
+    Cek kesetaraan dengan sklearn pada katalog:
+        python -m modules.tfidf_encoder
+"""
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+def l2_normalize(matrix):
+    """
+    Salinan CSR dengan tiap baris dinormalisasi L2, setara
+    sklearn.preprocessing.normalize(matrix, norm='l2') untuk input sparse:
+    jumlah kuadrat dihitung berurutan per baris (urutan data tersimpan),
+    baris nol dibiarkan nol. Identik bit per bit untuk float64 (dtype artefak
+    TF-IDF); input float32 tetap float32 tetapi bisa berbeda 1 ulp dari sklearn.
+    """
+    x = csr_matrix(matrix, copy=True)
+    if x.dtype not in (np.float32, np.float64):
+        x = x.astype(np.float64)
+    lengths = np.diff(x.indptr)
+    starts = x.indptr[:-1]
+
+    # Penjumlahan kolom-ke-kolom untuk semua baris sekaligus = loop berurutan per baris
+    # (baris diurutkan dari yang terpanjang: baris yang masih punya elemen ke-j selalu prefix)
+    order = np.argsort(-lengths, kind='stable')
+    active_counts = np.searchsorted(-lengths[order], -np.arange(lengths.max(initial=0)), side='left')
+    sums = np.zeros(x.shape[0], dtype=x.dtype)
+    for j, count in enumerate(active_counts):
+        rows = order[:count]
+        values = x.data[starts[rows] + j]
+        sums[rows] += values * values
+
+    norms = np.sqrt(sums)
+    norms[norms == 0] = 1
+    x.data /= np.repeat(norms, lengths)
+    return x
+
+def cosine_similarity(x, y=None):
+    # Setara sklearn cosine_similarity untuk input sparse: dense (n_x x n_y)
+    x_normed = l2_normalize(x)
+    y_normed = x_normed if y is None or y is x else l2_normalize(y)
+    return (x_normed @ y_normed.T).toarray()
+
+class TfidfEncoder:
+
+    def __init__(self, vocabulary, idf):
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        return cls(artifact.vocabulary, artifact.idf)
+
+    @property
+    def n_features(self):
+        return len(self.idf)
+
+    def term_ids(self, text):
+        return [self.vocabulary[token] for token in TOKEN_PATTERN.findall(text.lower()) if token in self.vocabulary]
+
+    def _counts(self, texts):
+        # Matrix jumlah kemunculan term (int64), indeks kolom urut per baris
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            counts = Counter(self.term_ids(text))
+            for term in sorted(counts):
+                indices.append(term)
+                data.append(counts[term])
+            indptr.append(len(indices))
+        return csr_matrix(
+            (np.asarray(data, dtype=np.int64), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), self.n_features),
+        )
+
+    def transform(self, texts):
+        if isinstance(texts, str):
+            raise ValueError("texts harus berupa iterable string, bukan satu string")
+        # None/NaN -> "" sebelum factorize: kode -1 akan mengambil baris teks unik terakhir
+        codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object).fillna(''))
+        counts = self._counts(uniques)
+
+        weighted = counts.astype(np.float64)
+        weighted.data *= self.idf[weighted.indices]
+        encoded = l2_normalize(weighted)
+        # Baris untuk tiap teks input (teks sama -> baris sama)
+        return encoded[codes]
+
+def max_abs_diff(a, b):
+    # Selisih absolut terbesar antara dua matrix (sparse/dense) berukuran sama
+    diff = a - b
+    if issparse(diff):
+        return float(abs(diff).max()) if diff.nnz else 0.0
+    return float(np.abs(diff).max()) if diff.size else 0.0
+
+def check_equivalence(csv_path="data/skincare_products_clean.csv"):
+    # Bandingkan encoder, l2_normalize & cosine_similarity dengan scikit-learn pada katalog
+    from sklearn.metrics.pairwise import cosine_similarity as sk_cosine_similarity
+    from sklearn.preprocessing import normalize as sk_normalize
+
+    from modules.model_store import load_or_build_tfidf, load_vectorizer
+
+    artifact = load_or_build_tfidf(csv_path, mmap=False)
+    texts = pd.read_csv(csv_path, usecols=['combined_features'])['combined_features']
+    encoded = TfidfEncoder.from_artifact(artifact).transform(texts)
+    expected = load_vectorizer(artifact).transform(texts)
+
+    stored = artifact.matrix
+    subset = stored[::7]
+    result = {
+        "rows": len(texts),
+        "transform_equal": bool(
+            np.array_equal(encoded.indptr, expected.indptr) and np.array_equal(encoded.indices, expected.indices)
+            and np.array_equal(encoded.data, expected.data)
+        ),
+        "transform_max_diff": max_abs_diff(encoded, expected),
+        # Artefak disimpan dari fit_transform sklearn, yang sendiri berbeda <= 1 ulp dari transform
+        "stored_max_diff": max_abs_diff(encoded, stored),
+        "normalize_equal": bool(np.array_equal(l2_normalize(subset).toarray(), sk_normalize(subset).toarray())),
+        "cosine_equal": bool(np.array_equal(cosine_similarity(stored[:1], stored),
+                                            sk_cosine_similarity(stored[:1], stored))),
+    }
+    return result
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cek kesetaraan encoder TF-IDF ringan dengan scikit-learn")
+    parser.add_argument("--csv", default="data/skincare_products_clean.csv")
+    args = parser.parse_args()
+
+    for name, value in check_equivalence(args.csv).items():
+        print(f"{name:<24}: {value}")
@@ -0,0 +1,318 @@
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from modules.recommendation import component_scores, score_frame, topk_indices, weighted_scores
+from modules.tracing import traced
+
+"""
+    Top-k hybrid dengan threshold algorithm (Fagin) di atas komponen skor yang
+    sudah diurutkan.
+
+    Skor = alpha * Rating/5 + beta * reviews/max_reviews + gamma * similarity.
+    Rating dan jumlah review statis per produk, jadi produk diurutkan sekali
+    (turun) per komponen. Similarity per query dihitung per profil fitur unik
+    (modules/profiles.py), lalu profil diurutkan turun; produk tiap profil
+    dibaca berurutan dari daftar produk per profil.
+
+    Tiap putaran membaca blok berikutnya dari ketiga daftar (sorted access,
+    hanya produk di subset), menghitung skor penuh produk yang baru terlihat,
+    lalu menghitung threshold = skor gabungan nilai terakhir tiap daftar.
+    Produk yang belum terlihat skornya <= threshold (bobot non-negatif, dan
+    pembulatan float monoton), sehingga pencarian berhenti begitu skor ke-k
+    > threshold. Kondisi strict (>) agar produk belum terlihat yang skornya
+    seri dengan skor ke-k (dan posisinya lebih kecil) tidak terlewat: hasil
+    identik dengan rank_positions(..., profiles=...) termasuk urutan seri.
+
+    Full scan (seperti rank_positions) dipakai jika:
+    - subset lebih kecil dari min_rows (overhead per putaran lebih mahal dari
+      scan vektor) atau dari min_fraction katalog (filter selektif: sorted
+      access global lebih banyak melewati produk di luar subset)
+    - ada bobot negatif/NaN atau Rating/Number_of_Reviews NaN (syarat TA tidak
+      terpenuhi; juga jika dipaksa force="threshold")
+    - entri yang sudah dibaca melebihi max_examined_fraction subset
+
+    Dengan batas bawaan, katalog di bawah 100k baris (termasuk data bawaan
+    ~15k produk) selalu memakai full scan: diukur dengan `benchmark.py
+    threshold`, threshold algorithm yang dipaksa pada 15k baris justru ~0.8x
+    lebih lambat dari scan, dan baru menang mulai ~150k baris tanpa filter.
+    Daftar terurut baru dibangun saat query pertama yang memakai threshold
+    algorithm, jadi katalog kecil tidak membayar biaya sort-nya.
+
+    Counter instrumentasi: TopkStats per query (rows_examined = entri daftar
+    terurut yang dibaca termasuk yang dilewati, rows_scored = produk yang
+    dihitung skornya) dan total kumulatif di ThresholdIndex.stats().
+"""
+
+TopkStats = namedtuple("TopkStats", ["method", "subset_size", "rows_examined", "rows_scored", "rounds"])
+
+MIN_ROWS = 100_000
+MIN_FRACTION = 0.5
+MAX_EXAMINED_FRACTION = 0.5
+BLOCK = 256
+FORCE_CHOICES = (None, "threshold", "scan")
+
+class _StaticList:
+    # Sorted access ke daftar global (urut turun) yang dibatasi mask subset
+
+    def __init__(self, order, values, mask):
+        self.order = order
+        self.values = values
+        self.mask = mask
+        self.pointer = 0
+        self.examined = 0
+        self.last = values[order[0]] if len(order) else 0.0
+        self.exhausted = len(order) == 0
+
+    def next_block(self, size):
+        members = []
+        found = 0
+        scan = size
+        while found < size and self.pointer < len(self.order):
+            chunk = self.order[self.pointer:self.pointer + scan]
+            self.pointer += len(chunk)
+            self.examined += len(chunk)
+            if self.mask is not None:
+                chunk = chunk[self.mask[chunk]]
+            members.append(chunk)
+            found += len(chunk)
+            scan *= 2
+        self.exhausted = self.pointer >= len(self.order)
+        block = np.concatenate(members) if members else self.order[:0]
+        if len(block):
+            self.last = self.values[block[-1]]
+        return block
+
+class _ProfileList:
+    # Sorted access similarity: profil urut turun, produk subset per profil urut posisi
+
+    def __init__(self, index, sims, counts, mask):
+        present = np.flatnonzero(counts)
+        self.profiles = present[np.argsort(-sims[present], kind='stable')]
+        self.sims = sims
+        self.counts = counts
+        self.index = index
+        self.mask = mask
+        self.pointer = 0
+        self.examined = 0
+        self.last = sims[self.profiles[0]] if len(self.profiles) else 0.0
+        self.exhausted = len(self.profiles) == 0
+
+    def next_block(self, size):
+        # Ambil profil berikutnya sampai jumlah produk subset >= size
+        cumulative = np.cumsum(self.counts[self.profiles[self.pointer:]])
+        take = int(np.searchsorted(cumulative, size)) + 1
+        block_profiles = self.profiles[self.pointer:self.pointer + take]
+        self.pointer += len(block_profiles)
+        self.exhausted = self.pointer >= len(self.profiles)
+        if len(block_profiles) == 0:
+            return self.profiles[:0]
+
+        starts = self.index.group_starts[block_profiles]
+        lengths = self.index.group_starts[block_profiles + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        block = self.index.group_members[np.repeat(starts, lengths) + offsets]
+        self.examined += len(block)
+        if self.mask is not None:
+            block = block[self.mask[block]]
+        self.last = self.sims[block_profiles[-1]]
+        return block
+
+class ThresholdIndex:
+
+    def __init__(self, rating, reviews, profiles, min_rows=MIN_ROWS, min_fraction=MIN_FRACTION,
+                 max_examined_fraction=MAX_EXAMINED_FRACTION):
+        self.rating = np.asarray(rating, dtype=float)
+        self.reviews = np.asarray(reviews, dtype=float)
+        self.profiles = profiles
+        self.min_rows = min_rows
+        self.min_fraction = min_fraction
+        self.max_examined_fraction = max_examined_fraction
+        self.rating_norm = self.rating / 5
+        self.has_nan = bool(np.isnan(self.rating).any() or np.isnan(self.reviews).any())
+        self.max_reviews = np.nanmax(self.reviews) if len(self.reviews) else 0
+
+        # Daftar terurut dibangun saat query threshold pertama (_build_lists)
+        self.by_rating = self.by_reviews = self.group_members = self.group_starts = None
+
+        self._lock = threading.Lock()
+        self.queries = self.threshold_queries = self.rows_examined = self.rows_scored = 0
+
+    def __len__(self):
+        return len(self.rating)
+
+    def _build_lists(self):
+        # Urut turun per komponen statis (seri: posisi terkecil dulu)
+        with self._lock:
+            if self.by_rating is not None:
+                return
+            positions = np.arange(len(self.rating))
+            by_rating = np.lexsort((positions, -self.rating_norm))
+            self.by_reviews = np.lexsort((positions, -self.reviews))
+            # Produk dikelompokkan per profil (urut posisi di tiap kelompok)
+            self.group_members = np.argsort(self.profiles.profile_of, kind='stable')
+            self.group_starts = np.concatenate([[0], np.cumsum(self.profiles.counts)])
+            # by_rating terakhir: penanda daftar lengkap untuk cek tanpa lock
+            self.by_rating = by_rating
+
+    def stats(self):
+        with self._lock:
+            return {"queries": self.queries, "threshold_queries": self.threshold_queries,
+                    "rows_examined": self.rows_examined, "rows_scored": self.rows_scored}
+
+    def _record(self, stats):
+        with self._lock:
+            self.queries += 1
+            self.threshold_queries += stats.method == "threshold"
+            self.rows_examined += stats.rows_examined
+            self.rows_scored += stats.rows_scored
+
+    def _scan(self, positions, sims, alpha, beta, gamma, k):
+        # Full scan seperti rank_positions: skor semua produk subset
+        rows = np.arange(len(self)) if positions is None else positions
+        rating_norm, popularity_norm = component_scores(self.rating[rows], self.reviews[rows])
+        sim_scores = sims[self.profiles.profile_of[rows]]
+        scores = weighted_scores(rating_norm, popularity_norm, sim_scores, alpha, beta, gamma)
+        top = topk_indices(scores, k)
+        return rows[top], scores[top], TopkStats("scan", len(rows), len(rows), len(rows), 0)
+
+    @traced("rank.threshold")
+    def search(self, positions=None, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None, force=None):
+        """
+        Top-k posisi global subset (positions urut naik, None = seluruh katalog).
+
+        force: None (otomatis), "threshold" atau "scan". "threshold" hanya melewati
+        batas ukuran (min_rows/min_fraction); query yang tidak memenuhi syarat TA
+        (bobot negatif/NaN, Rating/Number_of_Reviews NaN, subset <= k) tetap full scan.
+
+        Returns:
+            (posisi top-k, skor, similarity per profil, max_reviews subset, TopkStats)
+        """
+        if force not in FORCE_CHOICES:
+            raise ValueError(f"force harus salah satu dari {FORCE_CHOICES}, bukan {force!r}")
+        n = len(self)
+        if positions is not None and len(positions) == n:
+            positions = None
+        subset_size = n if positions is None else len(positions)
+        profiles = self.profiles
+        counts = profiles.subset_counts(positions)
+
+        # Similarity per profil (produk referensi hanya dipakai jika ada di subset)
+        reference = None
+        if user_index is not None and 0 <= user_index < n:
+            if positions is None or _contains(positions, user_index):
+                reference = profiles.profile_of[user_index]
+        sims = profiles.profile_similarity(positions, reference=reference, counts=counts) if subset_size else None
+        max_reviews = self._max_reviews(positions)
+
+        if subset_size == 0 or k <= 0:
+            stats = TopkStats("scan", subset_size, 0, 0, 0)
+            self._record(stats)
+            return np.array([], dtype=np.int64), np.array([]), sims, max_reviews, stats
+
+        # Syarat TA dicek lebih dulu; force hanya memilih di antara strategi yang valid
+        valid = (not self.has_nan and all(math.isfinite(w) and w >= 0 for w in (alpha, beta, gamma))
+                 and subset_size > k)
+        if force == "scan":
+            use_threshold = False
+        elif force == "threshold":
+            use_threshold = valid
+        else:
+            use_threshold = valid and subset_size >= max(self.min_rows, self.min_fraction * n)
+
+        result = self._threshold(positions, sims, counts, max_reviews, alpha, beta, gamma, k) if use_threshold else None
+        if result is None:
+            result = self._scan(positions, sims, alpha, beta, gamma, k)
+        self._record(result[2])
+        return result[0], result[1], sims, max_reviews, result[2]
+
+    def _max_reviews(self, positions):
+        # Sama dengan component_scores: nanmax review subset
+        if positions is None:
+            return self.max_reviews
+        return np.nanmax(self.reviews[positions]) if len(positions) else 0
+
+    def _threshold(self, positions, sims, counts, max_reviews, alpha, beta, gamma, k):
+        n = len(self)
+        subset_size = n if positions is None else len(positions)
+        mask = None
+        if positions is not None:
+            mask = np.zeros(n, dtype=bool)
+            mask[positions] = True
+
+        if self.by_rating is None:
+            self._build_lists()
+
+        # Popularitas dihitung hanya untuk produk yang dibaca (reviews / max_reviews subset)
+        scale = max_reviews if max_reviews > 0 else np.inf
+        lists = [
+            _StaticList(self.by_rating, self.rating_norm, mask),
+            _StaticList(self.by_reviews, self.reviews, mask),
+            _ProfileList(self, sims, counts, mask),
+        ]
+        seen = np.zeros(n, dtype=bool)
+        candidates = []
+        candidate_scores = []
+        n_seen = 0
+        rounds = 0
+        size = max(BLOCK, k)
+        budget = self.max_examined_fraction * subset_size
+
+        while True:
+            rounds += 1
+            blocks = []
+            for sorted_list in lists:
+                # Produk unik per daftar; yang sudah terlihat (daftar lain/putaran lalu) dilewati
+                block = sorted_list.next_block(size)
+                block = block[~seen[block]]
+                seen[block] = True
+                blocks.append(block)
+            block = np.concatenate(blocks)
+            n_seen += len(block)
+            candidates.append(block)
+            # Skor penuh (random access), rumus sama dengan weighted_scores
+            popularity = self.reviews[block] / scale if max_reviews > 0 else np.zeros(len(block))
+            candidate_scores.append(weighted_scores(self.rating_norm[block], popularity,
+                                                    sims[self.profiles.profile_of[block]], alpha, beta, gamma))
+
+            if any(sorted_list.exhausted for sorted_list in lists):
+                # Satu daftar habis = semua produk subset sudah terlihat
+                break
+            if n_seen >= k:
+                all_scores = np.concatenate(candidate_scores)
+                kth = np.partition(all_scores, len(all_scores) - k)[len(all_scores) - k]
+                last_popularity = lists[1].last / scale if max_reviews > 0 else 0.0
+                threshold = alpha * lists[0].last + beta * last_popularity + gamma * lists[2].last
+                if kth > threshold:
+                    break
+            if sum(sorted_list.examined for sorted_list in lists) > budget:
+                return None
+            size *= 2
+
+        rows = np.concatenate(candidates)
+        scores = np.concatenate(candidate_scores)
+        # Kandidat >= skor ke-k, seri diurutkan berdasarkan posisi global
+        # (seperti topk_indices pada subset yang urut posisi)
+        k = min(k, len(scores))
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+        top = candidates[np.lexsort((rows[candidates], -scores[candidates]))[:k]]
+        examined = sum(sorted_list.examined for sorted_list in lists)
+        return rows[top], scores[top], TopkStats("threshold", subset_size, examined, n_seen, rounds)
+
+    def rank(self, df, positions=None, alpha=0.4, beta=0.2, gamma=0.4, k=10, user_index=None, force=None):
+        # DataFrame top-k seperti rank_positions (kolom komponen skor + weighted_score)
+        top, scores, sims, max_reviews, _ = self.search(positions, alpha, beta, gamma, k, user_index, force)
+        if sims is None:
+            return pd.DataFrame()
+        reviews = self.reviews[top]
+        popularity_norm = reviews / max_reviews if max_reviews > 0 else np.zeros(len(top))
+        return score_frame(df, top, self.rating_norm[top], popularity_norm, sims[self.profiles.profile_of[top]],
+                           scores)
+
+def _contains(positions, position):
+    loc = int(np.searchsorted(positions, position))
+    return loc < len(positions) and positions[loc] == position
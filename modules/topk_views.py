@@ -0,0 +1,202 @@
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.model_store import save_into_artifact
+from modules.recommendation import score_frame, weighted_scores
+from modules.tracing import traced
+from modules.user_filter import FACET_COLUMNS, filter_positions
+
+"""
+    Materialized view top-k untuk setiap kombinasi facet sidebar.
+
+    Sidebar app.py hanya menawarkan "All" + nilai unik Category, Skin_Type,
+    Gender dan Usage_Frequency, jadi ruang query facet terbatas (3.000 kombinasi
+    untuk data bawaan). Untuk bobot default (0.4/0.2/0.4) dan rentang harga
+    penuh (nilai awal slider), top-`depth` tiap kombinasi dihitung sekali dan
+    disimpan di folder artefak TF-IDF (per hash CSV):
+
+        topk_views.npz
+            facets      : 4 array string per kombinasi ("" = All)
+            offsets     : awal daftar tiap kombinasi di positions
+            matched     : jumlah produk lolos filter per kombinasi
+            max_reviews : max Number_of_Reviews subset (normalisasi popularitas)
+            positions   : int32, posisi global top-depth urut peringkat
+            similarity  : float64, Similarity_norm tiap entri
+
+    Rating_norm, Popularity_norm dan weighted_score dihitung ulang dari df
+    dengan rumus yang sama, sehingga hasil lookup identik dengan run_query.
+
+    Hanya query persis seperti itu yang dilayani (k <= depth, tanpa produk
+    referensi). Popularitas dinormalisasi dengan max review subset dan mean
+    similarity memakai centroid subset, jadi rentang harga lain mengubah skor
+    semua produk: daftar rentang penuh tidak bisa cukup difilter harga. Query
+    lain (bobot lain, rentang harga lain, produk referensi) dihitung live.
+
+    Rentang harga sengaja tidak ikut dimaterialisasi: grid slider (langkah
+    PRICE_STEP) pada data bawaan punya 421 titik, ~88 ribu pasangan rentang
+    per kombinasi facet, dan beberapa pita tetap jarang persis sama dengan
+    posisi slider. Pada replay `benchmark.py views`, ~79% query (rentang
+    penuh) dilayani view; sisanya memakai cache hasil dan jalur live.
+
+    Build (dan cek kesetaraan dengan jalur live):
+        python -m modules.topk_views --check
+"""
+
+VIEW_FILE = "topk_views.npz"
+DEFAULT_WEIGHTS = (0.4, 0.2, 0.4)
+VIEW_DEPTH = 100
+
+class TopkViews:
+
+    def __init__(self, facets, offsets, matched, max_reviews, positions, similarity, weights=DEFAULT_WEIGHTS,
+                 price_range=None):
+        self.offsets = offsets
+        self.matched = matched
+        self.max_reviews = max_reviews
+        self.positions = positions
+        self.similarity = similarity
+        self.weights = tuple(float(w) for w in weights)
+        self.price_range = price_range
+        self.slots = {
+            tuple(value or None for value in combo): slot for slot, combo in enumerate(zip(*facets))
+        }
+        self.facets = facets
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def depth(self):
+        return int(np.diff(self.offsets).max(initial=0))
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.offsets, self.matched, self.max_reviews, self.positions,
+                                              self.similarity, *self.facets))
+
+    def serves(self, catalog, query):
+        # True jika query bisa dijawab view (bobot default, rentang harga penuh, tanpa produk referensi)
+        return (
+            query.product is None
+            and (query.alpha, query.beta, query.gamma) == self.weights
+            and tuple(query.price_range) == self.price_range == (catalog.price_min, catalog.price_max)
+            and (query.category, query.skin_type, query.gender, query.usage_frequency) in self.slots
+        )
+
+    @traced("rank.view")
+    def lookup(self, catalog, query):
+        # (matched, DataFrame top-k) seperti run_query, atau None jika harus dihitung live
+        if not self.serves(catalog, query):
+            return None
+        slot = self.slots[(query.category, query.skin_type, query.gender, query.usage_frequency)]
+        matched = int(self.matched[slot])
+        start, end = int(self.offsets[slot]), int(self.offsets[slot + 1])
+        if query.k > end - start and matched > end - start:
+            # Daftar tersimpan lebih pendek dari k yang diminta
+            return None
+        if matched == 0:
+            return 0, pd.DataFrame()
+
+        top = self.positions[start:start + min(query.k, end - start)]
+        df = catalog.df
+        rating_norm = df['Rating'].to_numpy(dtype=float)[top] / 5
+        max_reviews = self.max_reviews[slot]
+        reviews = df['Number_of_Reviews'].to_numpy(dtype=float)[top]
+        popularity_norm = reviews / max_reviews if max_reviews > 0 else np.zeros(len(top))
+        similarity = self.similarity[start:start + len(top)]
+
+        scores = weighted_scores(rating_norm, popularity_norm, similarity, *self.weights)
+        return matched, score_frame(df, top, rating_norm, popularity_norm, similarity, scores)
+
+def facet_combinations(catalog):
+    # "All" (None) + nilai unik tiap facet, sama dengan pilihan sidebar
+    return list(itertools.product(*[[None] + catalog.facet_values[col] for col in FACET_COLUMNS]))
+
+def build_views(catalog, depth=VIEW_DEPTH, weights=DEFAULT_WEIGHTS):
+    # Top-depth tiap kombinasi facet lewat jalur live (topk_index), rentang harga penuh
+    price_range = (catalog.price_min, catalog.price_max)
+    reviews_all = catalog.df['Number_of_Reviews'].to_numpy(dtype=float)
+    combos = facet_combinations(catalog)
+    offsets = np.zeros(len(combos) + 1, dtype=np.int64)
+    matched = np.zeros(len(combos), dtype=np.int64)
+    max_reviews = np.zeros(len(combos), dtype=np.float64)
+    positions = []
+    similarity = []
+    for slot, combo in enumerate(combos):
+        subset = filter_positions(catalog.facet_index, *combo, price_range)
+        matched[slot] = len(subset)
+        top = catalog.topk_index.rank(catalog.df, subset, *weights, k=depth) if len(subset) else pd.DataFrame()
+        if len(subset):
+            max_reviews[slot] = np.nanmax(reviews_all[subset])
+            positions.append(top.index.to_numpy())
+            similarity.append(top['Similarity_norm'].to_numpy(dtype=np.float64))
+        offsets[slot + 1] = offsets[slot] + len(top)
+
+    facets = [np.array(["" if combo[i] is None else combo[i] for combo in combos], dtype=str)
+              for i in range(len(FACET_COLUMNS))]
+    return TopkViews(
+        facets, offsets, matched, max_reviews,
+        np.concatenate(positions).astype(np.int32) if positions else np.zeros(0, dtype=np.int32),
+        np.concatenate(similarity) if similarity else np.zeros(0), weights, price_range,
+    )
+
+def view_arrays(views):
+    # Isi topk_views.npz
+    arrays = {"offsets": views.offsets, "matched": views.matched, "max_reviews": views.max_reviews,
+              "positions": views.positions, "similarity": views.similarity, "weights": np.array(views.weights),
+              "price_range": np.array(views.price_range)}
+    arrays.update({f"facet_{col}": values for col, values in zip(FACET_COLUMNS, views.facets)})
+    return arrays
+
+def save_views(views, path):
+    # Hanya ke artefak TF-IDF lengkap (ada meta.json), FileNotFoundError jika tidak
+    save_into_artifact(path, {VIEW_FILE: view_arrays(views)})
+    return os.path.join(path, VIEW_FILE)
+
+def load_views(path):
+    with np.load(os.path.join(path, VIEW_FILE)) as data:
+        facets = [data[f"facet_{col}"] for col in FACET_COLUMNS]
+        return TopkViews(facets, data["offsets"], data["matched"], data["max_reviews"], data["positions"],
+                         data["similarity"], tuple(data["weights"].tolist()), tuple(data["price_range"].tolist()))
+
+def views_available(path):
+    return path is not None and os.path.exists(os.path.join(path, VIEW_FILE))
+
+def check_views(catalog, views, ks=(10, 20)):
+    # Bandingkan lookup view dengan jalur live untuk semua kombinasi; jumlah query yang berbeda
+    from modules.result_cache import canonical_query, live_query
+
+    mismatches = 0
+    for combo in facet_combinations(catalog):
+        for k in ks:
+            query = canonical_query(catalog, *combo, k=k)
+            served = views.lookup(catalog, query)
+            matched, expected = live_query(catalog, query)
+            if served is None or served[0] != matched or not served[1].equals(expected):
+                mismatches += 1
+    return mismatches
+
+if __name__ == "__main__":
+    import argparse
+
+    from modules.catalog import CSV_PATH, get_catalog
+
+    parser = argparse.ArgumentParser(description="Build materialized view top-k per kombinasi facet")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--depth", type=int, default=VIEW_DEPTH)
+    parser.add_argument("--check", action="store_true", help="bandingkan semua kombinasi dengan jalur live")
+    args = parser.parse_args()
+
+    catalog = get_catalog(args.csv, compact=False)
+    start = time.perf_counter()
+    views = build_views(catalog, args.depth)
+    build_seconds = time.perf_counter() - start
+    target = save_views(views, catalog.artifact_path)
+    print(f"{len(views)} kombinasi, {len(views.positions)} entri (depth {views.depth}), "
+          f"build {build_seconds:.2f} s, {views.nbytes() / 1024:.1f} KB di memori, "
+          f"{os.path.getsize(target) / 1024:.1f} KB di disk: {target}")
+    if args.check:
+        print(f"berbeda dari jalur live: {check_views(catalog, views)} query")
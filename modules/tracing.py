@@ -0,0 +1,269 @@
+import cProfile
+import contextvars
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+"""
+    Tracing ringan untuk tahap-tahap hot path (load, tfidf, filter, rank, image).
+
+    Kode di hot path menandai tahap dengan span:
+
+        with span("rank.similarity"):
+            ...
+
+        @traced("filter")
+        def filter_positions(...):
+            ...
+
+    Span hanya dicatat jika ada trace aktif di context saat ini (start_trace,
+    mis. satu rerun Streamlit). Tanpa trace aktif biaya span hanya satu
+    ContextVar.get, sehingga instrumentasi aman dibiarkan di hot path.
+
+    Mode diatur lewat environment variable SKINCARE_TRACE:
+    - kosong / "0" : mati (default), start_trace tidak membuat trace
+    - "1"          : catat durasi per span
+    - "profile"    : juga cProfile per span level atas + alokasi tracemalloc
+                     per span; laporan ditulis ke SKINCARE_TRACE_DIR
+                     (default data/traces)
+    Nilai lain tidak menghentikan service: peringatan dicatat (logging) dan
+    tracing mati.
+
+    Span bersarang dicatat dengan kedalaman; durasi span induk sudah termasuk
+    span anaknya. cProfile per thread, tetapi tracemalloc global per proses:
+    angka alokasi hanya akurat jika tidak ada trace lain berjalan bersamaan.
+"""
+
+TRACE_ENV = "SKINCARE_TRACE"
+TRACE_DIR_ENV = "SKINCARE_TRACE_DIR"
+TRACE_DIR = "data/traces"
+MODES = ("off", "spans", "profile")
+PROFILE_TOP = 15
+
+_MODE_ALIASES = {"": "off", "0": "off", "off": "off", "1": "spans", "spans": "spans", "profile": "profile"}
+
+def _mode_from_env():
+    # Env var diagnostik: nilai tidak dikenal -> peringatan + "off", bukan exception saat import
+    value = os.environ.get(TRACE_ENV, "").strip().lower()
+    if value not in _MODE_ALIASES:
+        logging.getLogger(__name__).warning("%s=%r tidak dikenal (pilihan: %s), tracing dimatikan",
+                                            TRACE_ENV, value, sorted(_MODE_ALIASES))
+        return "off"
+    return _MODE_ALIASES[value]
+
+_mode = _mode_from_env()
+_current = contextvars.ContextVar("skincare_trace", default=None)
+# tracemalloc global per proses: aktif selama ada trace mode profile
+_TRACEMALLOC_LOCK = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+def set_mode(mode):
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"mode harus salah satu dari {MODES}, bukan {mode!r}")
+    _mode = mode
+
+def get_mode():
+    return _mode
+
+def enabled():
+    return _mode != "off"
+
+class Trace:
+
+    def __init__(self, name, profile=False):
+        self.name = name
+        self.profile = profile
+        self.spans = []          # (nama, kedalaman, detik, alokasi KB, peak KB)
+        self.profiles = {}       # nama span level atas -> pstats.Stats
+        self.depth = 0
+        self._peaks = []         # peak tracemalloc span anak, per level
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def summary(self):
+        # Agregasi per nama span: {nama: {count, seconds, depth, alloc_kb, peak_kb}}
+        result = {}
+        for record in self.spans:
+            if record is None:
+                # span belum selesai
+                continue
+            name, depth, seconds, alloc_kb, peak_kb = record
+            entry = result.setdefault(name, {"count": 0, "seconds": 0.0, "depth": depth,
+                                             "alloc_kb": 0.0, "peak_kb": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["depth"] = min(entry["depth"], depth)
+            if alloc_kb is not None:
+                entry["alloc_kb"] += alloc_kb
+                entry["peak_kb"] = max(entry["peak_kb"], peak_kb)
+        return result
+
+    def report(self):
+        lines = [f"trace {self.name}: {self.seconds * 1000:.2f} ms"]
+        for name, entry in self.summary().items():
+            line = (f"{'  ' * entry['depth']}{name:<{28 - 2 * entry['depth']}} x{entry['count']:<4} "
+                    f"{entry['seconds'] * 1000:10.3f} ms")
+            if self.profile:
+                line += f"  alloc={entry['alloc_kb']:10.1f} KB  peak={entry['peak_kb']:10.1f} KB"
+            lines.append(line)
+        for name, stats in self.profiles.items():
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            lines += ["", f"=== cProfile {name} (top {PROFILE_TOP} cumulative) ===", buffer.getvalue().strip()]
+        return "\n".join(lines)
+
+    def dump(self, trace_dir=None):
+        # Tulis laporan teks + ringkasan JSON, kembalikan path laporan teks
+        trace_dir = trace_dir or os.environ.get(TRACE_DIR_ENV, TRACE_DIR)
+        os.makedirs(trace_dir, exist_ok=True)
+        stem = os.path.join(trace_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.name}-{os.getpid()}-{id(self):x}")
+        with open(stem + ".txt", "w") as f:
+            f.write(self.report() + "\n")
+        with open(stem + ".json", "w") as f:
+            json.dump({"name": self.name, "seconds": self.seconds, "spans": self.summary()}, f, indent=1)
+        return stem + ".txt"
+
+class _Span:
+    __slots__ = ("trace", "name", "start", "profiler", "memory", "slot")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        trace = self.trace
+        self.profiler = None
+        self.memory = None
+        if trace.profile:
+            if trace.depth == 0:
+                self.profiler = cProfile.Profile()
+            # Peak diukur ulang per span; peak span anak diteruskan ke induk saat keluar
+            self.memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            trace._peaks.append(self.memory)
+        # Slot dipesan saat masuk agar urutan laporan = urutan mulai span
+        self.slot = len(trace.spans)
+        trace.spans.append(None)
+        trace.depth += 1
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+        seconds = time.perf_counter() - self.start
+        trace = self.trace
+        trace.depth -= 1
+        alloc_kb = peak_kb = None
+        if self.memory is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, trace._peaks.pop())
+            if trace._peaks:
+                trace._peaks[-1] = max(trace._peaks[-1], peak)
+            alloc_kb = (current - self.memory) / 1024
+            peak_kb = (peak - self.memory) / 1024
+        if self.profiler is not None:
+            stats = pstats.Stats(self.profiler)
+            if self.name in trace.profiles:
+                trace.profiles[self.name].add(stats)
+            else:
+                trace.profiles[self.name] = stats
+        trace.spans[self.slot] = (self.name, trace.depth, seconds, alloc_kb, peak_kb)
+        return False
+
+_NULL_SPAN = nullcontext()
+
+def span(name):
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+def traced(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Span(trace, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_trace():
+    return _current.get()
+
+def _tracemalloc_acquire():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _TRACEMALLOC_LOCK:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+def _tracemalloc_release():
+    # Hanya dihentikan jika dimulai di sini (bukan oleh pemanggil lain)
+    global _tracemalloc_users, _tracemalloc_owned
+    with _TRACEMALLOC_LOCK:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+def begin_trace(name):
+    # Mulai trace baru di context ini; None jika tracing mati
+    if _mode == "off":
+        return None
+    stale = _current.get()
+    if stale is not None:
+        # Sisa unit kerja sebelumnya yang berhenti di tengah (mis. rerun Streamlit dibatalkan)
+        finish_trace(stale, dump=False)
+    trace = Trace(name, profile=_mode == "profile")
+    if trace.profile:
+        _tracemalloc_acquire()
+    _current.set(trace)
+    return trace
+
+def finish_trace(trace, dump=None):
+    """
+    Tutup trace dari begin_trace. dump=None -> laporan ditulis ke file hanya
+    di mode "profile". Mengembalikan path laporan atau None.
+    """
+    if trace is None:
+        return None
+    if _current.get() is trace:
+        _current.set(None)
+    if trace.seconds:
+        return None
+    trace.seconds = time.perf_counter() - trace.started
+    if trace.profile:
+        _tracemalloc_release()
+    if dump if dump is not None else trace.profile:
+        return trace.dump()
+    return None
+
+@contextmanager
+def start_trace(name, dump=None):
+    # Bentuk context manager dari begin_trace/finish_trace; di dalam trace lain span masuk trace luar
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    trace = begin_trace(name)
+    try:
+        yield trace
+    finally:
+        finish_trace(trace, dump)
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from modules.tracing import traced
+
 """
     Filter dataset berdasarkan preferensi user.
     
@@ -9,9 +12,11 @@ import pandas as pd
     - price_range: tuple (min, max) selalu diterapkan
     
     Returns:
-        DataFrame yang sudah difilter
+        DataFrame yang sudah difilter, dengan index asli df dipertahankan
+        (dipakai hybrid_topk sebagai posisi baris di TF-IDF matrix)
 """
 
+@traced("filter")
 def filter_user_preferences(df, category, skin_type, gender, usage_frequency, price_range):
     if df is None:
         return pd.DataFrame()
@@ -63,4 +68,151 @@ def filter_user_preferences(df, category, skin_type, gender, usage_frequency, pr
             # jika tidak ada kolom price, return empty
             return pd.DataFrame(columns=filtered.columns)
 
-    return filtered.reset_index(drop=True)
+    return filtered
+
+"""
+    Index facet terbalik untuk filter preferensi user tanpa copy DataFrame.
+
+    Dibangun sekali per katalog:
+    - tiap kolom facet (Category, Skin_Type, Gender, Usage_Frequency) dikodekan
+      menjadi kode kategori, dengan satu bitset (np.packbits) per nilai unik
+    - Price_IDR disimpan sebagai array harga terurut + urutan posisi barisnya,
+      sehingga rentang harga dicari dengan binary search (np.searchsorted)
+
+    Semantik sama dengan filter_user_preferences:
+    - category: exact match, skin_type/gender/usage_frequency: substring match.
+      Substring dicocokkan literal (value in nilai unik), bukan regex: nilai
+      sidebar tidak memuat karakter regex sehingga hasilnya sama dengan
+      str.contains, dan nilai bebas dari HTTP (mis. "(" atau " oily ") tidak
+      pernah menjadi pola regex
+    - baris dengan harga non-numerik tidak pernah lolos filter harga
+
+    filter_positions mengembalikan posisi baris (np.ndarray int, urut naik).
+"""
+
+FACET_COLUMNS = ['Category', 'Skin_Type', 'Gender', 'Usage_Frequency']
+
+class FacetIndex:
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.values = {}
+        self.bitsets = {}
+
+        for col in FACET_COLUMNS:
+            if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+                # Katalog kolumnar: cukup normalisasi daftar kategori, lalu petakan kodenya
+                categorical = df[col].array
+                labels = pd.Series(list(categorical.categories) + ['']).astype(str).str.strip().str.lower()
+                label_codes, uniques = pd.factorize(labels)
+                codes = label_codes[categorical.codes]
+            else:
+                if col in df.columns:
+                    column = df[col].fillna('').astype(str).str.strip().str.lower()
+                else:
+                    column = pd.Series([''] * self.n_rows)
+                codes, uniques = pd.factorize(column)
+            self.values[col] = [str(v) for v in uniques]
+            self.bitsets[col] = [np.packbits(codes == i) for i in range(len(uniques))]
+
+        self.has_price = 'Price_IDR' in df.columns
+        if self.has_price:
+            price = pd.to_numeric(df['Price_IDR'], errors='coerce').to_numpy(dtype=float)
+            valid = np.flatnonzero(~np.isnan(price))
+            order = np.argsort(price[valid], kind='stable')
+            self.price_order = valid[order]
+            self.price_sorted = price[self.price_order]
+
+    def patched(self, df, old_to_new, changed):
+        """
+        FacetIndex baru untuk df setelah ingest inkremental, tanpa normalisasi ulang
+        seluruh kolom.
+
+        old_to_new : posisi baru tiap posisi lama, -1 jika produk dihapus
+        changed    : posisi baru produk yang diubah/ditambah (nilainya dibaca dari df)
+        """
+        index = FacetIndex.__new__(FacetIndex)
+        index.n_rows = len(df)
+        index.values = {}
+        index.bitsets = {}
+        survivors = np.flatnonzero(old_to_new >= 0)
+        new_pos = old_to_new[survivors]
+        changed = np.asarray(changed, dtype=np.int64)
+
+        for col in FACET_COLUMNS:
+            values = list(self.values[col])
+            masks = []
+            for bits in self.bitsets[col]:
+                mask = np.zeros(index.n_rows, dtype=bool)
+                mask[new_pos] = np.unpackbits(bits, count=self.n_rows)[survivors]
+                mask[changed] = False
+                masks.append(mask)
+
+            if col in df.columns:
+                column = df[col].iloc[changed].fillna('').astype(str).str.strip().str.lower()
+            else:
+                column = pd.Series([''] * len(changed))
+            for pos, value in zip(changed, column.tolist()):
+                if value not in values:
+                    values.append(value)
+                    masks.append(np.zeros(index.n_rows, dtype=bool))
+                masks[values.index(value)][pos] = True
+
+            index.values[col] = values
+            index.bitsets[col] = [np.packbits(mask) for mask in masks]
+
+        index.has_price = self.has_price and 'Price_IDR' in df.columns
+        if index.has_price:
+            # Posisi lama dipetakan ke posisi baru, produk berubah disisipkan ulang;
+            # urutan tetap (harga, posisi) seperti argsort stable di __init__
+            old_new = old_to_new[self.price_order]
+            keep = old_new >= 0
+            keep[keep] = ~np.isin(old_new[keep], changed)
+            price = pd.to_numeric(df['Price_IDR'].iloc[changed], errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(price)
+            positions = np.concatenate([old_new[keep], changed[valid]])
+            prices = np.concatenate([self.price_sorted[keep], price[valid]])
+            order = np.lexsort((positions, prices))
+            index.price_order = positions[order]
+            index.price_sorted = prices[order]
+        return index
+
+    def all_bits(self):
+        return np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    def facet_bits(self, col, value, exact):
+        # Gabungan (OR) bitset dari semua nilai unik yang cocok dengan query
+        value = str(value).strip().lower()
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for i, candidate in enumerate(self.values[col]):
+            matched = candidate == value if exact else value in candidate
+            if matched:
+                bits |= self.bitsets[col][i]
+        return bits
+
+    def price_bits(self, min_price, max_price):
+        lo = np.searchsorted(self.price_sorted, float(min_price), side='left')
+        hi = np.searchsorted(self.price_sorted, float(max_price), side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.price_order[lo:hi]] = True
+        return np.packbits(mask)
+
+@traced("filter")
+def filter_positions(index, category, skin_type, gender, usage_frequency, price_range):
+    bits = index.all_bits()
+
+    if category is not None:
+        bits &= index.facet_bits('Category', category, exact=True)
+    if skin_type is not None:
+        bits &= index.facet_bits('Skin_Type', skin_type, exact=False)
+    if gender is not None:
+        bits &= index.facet_bits('Gender', gender, exact=False)
+    if usage_frequency is not None:
+        bits &= index.facet_bits('Usage_Frequency', usage_frequency, exact=False)
+
+    if price_range is not None and len(price_range) == 2:
+        if not index.has_price:
+            return np.array([], dtype=np.int64)
+        bits &= index.price_bits(*price_range)
+
+    return np.flatnonzero(np.unpackbits(bits, count=index.n_rows))
@@ -0,0 +1,261 @@
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from modules.catalog import CSV_PATH, get_catalog
+from modules.result_cache import RESULT_CACHE, cached_query, canonical_query
+from modules.user_filter import filter_positions
+
+"""
+    Service HTTP (stdlib) untuk rekomendasi, terpisah dari UI Streamlit.
+
+    Katalog & TF-IDF matrix dimuat sekali (get_catalog, dipakai bersama semua
+    thread) dan dimuat ulang otomatis jika CSV clean berubah. Setiap request
+    ditangani di thread sendiri (ThreadingHTTPServer).
+
+    Endpoint (GET):
+    - /recommend   : category, skin_type, gender, usage_frequency,
+                     price_min, price_max, alpha, beta, gamma, k,
+                     product (posisi produk referensi, opsional)
+    - /similar/<id>: n, plus filter facet/harga opsional seperti /recommend
+    - /health      : status & hash katalog
+
+    Header latency di setiap respons:
+    - X-Response-Time-Ms : total waktu proses di server
+    - Server-Timing      : rincian per tahap (filter+rank atau cache_hit, filter, similar, serialize)
+
+    Hasil /recommend memakai result cache bersama (modules/result_cache.py);
+    statistik cache tersedia di /health, --no-cache untuk menonaktifkan.
+
+    Contoh:
+        python server.py --port 8000
+        curl "http://127.0.0.1:8000/recommend?category=serum&skin_type=oily&k=5"
+        curl "http://127.0.0.1:8000/similar/42?n=5"
+"""
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+MAX_K = 100
+
+FACET_PARAMS = {
+    "category": "Category",
+    "skin_type": "Skin_Type",
+    "gender": "Gender",
+    "usage_frequency": "Usage_Frequency",
+}
+RESULT_COLUMNS = [
+    "Product_Name", "Brand", "Category", "Skin_Type", "Gender", "Usage_Frequency",
+    "Price_IDR", "Rating", "Number_of_Reviews",
+]
+SCORE_COLUMNS = ["Rating_norm", "Popularity_norm", "Similarity_norm", "weighted_score"]
+SIMILAR_PATH = re.compile(r"^/similar/(-?\d+)$")
+
+class BadRequest(ValueError):
+    pass
+
+class NotFound(LookupError):
+    pass
+
+def _json_value(value):
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    return value
+
+def _param(params, name, cast=str, default=None):
+    values = params.get(name)
+    if not values or values[-1] == "":
+        return default
+    try:
+        value = cast(values[-1])
+    except ValueError:
+        raise BadRequest(f"parameter {name} tidak valid: {values[-1]!r}")
+    if cast is float and not math.isfinite(value):
+        # nan/inf diterima float() tetapi merusak filter harga & JSON respons
+        raise BadRequest(f"parameter {name} harus bilangan berhingga: {values[-1]!r}")
+    return value
+
+def parse_filters(params, catalog):
+    # "all" / kosong = tanpa filter, sama seperti pilihan "All" di sidebar.
+    # Nilai diteruskan apa adanya: FacetIndex mencocokkan substring secara literal
+    # (bukan regex) dan canonical_query menormalkan strip/lowercase untuk key cache.
+    facets = {}
+    for param in FACET_PARAMS:
+        value = _param(params, param)
+        facets[param] = None if value is None or value.strip().lower() == "all" else value
+
+    price_min = _param(params, "price_min", float, catalog.price_min)
+    price_max = _param(params, "price_max", float, catalog.price_max)
+    if price_min > price_max:
+        raise BadRequest("price_min lebih besar dari price_max")
+    return facets, (price_min, price_max)
+
+def product_record(df, position):
+    row = df.iloc[position]
+    record = {"id": int(position)}
+    record.update({col: _json_value(row[col]) for col in RESULT_COLUMNS if col in df.columns})
+    return record
+
+def recommend(catalog, params, timings, cache=RESULT_CACHE):
+    facets, price_range = parse_filters(params, catalog)
+    alpha = _param(params, "alpha", float, 0.4)
+    beta = _param(params, "beta", float, 0.2)
+    gamma = _param(params, "gamma", float, 0.4)
+    k = _param(params, "k", int, 10)
+    product = _param(params, "product", int)
+    if not 1 <= k <= MAX_K:
+        raise BadRequest(f"k harus antara 1 dan {MAX_K}")
+    if product is not None and not 0 <= product < len(catalog):
+        raise NotFound(f"produk {product} tidak ada")
+
+    query = canonical_query(catalog, price_range=price_range, alpha=alpha, beta=beta, gamma=gamma, k=k,
+                            product=product, **facets)
+    start = time.perf_counter()
+    matched, top, hit = cached_query(catalog, query, cache)
+    timings["cache_hit" if hit else "filter+rank"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = [col for col in RESULT_COLUMNS + SCORE_COLUMNS if col in top.columns]
+    results = [
+        {"id": int(position), **{col: _json_value(value) for col, value in record.items()}}
+        for position, record in zip(top.index, top[columns].to_dict("records"))
+    ]
+    timings["serialize"] = time.perf_counter() - start
+
+    return {
+        "query": {**query._asdict(), "price_range": list(query.price_range)},
+        "matched": int(matched),
+        "cached": hit,
+        "results": results,
+    }
+
+def similar(catalog, product, params, timings):
+    if not 0 <= product < len(catalog):
+        raise NotFound(f"produk {product} tidak ada")
+    n = _param(params, "n", int, 10)
+    if not 1 <= n <= MAX_K:
+        raise BadRequest(f"n harus antara 1 dan {MAX_K}")
+
+    start = time.perf_counter()
+    allowed = None
+    if any(param in params for param in list(FACET_PARAMS) + ["price_min", "price_max"]):
+        facets, price_range = parse_filters(params, catalog)
+        allowed = filter_positions(catalog.facet_index, price_range=price_range, **facets)
+    timings["filter"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids, scores = catalog.neighbors.similar(product, n=n, allowed=allowed)
+    timings["similar"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = []
+    for position, score in zip(ids.tolist(), scores.tolist()):
+        record = product_record(catalog.df, position)
+        record["similarity"] = score
+        results.append(record)
+    timings["serialize"] = time.perf_counter() - start
+
+    return {"product": product_record(catalog.df, product), "results": results}
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    server_version = "SkincareRecommender/1.0"
+    protocol_version = "HTTP/1.1"
+    # Header & body dikirim terpisah; tanpa TCP_NODELAY keep-alive tertahan ~40 ms (Nagle + delayed ACK)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        start = time.perf_counter()
+        timings = {}
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            catalog = self.server.catalog if self.server.catalog is not None else get_catalog(self.server.csv_path)
+            match = SIMILAR_PATH.match(url.path)
+            if url.path == "/recommend":
+                status, body = 200, recommend(catalog, params, timings, self.server.cache)
+            elif match:
+                status, body = 200, similar(catalog, int(match.group(1)), params, timings)
+            elif url.path == "/health":
+                status, body = 200, {"status": "ok", "rows": len(catalog), "content_hash": catalog.content_hash,
+                                     "cache": self.server.cache.stats() if self.server.cache is not None else None}
+            else:
+                raise NotFound(f"path {url.path} tidak dikenal")
+        except BadRequest as e:
+            status, body = 400, {"error": str(e)}
+        except NotFound as e:
+            status, body = 404, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(body).encode("utf-8")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-Response-Time-Ms", f"{elapsed_ms:.3f}")
+        self.send_header("Server-Timing", ", ".join(
+            [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items()]
+            + [f"total;dur={elapsed_ms:.3f}"]
+        ))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class RecommendationServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Backlog default (5) membuat koneksi bersamaan ditolak & di-retry SYN (~1 detik)
+    request_queue_size = 128
+
+    def __init__(self, address, csv_path=CSV_PATH, verbose=False, cache=RESULT_CACHE, catalog=None):
+        self.csv_path = csv_path
+        self.verbose = verbose
+        self.cache = cache
+        # catalog: katalog tetap (mis. katalog sintetis load test), selain itu get_catalog(csv_path)
+        self.catalog = catalog
+        # Katalog dimuat sebelum request pertama
+        if catalog is None:
+            get_catalog(csv_path)
+        super().__init__(address, RecommendationHandler)
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, csv_path=CSV_PATH, verbose=False, cache=RESULT_CACHE):
+    # port=0 -> port bebas dipilih OS (server.server_address[1]), berguna untuk tes di localhost
+    # cache=None menonaktifkan result cache
+    return RecommendationServer((host, port), csv_path, verbose, cache)
+
+def start_in_thread(host=DEFAULT_HOST, port=0, csv_path=CSV_PATH, cache=RESULT_CACHE, catalog=None):
+    server = RecommendationServer((host, port), csv_path, cache=cache, catalog=catalog)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP rekomendasi kosmetik")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--verbose", action="store_true", help="log setiap request")
+    parser.add_argument("--no-cache", action="store_true", help="nonaktifkan result cache")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.csv, args.verbose, None if args.no_cache else RESULT_CACHE)
+    host, port = server.server_address[:2]
+    print(f"Service rekomendasi berjalan di http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
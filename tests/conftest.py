@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import random as sparse_random
+
+from modules.catalog import clear_catalog_cache, get_catalog
+from modules.data_preprocessing import preprocess_and_save
+
+def make_raw(n, seed=0, start=0, ties=False):
+    """
+    Katalog mentah sintetis (kolom sama dengan data mentah asli), produk ke-i
+    bernama 'Product {start + i}'. ties=True: Rating per 0.5 dan review per
+    100, sehingga banyak skor seri.
+    """
+    rng = np.random.default_rng(seed)
+    ids = range(start, start + n)
+    if ties:
+        rating, reviews = rng.integers(2, 11, size=n) / 2, rng.integers(0, 5, size=n) * 100
+    else:
+        rating, reviews = rng.integers(10, 50, size=n) / 10, rng.integers(0, 5000, size=n)
+    return pd.DataFrame({
+        'Product_Name': [f'Product {i}' for i in ids],
+        'Brand': [f'Brand {i % 5}' for i in ids],
+        'Category': rng.choice(['Serum', 'Toner', 'Mask'], size=n),
+        'Usage_Frequency': rng.choice(['Daily', 'Weekly'], size=n),
+        # Harga IDR = USD x 15000; sebagian besar di luar grid slider 5000
+        'Price_USD': rng.integers(100, 2000, size=n) / 100,
+        'Rating': rating,
+        'Number_of_Reviews': reviews,
+        'Skin_Type': rng.choice(['Oily', 'Dry'], size=n),
+        'Gender_Target': rng.choice(['Female', 'Unisex'], size=n),
+        'Main_Ingredient': rng.choice(['Retinol', 'Niacinamide', 'Hyaluronic Acid'], size=n),
+    })
+
+def build_catalog(n, compact=False, **kwargs):
+    # raw.csv -> clean.csv di direktori kerja, lalu dimuat tanpa cache katalog lama
+    make_raw(n, **kwargs).to_csv('raw.csv', index=False)
+    preprocess_and_save('raw.csv', 'clean.csv')
+    clear_catalog_cache()
+    return get_catalog('clean.csv', compact=compact)
+
+def make_scored_matrix(n_rows, n_unique=None, n_features=30, density=0.2, seed=0):
+    """
+    (df Rating/Number_of_Reviews diskret, matrix TF-IDF sintetis) tanpa CSV.
+    n_unique: baris matrix diambil acak dari sejumlah kecil baris unik (seperti
+    combined_features katalog), None = tiap baris acak sendiri.
+    """
+    rng = np.random.default_rng(seed)
+    if n_unique is None:
+        matrix = sparse_random(n_rows, n_features, density=density, format='csr', random_state=seed)
+    else:
+        unique = sparse_random(n_unique, n_features, density=density, format='csr', random_state=seed)
+        matrix = unique[rng.integers(0, n_unique, size=n_rows)]
+        matrix.sort_indices()
+    df = pd.DataFrame({
+        'Product_Name': [f'product {i}' for i in range(n_rows)],
+        'Rating': rng.integers(2, 11, size=n_rows) / 2,
+        'Number_of_Reviews': rng.integers(0, 5, size=n_rows) * 100,
+    })
+    return df, matrix
+
+@pytest.fixture
+def raw_frame():
+    return make_raw
+
+@pytest.fixture
+def catalog_builder(tmp_path, monkeypatch):
+    # Katalog dari CSV sintetis di tmp_path (direktori kerja selama test)
+    monkeypatch.chdir(tmp_path)
+    return build_catalog
+
+@pytest.fixture
+def scored_matrix():
+    return make_scored_matrix
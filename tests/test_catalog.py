@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.catalog import (
+    COMPACT_DROP_COLUMNS, CompactCatalog, catalog_memory, clear_catalog_cache, get_catalog, load_catalog,
+    replace_catalog,
+)
+from modules.result_cache import canonical_query, run_query
+from modules.sharding import same_topk
+
+def test_compact_catalog_same_topk_as_full(catalog_builder):
+    catalog = catalog_builder(200)
+    compact = CompactCatalog.from_catalog(catalog)
+    assert compact.compact and compact.content_hash == catalog.content_hash
+    assert get_catalog(catalog.csv_path, compact=True).cache_key == compact.cache_key
+
+    # Kolom sama nilainya (teks categorical, numerik integer terkecil / float32 jika lossless)
+    assert list(compact.df.columns) == [col for col in catalog.df.columns if col not in COMPACT_DROP_COLUMNS]
+    for col in compact.df.columns:
+        pd.testing.assert_series_equal(compact.df[col].astype(object), catalog.df[col].astype(object),
+                                       check_dtype=False, check_categorical=False)
+    assert compact.df['Rating'].dtype == np.float64
+    matrix = compact.tfidf_matrix
+    assert matrix.dtype == np.float32 and matrix.indices.dtype == np.int32 and not matrix.data.flags.writeable
+    np.testing.assert_allclose(matrix.toarray(), catalog.tfidf_matrix.toarray(), rtol=1e-6, atol=0)
+
+    # Urutan top-k sama; skor float32 boleh bergeser sedikit, sehingga produk yang skornya hampir seri
+    # (selisih float64 ~1e-16) boleh bertukar tempat di antara mereka sendiri
+    queries = [
+        canonical_query(catalog),
+        canonical_query(catalog, k=50),
+        canonical_query(catalog, category='serum', skin_type='dry'),
+        canonical_query(catalog, gender='unisex', usage_frequency='weekly', alpha=0.1, beta=0.1, gamma=0.8),
+        canonical_query(catalog, price_range=(catalog.price_min, np.median(catalog.df['Price_IDR']))),
+        canonical_query(catalog, product=7, k=20),
+        canonical_query(catalog, category='toner', product=11, alpha=0.0, beta=0.0, gamma=1.0),
+    ]
+    for query in queries:
+        expected_matched, expected = run_query(catalog, query)
+        matched, top = run_query(compact, query)
+        assert matched == expected_matched and same_topk(top, expected, tolerance=1e-6)
+        np.testing.assert_allclose(top['weighted_score'], expected['weighted_score'], rtol=0, atol=1e-6)
+
+def test_compact_memory_report(catalog_builder):
+    catalog = catalog_builder(200)
+    compact = CompactCatalog.from_catalog(catalog)
+    report = compact.memory_report()
+    assert {f"column:{col}" for col in compact.df.columns} | {"tfidf:data", "tfidf:indices", "tfidf:indptr",
+                                                              "facet_index", "total"} == set(report)
+    assert report["total"] == sum(value for key, value in report.items() if key != "total")
+    assert report["tfidf:data"] == compact.tfidf_matrix.nnz * 4
+
+    full = catalog_memory(catalog)
+    columns = sum(value for key, value in report.items() if key.startswith("column:"))
+    assert columns < full["dataframe"] and report["facet_index"] == full["facet_index"]
+    assert report["tfidf:data"] + report["tfidf:indices"] + report["tfidf:indptr"] < full["tfidf"]
+
+    # Komponen yang dibangun belakangan ikut dihitung
+    compact.profiles, compact.neighbors
+    report = compact.memory_report()
+    assert report["profiles"] > 0 and report["neighbors"] > 0
+
+def test_get_catalog_reloads_only_when_content_changes(catalog_builder):
+    catalog = catalog_builder(40)
+    assert get_catalog('clean.csv', compact=False) is catalog
+    assert get_catalog(os.path.abspath('clean.csv'), compact=False) is catalog
+
+    # mtime berubah, isi sama -> objek yang sama (signature diperbarui)
+    stat = os.stat('clean.csv')
+    os.utime('clean.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert get_catalog('clean.csv', compact=False) is catalog
+    assert catalog.signature == (stat.st_mtime_ns + 10**9, stat.st_size)
+
+    # Ditulis ulang dengan isi sama -> tetap di-cache
+    with open('clean.csv', 'rb') as f:
+        content = f.read()
+    with open('clean.csv', 'wb') as f:
+        f.write(content)
+    assert get_catalog('clean.csv', compact=False) is catalog
+
+    # Isi berubah -> Catalog baru; versi compact punya entri sendiri
+    compact = get_catalog('clean.csv', compact=True)
+    pd.read_csv('clean.csv').iloc[:-1].to_csv('clean.csv', index=False)
+    reloaded = get_catalog('clean.csv', compact=False)
+    assert reloaded is not catalog and len(reloaded) == 39 and reloaded.content_hash != catalog.content_hash
+    assert get_catalog('clean.csv', compact=False) is reloaded
+    reloaded_compact = get_catalog('clean.csv', compact=True)
+    assert reloaded_compact is not compact and reloaded_compact.content_hash == reloaded.content_hash
+
+    clear_catalog_cache()
+    assert get_catalog('clean.csv', compact=False) is not reloaded
+
+def test_replace_catalog_swaps_full_and_compact(catalog_builder):
+    catalog = catalog_builder(40)
+    compact = get_catalog('clean.csv', compact=True)
+    updated = load_catalog('clean.csv')
+    replace_catalog(updated)
+    assert get_catalog('clean.csv', compact=False) is updated
+    replaced = get_catalog('clean.csv', compact=True)
+    assert isinstance(replaced, CompactCatalog) and replaced is not compact and replaced is not catalog
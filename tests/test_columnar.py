@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from modules.columnar import (
+    build_columnar, columnar_path, load_catalog_frame, load_columnar, normalize_catalog, read_schema,
+)
+from modules.model_store import file_hash
+
+def write_clean_csv(raw_frame, n=50):
+    # Satu kolom untuk tiap encoding: teks, int, float32 lossless, scaled, float64, NaN, bool
+    df = raw_frame(n)
+    rng = np.random.default_rng(1)
+    df['Price_IDR'] = df['Price_USD'] * 15000
+    df['Score'] = rng.random(n)
+    df['Discount'] = np.where(rng.random(n) < 0.3, np.nan, rng.integers(0, 8, size=n) / 4)
+    df['In_Stock'] = rng.random(n) < 0.5
+    df['Image_URL'] = np.where(rng.random(n) < 0.8, None, 'http://img/x.png')
+    df['Notes'] = np.nan
+    df.loc[3, 'Brand'] = None
+    df.to_csv('clean.csv', index=False)
+    return 'clean.csv'
+
+def assert_same_frame(loaded, expected):
+    assert list(loaded.columns) == list(expected.columns) and len(loaded) == len(expected)
+    for col in expected.columns:
+        values, reference = loaded[col], expected[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            pd.testing.assert_series_equal(values.astype(object), reference.astype(object), check_names=False)
+        else:
+            # Numerik dimuat dengan dtype hasil parsing CSV (int boleh lebih kecil)
+            assert values.dtype.kind == reference.dtype.kind, col
+            if values.dtype.kind == 'f':
+                assert values.dtype == np.float64, col
+            np.testing.assert_array_equal(values.to_numpy(), reference.to_numpy(), err_msg=col)
+
+def test_columnar_round_trip_matches_read_csv(raw_frame, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_path = write_clean_csv(raw_frame)
+    expected = normalize_catalog(pd.read_csv(csv_path))
+    # Chunk kecil: kategori & dtype digabung lintas chunk
+    path = build_columnar(csv_path, file_hash(csv_path), chunksize=7)
+    encodings = {col: meta["encoding"] for col, meta in read_schema(path)["columns"].items()}
+    assert set(encodings.values()) == {"category", "int", "float", "scaled", "bool"}
+    assert (encodings['Brand'], encodings['Number_of_Reviews'], encodings['Rating'], encodings['In_Stock']) == (
+        "category", "int", "scaled", "bool")
+    assert encodings['Score'] == encodings['Notes'] == "float"
+
+    assert_same_frame(load_columnar(path), expected)
+    assert_same_frame(load_columnar(path, columns=['Rating', 'Brand']), expected[['Rating', 'Brand']])
+    loaded = load_catalog_frame(csv_path, content_hash=file_hash(csv_path))
+    assert isinstance(loaded['Category'].dtype, pd.CategoricalDtype)
+    assert_same_frame(loaded, expected)
+
+def test_missing_or_stale_artifact_falls_back_to_csv(raw_frame, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_path = write_clean_csv(raw_frame)
+    expected = normalize_catalog(pd.read_csv(csv_path))
+
+    # Tanpa artefak
+    loaded = load_catalog_frame(csv_path, content_hash=file_hash(csv_path))
+    assert not isinstance(loaded['Category'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(loaded, expected)
+    pd.testing.assert_frame_equal(load_catalog_frame(csv_path, columns=['Rating', 'Brand']),
+                                  expected[['Rating', 'Brand']])
+
+    # Artefak dari isi CSV lama: hash tidak cocok -> CSV
+    build_columnar(csv_path, file_hash(csv_path))
+    write_clean_csv(raw_frame, n=40)
+    changed = normalize_catalog(pd.read_csv(csv_path))
+    loaded = load_catalog_frame(csv_path, content_hash=file_hash(csv_path))
+    assert not isinstance(loaded['Category'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(loaded, changed)
+    # Tanpa content_hash artefak dipakai apa adanya
+    assert len(load_catalog_frame(csv_path)) == 50 and columnar_path(csv_path) == 'clean.columnar'
@@ -0,0 +1,37 @@
+import filecmp
+
+import numpy as np
+import pandas as pd
+
+from modules.data_preprocessing import median_from_counts, preprocess_and_save, preprocess_and_save_streaming
+
+def test_median_from_counts_matches_series_median():
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 7, 10, 101):
+        values = pd.Series(rng.integers(0, 6, size=size) / 2)
+        assert median_from_counts(values.value_counts()) == values.median()
+    assert np.isnan(median_from_counts(pd.Series(dtype=np.int64)))
+
+def test_streaming_output_is_identical(tmp_path, monkeypatch):
+    # Artefak kolumnar ditulis di samping output; jalankan di folder sementara
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(1)
+    n = 23
+    raw = pd.DataFrame({
+        'Product_Name': [f'Product {i}' if i % 9 else None for i in range(n)],
+        'Brand': [f' Brand {i % 4} ' for i in range(n)],
+        'Category': rng.choice(['Serum', 'Toner', None], size=n),
+        'Usage_Frequency': rng.choice(['Daily', 'Weekly'], size=n),
+        'Price_USD': np.where(np.arange(n) % 5 == 0, np.nan, rng.integers(100, 9000, size=n) / 100),
+        'Rating': np.where(np.arange(n) % 4 == 1, np.nan, rng.integers(10, 50, size=n) / 10),
+        # Chunk pertama tanpa NaN (int64), chunk berikutnya dengan NaN (float64)
+        'Number_of_Reviews': [float(i * 10) if i != 17 else np.nan for i in range(n)],
+        'Skin_Type': rng.choice(['Oily', 'Dry', 'Combination'], size=n),
+        'Gender_Target': rng.choice(['Female', 'Unisex'], size=n),
+        'Main_Ingredient': rng.choice(['Retinol', 'Niacinamide'], size=n),
+    })
+    raw.to_csv('raw.csv', index=False)
+
+    preprocess_and_save('raw.csv', 'full.csv')
+    preprocess_and_save_streaming('raw.csv', 'stream.csv', chunksize=4)
+    assert filecmp.cmp('full.csv', 'stream.csv', shallow=False)
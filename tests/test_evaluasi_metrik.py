@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from evaluasi_metrik import encode_ids, ndcg_at_k, precision_at_k, ranking_metrics, recall_at_k
+
+def make_cases(n_queries, seed=0):
+    # Id dari himpunan kecil -> banyak irisan dan duplikat (seperti Product_Name di katalog)
+    rng = np.random.default_rng(seed)
+    recoms, truths, ks = [], [], []
+    for i in range(n_queries):
+        k = int(rng.choice([3, 5, 10]))
+        recoms.append([f"p{j}" for j in rng.integers(0, 15, size=int(rng.integers(1, 13)))])
+        truths.append([] if i % 17 == 0 else [f"p{j}" for j in rng.integers(0, 15, size=int(rng.integers(1, 13)))])
+        ks.append(k)
+    return recoms, truths, ks
+
+def test_batch_metrics_identical_to_scalar_functions():
+    recoms, truths, ks = make_cases(300)
+    expected = np.array([
+        (precision_at_k(r, t, k), recall_at_k(r, t, k), ndcg_at_k(r, t, k)) for r, t, k in zip(recoms, truths, ks)
+    ])
+    k = np.array(ks)
+    # Bit per bit, baik dari list id maupun matrix kode
+    np.testing.assert_array_equal(np.column_stack(ranking_metrics(recoms, truths, k)), expected)
+    np.testing.assert_array_equal(np.column_stack(ranking_metrics(*encode_ids(recoms, truths), k)), expected)
+
+def test_unit_grades_equal_binary_relevance():
+    recoms, truths, ks = make_cases(50, seed=1)
+    grades = [[1.0] * len(t) for t in truths]
+    binary = ranking_metrics(recoms, truths, np.array(ks))
+    for gain in ("linear", "exponential"):
+        graded = ranking_metrics(recoms, truths, np.array(ks), grades=grades, gain=gain)
+        np.testing.assert_allclose(graded.ndcg, binary.ndcg, rtol=0, atol=1e-12)
+    with pytest.raises(ValueError):
+        ranking_metrics(recoms, truths, 5, gain="log")
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from modules.image import (
+    _gradient, clear_image_cache, dummy_image_bytes, generate_dummy_image, image_filename, prerender_images,
+    render_dummy_image,
+)
+
+NAMES = ["Hydrating Serum", "Super Long Product Name With Retinol", "toner (dry) 50%", "Hydrating Serum", "A"]
+
+def legacy_image(product_name, size=(200, 200)):
+    # Versi lama generate_dummy_image: gradasi digambar per baris dengan ImageDraw.line
+    img = Image.new('RGB', size)
+    draw = ImageDraw.Draw(img)
+    for y in range(size[1]):
+        shade = int(200 + (50 * y / size[1]))
+        draw.line([(0, y), (size[0], y)], fill=(shade, shade, shade))
+    text = product_name[:15] + '...' if len(product_name) > 15 else product_name
+    font = ImageFont.load_default()
+    w, h = draw.textbbox((0, 0), text, font=font)[2:]
+    draw.text(((size[0]-w)/2, (size[1]-h)/2), text, fill=(0,0,0), font=font)
+    return img
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_render_identical_to_legacy_drawing():
+    _gradient.cache_clear()
+    for size in [(200, 200), (120, 90)]:
+        for name in NAMES:
+            expected = np.asarray(legacy_image(name, size))
+            np.testing.assert_array_equal(np.asarray(render_dummy_image(name, size)), expected)
+        # Gradasi dirender sekali per ukuran dan tidak tercoret teks dari render sebelumnya
+        gradient = np.asarray(_gradient(size))
+        np.testing.assert_array_equal(gradient, np.asarray(legacy_image("", size)))
+    info = _gradient.cache_info()
+    assert info.misses == 2 and info.hits == 2 * len(NAMES)
+
+def test_cached_bytes_identical_to_generated_file(tmp_path):
+    clear_image_cache()
+    legacy_dir, empty_dir = str(tmp_path / "legacy"), str(tmp_path / "empty")
+    for name in NAMES:
+        # Dirender di memori (belum ada file) == PNG yang ditulis generate_dummy_image
+        assert dummy_image_bytes(name, image_dir=empty_dir) == read_bytes(generate_dummy_image(name, legacy_dir))
+    assert not os.path.exists(empty_dir)
+    assert dummy_image_bytes.cache_info().currsize == len(set(NAMES))
+    clear_image_cache()
+
+def test_prerender_writes_same_files(tmp_path):
+    clear_image_cache()
+    legacy_dir = str(tmp_path / "legacy")
+    for workers in (1, 2):
+        image_dir = str(tmp_path / f"prerender-{workers}")
+        assert prerender_images(NAMES, image_dir, workers=workers, chunk_size=2) == (len(set(NAMES)), len(set(NAMES)))
+        # Sudah ada di disk: tidak dirender ulang
+        assert prerender_images(NAMES, image_dir, workers=workers) == (0, len(set(NAMES)))
+        for name in NAMES:
+            expected = read_bytes(generate_dummy_image(name, legacy_dir))
+            assert read_bytes(image_filename(name, image_dir)) == expected
+            assert dummy_image_bytes(name, image_dir=image_dir) == expected
+    clear_image_cache()
@@ -0,0 +1,46 @@
+import filecmp
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from modules.data_preprocessing import preprocess_and_save
+from modules.ingest import apply_changes, check_consistency, journal_path
+
+def test_ingest_matches_full_rebuild_and_survives_preprocessing(catalog_builder, raw_frame):
+    catalog_builder(60).neighbors
+    raw = raw_frame(60)
+
+    # Ubah dua produk di tengah (satu dengan desimal di kolom yang tadinya int), tambah dua, hapus satu
+    upserts = pd.concat([raw.iloc[[20, 31]], raw_frame(2, seed=1, start=100)], ignore_index=True)
+    upserts['Rating'] = [5.0, 1.5, 4.0, 3.5]
+    upserts['Number_of_Reviews'] = upserts['Number_of_Reviews'].astype(float)
+    upserts.loc[0, 'Number_of_Reviews'] = 12.5
+    deletes = raw.iloc[[40]][['Product_Name', 'Brand']]
+    result = apply_changes('clean.csv', upserts, deletes, idf_threshold=np.inf, oov_threshold=np.inf)
+    assert (result.appended, result.updated, result.deleted, result.refit) == (2, 2, 1, False)
+
+    report = check_consistency(result.catalog)
+    assert report['rows'] == 61
+    assert report['tfidf_frozen'] < 1e-12
+    assert report['facets'] and report['neighbors'] and report['columnar']
+
+    # CSV hasil tulis ekor == tulis penuh
+    ingested = pd.read_csv('clean.csv')
+    ingested.to_csv('full.csv', index=False)
+    assert filecmp.cmp('clean.csv', 'full.csv', shallow=False)
+
+    # Preprocessing ulang dari data mentah memutar ulang journal -> CSV clean yang sama
+    shutil.copy('clean.csv', 'ingested.csv')
+    preprocess_and_save('raw.csv', 'clean.csv')
+    assert filecmp.cmp('clean.csv', 'ingested.csv', shallow=False)
+    assert len(open(journal_path('clean.csv')).readlines()) == 1
+
+def test_append_only_batch_keeps_existing_bytes(catalog_builder, raw_frame):
+    catalog_builder(30)
+    before = open('clean.csv', 'rb').read()
+
+    apply_changes('clean.csv', raw_frame(3, seed=2, start=50), idf_threshold=np.inf, oov_threshold=np.inf)
+    after = open('clean.csv', 'rb').read()
+    assert after.startswith(before)
+    assert len(pd.read_csv('clean.csv')) == 33
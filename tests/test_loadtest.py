@@ -0,0 +1,36 @@
+import pytest
+
+import loadtest
+from benchmark import replay_queries
+from modules.result_cache import run_query
+
+def test_cached_target_on_synthetic_catalog(catalog_builder):
+    # Katalog sintetis tanpa CSV (csv_path None), seperti --sizes selain ukuran katalog asli
+    source = catalog_builder(60)
+    catalog = loadtest.synthetic_catalog(200, csv_path=source.csv_path)
+    assert catalog.csv_path is None and len(catalog) == 200
+    queries = replay_queries(catalog, 40)
+    for target in ("pipeline", "cached"):
+        run = loadtest.run_target(target, catalog, queries, concurrency=4)
+        assert run["errors"] == 0 and run["first_error"] is None and run["throughput"] > 0
+
+def test_failing_target_is_not_reported_as_latency(catalog_builder, monkeypatch):
+    catalog = catalog_builder(40)
+    queries = replay_queries(catalog, 10)
+
+    def broken(catalog, query, cache):
+        raise TypeError("rusak")
+    monkeypatch.setattr(loadtest, "cached_query", broken)
+    with pytest.raises(RuntimeError, match="rusak"):
+        loadtest.run_target("cached", catalog, queries, concurrency=2)
+
+    # Sebagian gagal: dihitung di errors, latency hanya dari query yang berhasil
+    failing = set(queries[:3])
+
+    def flaky(catalog, query, cache):
+        if query in failing:
+            raise TypeError("rusak")
+        return run_query(catalog, query)
+    monkeypatch.setattr(loadtest, "cached_query", flaky)
+    run = loadtest.run_target("cached", catalog, queries, concurrency=2)
+    assert run["errors"] == sum(query in failing for query in queries) and "rusak" in run["first_error"]
@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import model_store
+from modules.model_store import (
+    META_FILE, artifact_complete, artifact_path, file_hash, load_or_build_tfidf, load_vectorizer, save_into_artifact,
+)
+from modules.precompute_similarity import fit_tfidf
+
+TEXTS = ["serum oily daily retinol", "toner dry weekly niacinamide", "mask combination weekly clay",
+         "serum dry daily hyaluronic acid", "moisturizer oily daily niacinamide"]
+
+def write_csv(path, texts):
+    pd.DataFrame({'combined_features': texts}).to_csv(path, index=False)
+    return str(path)
+
+def memory_mapped(values):
+    # csr_matrix membungkus array dengan view; cari memmap di rantai base
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+def test_changed_csv_rebuilds_and_prunes_only_same_source(tmp_path):
+    artifact_dir = str(tmp_path / "artifacts")
+    csv_path = write_csv(tmp_path / "clean.csv", TEXTS)
+    other_path = write_csv(tmp_path / "other.csv", TEXTS[:3])
+    first = load_or_build_tfidf(csv_path, artifact_dir)
+    other = load_or_build_tfidf(other_path, artifact_dir)
+    assert first.path == artifact_path(file_hash(csv_path), artifact_dir) and artifact_complete(first.path)
+    # Artefak lama tanpa source (sebelum source dicatat) tidak pernah dihapus
+    legacy = artifact_path("0" * 16, artifact_dir)
+    os.makedirs(legacy)
+    with open(os.path.join(legacy, META_FILE), "w") as f:
+        json.dump({"content_hash": "0" * 16, "shape": [0, 0], "nnz": 0}, f)
+
+    # CSV sama -> artefak yang ada dipakai, tidak dibangun ulang
+    assert load_or_build_tfidf(csv_path, artifact_dir).path == first.path
+
+    # Isi CSV berubah -> folder tfidf-<hash> baru, versi lama CSV ini saja yang dihapus
+    write_csv(csv_path, TEXTS + ["sunscreen unisex daily zinc"])
+    second = load_or_build_tfidf(csv_path, artifact_dir)
+    assert second.path != first.path and second.matrix.shape[0] == len(TEXTS) + 1
+    assert not os.path.exists(first.path)
+    assert artifact_complete(other.path) and artifact_complete(legacy)
+
+def test_incomplete_artifact_is_rebuilt(tmp_path, monkeypatch):
+    artifact_dir = str(tmp_path / "artifacts")
+    csv_path = write_csv(tmp_path / "clean.csv", TEXTS)
+    path = artifact_path(file_hash(csv_path), artifact_dir)
+    # Build terputus: folder ada, sebagian file, tanpa meta.json
+    os.makedirs(path)
+    np.save(os.path.join(path, "data.npy"), np.zeros(3))
+    assert not artifact_complete(path)
+    with pytest.raises(FileNotFoundError):
+        save_into_artifact(path, {"extra.npy": np.zeros(2)})
+
+    artifact = load_or_build_tfidf(csv_path, artifact_dir)
+    assert artifact.path == path and artifact_complete(path)
+    assert artifact.matrix.shape == (len(TEXTS), len(artifact.vocabulary))
+
+    # Artefak lengkap tidak dibangun ulang
+    monkeypatch.setattr(model_store, "build_tfidf_artifact", lambda *args: pytest.fail("dibangun ulang"))
+    load_or_build_tfidf(csv_path, artifact_dir)
+
+def test_mmap_load_matches_fresh_fit(tmp_path):
+    csv_path = write_csv(tmp_path / "clean.csv", TEXTS)
+    artifact = load_or_build_tfidf(csv_path, str(tmp_path / "artifacts"))
+    matrix = artifact.matrix
+    assert all(memory_mapped(values) for values in (matrix.data, matrix.indices, matrix.indptr, artifact.idf))
+
+    vectorizer, matrix = fit_tfidf(pd.read_csv(csv_path))
+    matrix.sort_indices()
+    assert artifact.matrix.shape == matrix.shape and (artifact.matrix != matrix).nnz == 0
+    np.testing.assert_array_equal(artifact.matrix.toarray(), matrix.toarray())
+    assert artifact.vocabulary == vectorizer.get_feature_names_out().tolist()
+    np.testing.assert_array_equal(artifact.idf, vectorizer.idf_)
+
+    # Vectorizer dari artefak (tanpa fitting) = vectorizer hasil fit
+    texts = ["retinol serum for oily skin", "unknown words only"]
+    assert (load_vectorizer(artifact).transform(texts) != vectorizer.transform(texts)).nnz == 0
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from modules.neighbors import build_neighbors, neighbor_recall
+
+def make_matrix(n_rows=400, n_features=30, seed=0):
+    # Baris duplikat ikut dimasukkan agar ada skor seri (diurutkan id terkecil)
+    matrix = sparse_random(n_rows, n_features, density=0.15, format='csr', random_state=seed)
+    return matrix[np.random.default_rng(seed).integers(0, n_rows, size=n_rows)]
+
+def test_ivf_with_every_list_probed_is_exact():
+    matrix = make_matrix()
+    exact = build_neighbors(matrix, n_neighbors=10, method='exact')
+    ivf = build_neighbors(matrix, n_neighbors=10, method='ivf', n_lists=8, n_probe=8)
+    np.testing.assert_array_equal(ivf.ids, exact.ids)
+    np.testing.assert_array_equal(ivf.scores, exact.scores)
+
+def test_ivf_recall_grows_with_probes():
+    matrix = make_matrix()
+    rows = np.arange(matrix.shape[0])
+    assert neighbor_recall(build_neighbors(matrix, n_neighbors=10, method='exact'), matrix, rows) == 1.0
+
+    # Data acak seragam (tanpa struktur cluster) adalah kasus terburuk IVF
+    recalls = []
+    for n_probe in (2, 8, 20):
+        ivf = build_neighbors(matrix, n_neighbors=10, method='ivf', n_lists=20, n_probe=n_probe)
+        recalls.append(neighbor_recall(ivf, matrix, rows))
+        # Tetangga tidak pernah dirinya sendiri, skor urut turun
+        assert not (ivf.ids == rows[:, None]).any()
+        assert (np.diff(ivf.scores, axis=1) <= 0).all()
+    assert recalls[0] < recalls[1] < recalls[2] == 1.0
+    assert recalls[1] >= 0.8
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        build_neighbors(make_matrix(), method='lsh')
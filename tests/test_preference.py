@@ -0,0 +1,78 @@
+import numpy as np
+from scipy.sparse import random as sparse_random
+
+from modules.preference import DISLIKE_WEIGHT, LIKE_WEIGHT, PreferenceProfile, replay_profile
+
+def make_matrix(n_rows=200, n_features=30, seed=0):
+    # Baris 0 nol (produk tanpa fitur), baris 2k dan 2k+1 identik untuk k = 1..4
+    matrix = sparse_random(n_rows, n_features, density=0.2, format='lil', random_state=seed)
+    matrix[0] = 0
+    for k in range(1, 5):
+        matrix[2 * k + 1] = matrix[2 * k]
+    return matrix.tocsr()
+
+def click(profile, matrix, position, weight):
+    (profile.like if weight > 0 else profile.dislike)(matrix, position)
+
+def test_incremental_profile_equals_replay():
+    matrix = make_matrix()
+    rng = np.random.default_rng(1)
+    # Posisi dari himpunan kecil -> banyak klik ulang & pindah tanda; decay kecil memicu _rescale
+    for decay in (1.0, 0.9, 0.01):
+        profile = PreferenceProfile(matrix.shape[1], decay=decay)
+        history = []
+        for _ in range(300):
+            position = int(rng.integers(0, 40))
+            weight = LIKE_WEIGHT if rng.random() < 0.7 else DISLIKE_WEIGHT
+            history.append((position, weight))
+            click(profile, matrix, position, weight)
+        expected = replay_profile(matrix, history, decay)
+        assert float(np.abs(profile.vector() - expected).max()) < 1e-9
+
+def test_identical_like_and_dislike_cancel():
+    # Like lalu dislike produk lain dengan baris TF-IDF identik (decay=1): profil kosong, bukan noise
+    matrix = make_matrix()
+    pairs = [(2 * k, 2 * k + 1) for k in range(1, 5)]
+    for n_pairs in (1, 3, 4):
+        profile = PreferenceProfile(matrix.shape[1], decay=1.0)
+        for liked, _ in pairs[:n_pairs]:
+            profile.like(matrix, liked)
+        for _, disliked in pairs[:n_pairs]:
+            profile.dislike(matrix, disliked)
+        assert profile.unit_vector() is None, (n_pairs, profile.norm)
+        profile.like(matrix, 20)
+        assert profile.unit_vector() is not None
+
+def test_repeated_and_switched_clicks_follow_button_state():
+    # Like ulang = no-op, pindah like <-> dislike menghapus kontribusi lama
+    matrix = make_matrix()
+    a, b = 2, 20
+    clicks = [(a, LIKE_WEIGHT), (a, LIKE_WEIGHT), (b, LIKE_WEIGHT), (a, DISLIKE_WEIGHT), (a, DISLIKE_WEIGHT),
+              (b, DISLIKE_WEIGHT), (a, LIKE_WEIGHT)]
+    for decay in (1.0, 0.9):
+        profile = PreferenceProfile(matrix.shape[1], decay=decay)
+        for position, weight in clicks:
+            click(profile, matrix, position, weight)
+        assert profile.liked == {a} and profile.disliked == {b}
+        assert float(np.abs(profile.vector() - replay_profile(matrix, clicks, decay)).max()) < 1e-12
+        # Status akhir sama dengan satu dislike b lalu satu like a
+        expected = PreferenceProfile(matrix.shape[1], decay=decay)
+        expected.dislike(matrix, b)
+        expected.like(matrix, a)
+        np.testing.assert_allclose(profile.unit_vector(), expected.unit_vector(), rtol=0, atol=1e-12)
+
+def test_zero_row_is_not_marked():
+    matrix = make_matrix()
+    profile = PreferenceProfile(matrix.shape[1])
+    assert profile.update(matrix, 5, LIKE_WEIGHT)
+    assert not profile.update(matrix, 5, LIKE_WEIGHT)
+    assert not profile.update(matrix, 0, LIKE_WEIGHT)
+
+    # Baris nol tidak masuk status tombol, sama seperti replay_profile yang melewatinya
+    profile = PreferenceProfile(matrix.shape[1])
+    profile.like(matrix, 0)
+    profile.dislike(matrix, 0)
+    profile.like(matrix, 3)
+    assert profile.liked == {3} and profile.disliked == set() and profile.interactions == 1
+    history = [(0, LIKE_WEIGHT), (0, DISLIKE_WEIGHT), (3, LIKE_WEIGHT)]
+    np.testing.assert_allclose(profile.vector(), replay_profile(matrix, history, profile.decay), rtol=0, atol=1e-12)
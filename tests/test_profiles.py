@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from modules import profiles as profiles_module
+from modules.profiles import build_profiles, check_profiles
+from modules.recommendation import rank_positions, similarity_scores
+
+def test_profile_similarity_identical_to_per_product(scored_matrix, monkeypatch):
+    # Sedikit baris unik yang berulang (seperti combined_features katalog), urutan acak
+    df, matrix = scored_matrix(3000, n_unique=60, n_features=40)
+    profiles = build_profiles(matrix)
+    assert profiles.n_profiles <= 60
+    # Blok kecil: centroid dijumlahkan lintas beberapa blok
+    monkeypatch.setattr(profiles_module, "CENTROID_CHUNK", 97)
+
+    rng = np.random.default_rng(1)
+    subsets = [None, np.sort(rng.choice(len(df), size=700, replace=False)), np.arange(5, 2000, 3), np.array([42])]
+    for positions in subsets:
+        subset = matrix if positions is None else matrix[positions]
+        np.testing.assert_array_equal(profiles.similarity(positions), similarity_scores(subset))
+        np.testing.assert_array_equal(profiles.similarity(positions, 0), similarity_scores(subset, 0))
+
+        # Skor & urutan (termasuk produk seri dari profil yang sama) identik dengan per produk
+        for user_index in (None, 2000):
+            expected = rank_positions(df, matrix, positions, k=50, user_index=user_index)
+            top = rank_positions(df, matrix, positions, k=50, user_index=user_index, profiles=profiles)
+            pd.testing.assert_frame_equal(top, expected)
+
+    report = check_profiles(matrix, profiles, subsets[1])
+    assert report["mean_equal"] and report["reference_equal"]
@@ -0,0 +1,132 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from eval import evaluate_batch, evaluate_hybrid_topk
+
+from modules.recommendation import (
+    hybrid_topk, hybrid_topk_batch, mean_similarity, pairwise_mean_similarity, rank_positions, score_columns, topk_indices,
+)
+from modules.user_filter import FacetIndex, filter_positions
+
+# Matrix kecil tetap: baris nol, baris identik, dan term yang hanya muncul di satu baris
+MATRIX = csr_matrix(np.array([
+    [0.5, 0.0, 1.0, 0.0, 0.0],
+    [0.0, 2.0, 0.0, 0.0, 1.0],
+    [0.5, 0.0, 1.0, 0.0, 0.0],
+    [0.0, 0.0, 0.0, 0.0, 0.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0],
+    [0.0, 0.3, 0.0, 0.7, 0.0],
+    [2.0, 0.0, 0.0, 0.0, 0.5],
+]))
+# Subset tidak berurutan, seperti hasil filter
+SUBSET = np.array([0, 2, 3, 5, 6])
+
+def test_mean_similarity_matches_pairwise():
+    for matrix in (MATRIX, MATRIX[SUBSET]):
+        np.testing.assert_allclose(mean_similarity(matrix), pairwise_mean_similarity(matrix), rtol=0, atol=1e-12)
+
+def test_hybrid_topk_same_for_both_sim_modes():
+    df = pd.DataFrame({
+        'Rating': [4.5, 3.0, 4.5, 5.0, 2.5, 4.0, 3.5],
+        'Number_of_Reviews': [120, 40, 120, 0, 300, 75, 10],
+    }).iloc[SUBSET]
+
+    top_c = hybrid_topk(df, MATRIX, k=4, sim_mode='centroid')
+    top_p = hybrid_topk(df, MATRIX, k=4, sim_mode='pairwise')
+    assert top_c.index.tolist() == top_p.index.tolist()
+    np.testing.assert_allclose(top_c['weighted_score'], top_p['weighted_score'], rtol=0, atol=1e-12)
+
+def test_topk_indices_matches_stable_sort():
+    # Banyak skor seri dan NaN: urutan harus sama dengan sort stabil turun (NaN terakhir)
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 5, size=200) / 4
+    scores[rng.choice(200, size=10, replace=False)] = np.nan
+    expected = pd.Series(scores).sort_values(ascending=False, kind='stable', na_position='last').index.to_numpy()
+    for k in (1, 7, 50, 200, 500):
+        assert topk_indices(scores, k).tolist() == expected[:k].tolist()
+
+def test_hybrid_topk_matches_pandas_sort():
+    df = pd.DataFrame({
+        'Rating': [4.5, 3.0, 4.5, 5.0, 2.5, 4.0, 3.5],
+        'Number_of_Reviews': [120, 40, 120, 0, 300, 75, 10],
+    })
+    sim = mean_similarity(MATRIX)
+    for weights in [(0.4, 0.2, 0.4), (0.1, 0.1, 0.7), (1.0, 0.0, 0.0)]:
+        alpha, beta, gamma = weights
+        # Implementasi pandas lama: kolom skor + sort_values penuh (baris 0 & 2 seri)
+        weighted = alpha * (df['Rating'] / 5) + beta * (df['Number_of_Reviews'] / 300) + gamma * sim
+        expected = df.assign(weighted_score=weighted).sort_values('weighted_score', ascending=False, kind='stable')
+        for k in (3, 7):
+            top = hybrid_topk(df, MATRIX, *weights, k=k)
+            assert top.index.tolist() == expected.index[:k].tolist()
+            np.testing.assert_array_equal(top['weighted_score'], expected['weighted_score'].to_numpy()[:k])
+
+# Katalog kecil: serum di posisi 1, 3, 4 (bukan prefix), toner di antaranya.
+# Vektor serum A=(0.6, 0.8, 0), B=(0, 1, 0), C=(1, 0, 0): cosine A.B=0.8, A.C=0.6, B.C=0
+CATALOG = pd.DataFrame({
+    'Product_Name': ['Toner X', 'Serum A', 'Toner Y', 'Serum B', 'Serum C', 'Toner Z'],
+    'Category': ['toner', 'serum', 'toner', 'serum', 'serum', 'toner'],
+    'Skin_Type': ['oily'] * 6,
+    'Gender': ['unisex'] * 6,
+    'Usage_Frequency': ['daily'] * 6,
+    'Price_IDR': [10000.0] * 6,
+    'Rating': [5.0, 4.0, 5.0, 3.5, 4.5, 5.0],
+    'Number_of_Reviews': [900, 100, 900, 50, 200, 900],
+})
+CATALOG_MATRIX = csr_matrix(np.array([
+    [0.0, 0.0, 1.0],
+    [3.0, 4.0, 0.0],
+    [0.0, 0.0, 2.0],
+    [0.0, 5.0, 0.0],
+    [2.0, 0.0, 0.0],
+    [1.0, 1.0, 1.0],
+]))
+
+def similarity_by_name(top):
+    return dict(zip(top['Product_Name'], top['Similarity_norm']))
+
+def test_rank_positions_scores_filtered_rows():
+    positions = filter_positions(FacetIndex(CATALOG), 'serum', None, None, None, None)
+    assert positions.tolist() == [1, 3, 4]
+
+    # Mean similarity dalam subset serum saja: A=(1+0.8+0.6)/3, B=(0.8+1+0)/3, C=(0.6+0+1)/3
+    top = rank_positions(CATALOG, CATALOG_MATRIX, positions, k=10)
+    assert similarity_by_name(top) == pytest.approx({'Serum A': 0.8, 'Serum B': 0.6, 'Serum C': 1.6 / 3}, abs=1e-12)
+    assert top.index.tolist() == [4, 1, 3]
+
+    # Produk referensi Serum C (posisi global 4): cosine terhadap C
+    top = rank_positions(CATALOG, CATALOG_MATRIX, positions, k=10, user_index=4)
+    assert similarity_by_name(top) == pytest.approx({'Serum A': 0.6, 'Serum B': 0.0, 'Serum C': 1.0}, abs=1e-12)
+
+def test_rank_positions_with_cached_columns():
+    positions = np.array([1, 3, 4])
+    expected = rank_positions(CATALOG, CATALOG_MATRIX, positions, k=2)
+    top = rank_positions(CATALOG, CATALOG_MATRIX, positions, k=2, columns=score_columns(CATALOG))
+    pd.testing.assert_frame_equal(top, expected)
+
+def test_batch_matches_per_query_ranking(scored_matrix):
+    df, matrix = scored_matrix(60, n_features=12, density=0.3)
+    rng = np.random.default_rng(1)
+    n = len(df)
+    subsets = [None, np.sort(rng.choice(n, size=25, replace=False)), np.array([3, 9, 40]), np.array([], dtype=np.int64)]
+    values = (0.1, 0.4, 0.7)
+    queries = [
+        {"positions": pos, "alpha": a, "beta": b, "gamma": g, "k": 5}
+        for pos in subsets for a, b, g in itertools.product(values, values, values)
+    ] + [{"positions": subsets[1], "user_index": int(subsets[1][4]), "k": 30}]
+
+    # Blok kecil: skor beberapa query dihitung per blok
+    batch = hybrid_topk_batch(df, matrix, queries, max_block_cells=100)
+    for query, result in zip(queries, batch):
+        expected = rank_positions(df, matrix, query["positions"], query.get("alpha", 0.4), query.get("beta", 0.2),
+                                  query.get("gamma", 0.4), query["k"], user_index=query.get("user_index"))
+        assert result.equals(expected)
+
+    evals = evaluate_batch(df, matrix, queries[:-1])
+    for query, result in zip(queries[:-1], evals):
+        subset = df if query["positions"] is None else df.iloc[query["positions"]]
+        assert result == evaluate_hybrid_topk(subset, matrix, query["alpha"], query["beta"], query["gamma"], query["k"])
@@ -0,0 +1,50 @@
+from modules.catalog import Catalog, get_catalog
+from modules.result_cache import ResultCache, cached_query, canonical_query, clip_range, run_query
+
+def test_off_grid_range_keeps_products_inside(catalog_builder):
+    catalog = catalog_builder(40)
+    prices = catalog.df['Price_IDR'].to_numpy()
+    for low, high in [(prices[3], prices[3]), (prices[3] - 1, prices[7] + 1), (prices.min() - 10, 123_456.0)]:
+        low, high = min(low, high), max(low, high)
+        query = canonical_query(catalog, price_range=(low, high), k=len(catalog))
+        matched, top = run_query(catalog, query)
+        assert matched == int(((prices >= low) & (prices <= high)).sum())
+    assert clip_range((-5.0, 1e12), 10.0, 20.0) == (10.0, 20.0)
+    assert clip_range((12.5, 17.25), 10.0, 20.0) == (12.5, 17.25)
+
+def test_compact_and_full_catalogs_keep_separate_entries(catalog_builder):
+    full = catalog_builder(40)
+    compact = get_catalog(full.csv_path, compact=True)
+    assert full.content_hash == compact.content_hash and full.cache_key != compact.cache_key
+
+    cache = ResultCache()
+    queries = [canonical_query(full, category='serum'), canonical_query(full, skin_type='dry', k=5)]
+    seen = set()
+    # Bergantian: katalog compact tidak memakai (atau membuang) entri katalog float64
+    for catalog in (full, compact, full, compact):
+        for query in queries:
+            matched, top, hit = cached_query(catalog, query, cache)
+            expected_matched, expected = run_query(catalog, query)
+            assert matched == expected_matched and top.equals(expected)
+            assert hit == ((catalog.compact, query) in seen)
+            seen.add((catalog.compact, query))
+    stats = cache.stats()
+    assert stats["size"] == 4 and stats["misses"] == 4
+
+def test_in_memory_catalog_keyed_by_content(catalog_builder):
+    # Katalog tanpa CSV (seperti benchmark.py & loadtest.py): key dari content hash, bukan path
+    full = catalog_builder(40)
+    memory = Catalog(None, full.df, full.tfidf_matrix, "synthetic-40", None)
+    cache = ResultCache()
+    query = canonical_query(memory, category='serum')
+    for expected_hit in (False, True):
+        matched, top, hit = cached_query(memory, query, cache)
+        expected_matched, expected = run_query(memory, query)
+        assert hit == expected_hit and matched == expected_matched and top.equals(expected)
+
+    # Isi berubah -> key baru, hasil katalog lama tidak dipakai
+    changed = Catalog(None, full.df.iloc[:30], full.tfidf_matrix[:30], "synthetic-30", None)
+    matched, top, hit = cached_query(changed, query, cache)
+    expected_matched, expected = run_query(changed, query)
+    assert not hit and matched == expected_matched and top.equals(expected)
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,59 @@
+import json
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import numpy as np
+import pytest
+
+from modules.recommendation import rank_positions
+from modules.result_cache import ResultCache
+from modules.user_filter import filter_positions
+from server import start_in_thread
+
+@pytest.fixture
+def service(catalog_builder):
+    catalog = catalog_builder(50)
+    server, _ = start_in_thread(csv_path='clean.csv', cache=ResultCache(), catalog=catalog)
+    yield catalog, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def get_json(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_recommend_matches_direct_ranking(service):
+    catalog, base = service
+    prices = np.sort(catalog.df['Price_IDR'].to_numpy())
+    cases = [
+        {},
+        {"category": "serum"},
+        {"category": "Serum", "skin_type": "dry", "k": 3},
+        {"gender": "unisex", "usage_frequency": "weekly", "alpha": 0.1, "beta": 0.1, "gamma": 0.8},
+        # Rentang bebas di luar grid slider
+        {"price_min": prices[5] - 1, "price_max": prices[30] + 1},
+    ]
+    for params in cases:
+        for _ in range(2):  # kedua kalinya dari cache
+            status, body = get_json(f"{base}/recommend?{urlencode(params)}")
+            assert status == 200
+            facets = [params.get(name) for name in ("category", "skin_type", "gender", "usage_frequency")]
+            price_range = (params.get("price_min", catalog.price_min), params.get("price_max", catalog.price_max))
+            positions = filter_positions(catalog.facet_index, *facets, price_range)
+            expected = rank_positions(catalog.df, catalog.tfidf_matrix, positions, params.get("alpha", 0.4),
+                                      params.get("beta", 0.2), params.get("gamma", 0.4), params.get("k", 10))
+            assert body["matched"] == len(positions)
+            assert [r["id"] for r in body["results"]] == expected.index.tolist()
+
+def test_invalid_requests(service):
+    _, base = service
+    assert get_json(f"{base}/recommend?price_min=10&price_max=5")[0] == 400
+    assert get_json(f"{base}/recommend?alpha=nan")[0] == 400
+    assert get_json(f"{base}/recommend?k=0")[0] == 400
+    assert get_json(f"{base}/recommend?product=999")[0] == 404
+    assert get_json(f"{base}/similar/999")[0] == 404
+    assert get_json(f"{base}/unknown")[0] == 404
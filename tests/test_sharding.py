@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from modules.result_cache import canonical_query
+from modules.sharding import ShardedCatalog, check_sharded, same_topk
+
+def make_queries(catalog):
+    return [
+        canonical_query(catalog),
+        canonical_query(catalog, k=1),
+        canonical_query(catalog, k=200),
+        canonical_query(catalog, category='serum', k=20),
+        canonical_query(catalog, category='toner', skin_type='oily', gender='female'),
+        canonical_query(catalog, usage_frequency='weekly', price_range=(5, 12), alpha=0.1, beta=0.1, gamma=0.8),
+        canonical_query(catalog, product=3, k=20),
+        canonical_query(catalog, category='mask', product=140, alpha=0.0, beta=0.0, gamma=1.0),
+        canonical_query(catalog, category='serum', price_range=(19.9, 20)),
+    ]
+
+@pytest.mark.parametrize("by", ["hash", "category"])
+def test_sharded_same_as_single_process(catalog_builder, by):
+    # Rating & review diskret, sedikit teks unik -> banyak skor seri
+    catalog = catalog_builder(150, ties=True)
+    queries = make_queries(catalog)
+    with ShardedCatalog.split(catalog.df, catalog.tfidf_matrix, 2, by) as sharded:
+        identical, mismatches = check_sharded(catalog, sharded, queries)
+        assert mismatches == 0 and identical > 0
+
+        # Query dari beberapa thread sekaligus (seperti ThreadingHTTPServer): diserialkan, hasil tetap sama
+        expected = [sharded.run_query(query) for query in queries]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent = list(pool.map(sharded.run_query, queries * 3))
+        for (matched, top), (concurrent_matched, concurrent_top) in zip(expected * 3, concurrent):
+            assert matched == concurrent_matched and top.equals(concurrent_top)
+
+def frame(positions, scores):
+    return pd.DataFrame({'weighted_score': scores}, index=positions)
+
+def test_same_topk_allows_reordering_only_among_ties():
+    expected = frame([4, 7, 2, 9], [0.9, 0.5, 0.5, 0.1])
+    assert same_topk(frame([4, 7, 2, 9], [0.9, 0.5, 0.5, 0.1]), expected)
+    # Produk seri bertukar tempat, selisih skor di digit terakhir
+    assert same_topk(frame([4, 2, 7, 9], [0.9, 0.5 + 1e-16, 0.5, 0.1]), expected)
+    # Skor per peringkat sama tetapi posisinya lain: bukan produk seri
+    assert not same_topk(frame([4, 7, 3, 9], [0.9, 0.5, 0.5, 0.1]), expected)
+    assert not same_topk(frame([7, 4, 2, 9], [0.9, 0.5, 0.5, 0.1]), expected)
+    assert not same_topk(frame([4, 7, 2, 9], [0.9, 0.5, 0.4, 0.1]), expected)
+    assert not same_topk(frame([4, 7, 2], [0.9, 0.5, 0.5]), expected)
+    assert not same_topk(frame([4, 7, 7, 9], [0.9, 0.5, 0.5, 0.1]), expected)
+
+def test_same_topk_boundary_ties_checked_against_full_ranking():
+    expected = frame([4, 7, 2], [0.9, 0.5, 0.5])
+    ranked = frame([4, 7, 2, 5, 8], [0.9, 0.5, 0.5, 0.5, 0.3])
+    # Produk 5 seri dengan skor ke-k -> boleh menggantikan produk 2
+    top = frame([4, 5, 7], [0.9, 0.5, 0.5])
+    assert not same_topk(top, expected)
+    assert same_topk(top, expected, ranked=ranked)
+    # Produk 8 tidak seri, produk 6 tidak ada di peringkat lengkap
+    assert not same_topk(frame([4, 7, 8], [0.9, 0.5, 0.5]), expected, ranked=ranked)
+    assert not same_topk(frame([4, 7, 6], [0.9, 0.5, 0.5]), expected, ranked=ranked)
+    # Pengganti hanya boleh di kelompok seri terakhir
+    assert not same_topk(frame([5, 7, 2], [0.9, 0.5, 0.5]), frame([4, 7, 2], [0.9, 0.5, 0.5]),
+                         ranked=frame([4, 5, 7, 2], [0.9, 0.9, 0.5, 0.5]))
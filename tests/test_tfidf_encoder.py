@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import random as sparse_random
+from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine
+from sklearn.preprocessing import normalize
+
+from modules.precompute_similarity import fit_tfidf
+from modules.tfidf_encoder import TfidfEncoder, cosine_similarity, l2_normalize
+
+TEXTS = pd.Series([
+    "Serum Oily Daily Retinol",
+    "toner dry weekly niacinamide niacinamide",
+    "Moisturizer, combination; daily -- hyaluronic acid!",
+    "serum oily daily retinol",
+    "the and of a",
+    "",
+    "sunscreen unisex daily zinc oxide spf50",
+])
+
+def test_encoder_identical_to_sklearn_transform():
+    vectorizer, _ = fit_tfidf(pd.DataFrame({'combined_features': TEXTS}))
+    encoder = TfidfEncoder(vectorizer.get_feature_names_out(), vectorizer.idf_)
+    # Teks baru: term di luar vocabulary, huruf besar, token satu huruf, pengulangan
+    texts = pd.concat([TEXTS, pd.Series(["RETINOL retinol x y unknownterm serum", "Niacinamide " * 7])])
+    encoded = encoder.transform(texts)
+    expected = vectorizer.transform(texts)
+    assert encoded.shape == expected.shape and (encoded != expected).nnz == 0
+
+    # None/NaN = teks kosong
+    missing = encoder.transform(["serum", None, np.nan])
+    assert (missing != vectorizer.transform(["serum", "", ""])).nnz == 0
+    with pytest.raises(ValueError):
+        encoder.transform("serum")
+
+def test_l2_normalize_and_cosine_identical_to_sklearn():
+    # Baris nol dibiarkan nol
+    matrix = sparse_random(40, 15, density=0.3, format='lil', random_state=0)
+    matrix[3] = 0
+    matrix = matrix.tocsr()
+    assert (l2_normalize(matrix) != normalize(matrix, norm='l2')).nnz == 0
+    np.testing.assert_array_equal(cosine_similarity(matrix), sklearn_cosine(matrix))
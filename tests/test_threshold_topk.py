@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.profiles import build_profiles
+from modules.recommendation import rank_positions, score_columns
+from modules.threshold_topk import ThresholdIndex
+
+WEIGHTS = [(0.4, 0.2, 0.4), (0.8, 0.1, 0.1), (0.1, 0.8, 0.1), (0.1, 0.1, 0.8), (0.0, 0.0, 1.0)]
+
+def make_index(scored_matrix, n_rows=2000, nan_rating=False):
+    # Rating & review diskret (banyak skor seri), baris TF-IDF berulang
+    df, matrix = scored_matrix(n_rows, n_unique=80)
+    if nan_rating:
+        df.loc[7, 'Rating'] = np.nan
+    profiles = build_profiles(matrix)
+    return df, matrix, profiles, ThresholdIndex(*score_columns(df), profiles, min_rows=0, min_fraction=0)
+
+def test_threshold_identical_to_rank_positions(scored_matrix):
+    df, matrix, profiles, index = make_index(scored_matrix)
+    rng = np.random.default_rng(1)
+    subsets = [None, np.sort(rng.choice(len(df), size=1200, replace=False))]
+    for positions in subsets:
+        for user_index in (None, 1500):
+            for alpha, beta, gamma in WEIGHTS:
+                expected = rank_positions(df, matrix, positions, alpha, beta, gamma, 20, user_index=user_index,
+                                          profiles=profiles)
+                for force in (None, "threshold", "scan"):
+                    top = index.rank(df, positions, alpha, beta, gamma, 20, user_index, force)
+                    pd.testing.assert_frame_equal(top, expected)
+                assert index.search(positions, alpha, beta, gamma, 20, user_index, "threshold")[4].method == "threshold"
+
+@pytest.mark.parametrize("weights, nan_rating", [
+    ((0.5, -0.2, 0.7), False),
+    ((0.4, float("nan"), 0.4), False),
+    ((0.4, 0.2, 0.4), True),
+])
+def test_forced_threshold_falls_back_to_scan_when_invalid(scored_matrix, weights, nan_rating):
+    df, matrix, profiles, index = make_index(scored_matrix, nan_rating=nan_rating)
+    expected = rank_positions(df, matrix, None, *weights, 20, profiles=profiles)
+    top = index.rank(df, None, *weights, 20, force="threshold")
+    assert index.search(None, *weights, 20, force="threshold")[4].method == "scan"
+    pd.testing.assert_frame_equal(top, expected)
+
+def test_unknown_force_raises(scored_matrix):
+    _, _, _, index = make_index(scored_matrix, n_rows=50)
+    with pytest.raises(ValueError):
+        index.search(force="fast")
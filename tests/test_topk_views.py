@@ -0,0 +1,26 @@
+from modules.result_cache import canonical_query, live_query
+from modules.topk_views import build_views, check_views, facet_combinations, load_views, save_views
+
+def test_views_identical_to_live_query(catalog_builder):
+    catalog = catalog_builder(120, ties=True)
+    views = build_views(catalog, depth=8)
+    assert len(views) == len(facet_combinations(catalog))
+    assert check_views(catalog, views, ks=(1, 5, 8)) == 0
+
+    # Tersimpan di artefak -> dimuat ulang dengan isi yang sama
+    save_views(views, catalog.artifact_path)
+    loaded = load_views(catalog.artifact_path)
+    assert check_views(catalog, loaded, ks=(5,)) == 0
+
+    # Di luar cakupan view -> None (dihitung live)
+    for query in (canonical_query(catalog, k=20),
+                  canonical_query(catalog, alpha=0.5, beta=0.2, gamma=0.3),
+                  canonical_query(catalog, price_range=(catalog.price_min + 1, catalog.price_max)),
+                  canonical_query(catalog, product=3)):
+        assert views.lookup(catalog, query) is None
+    # Subset lebih kecil dari k tetap dilayani jika seluruh subset tersimpan
+    small = next(combo for combo in facet_combinations(catalog) if 0 < views.matched[views.slots[combo]] < 8)
+    query = canonical_query(catalog, *small, k=20)
+    served = views.lookup(catalog, query)
+    matched, expected = live_query(catalog, query)
+    assert served[0] == matched and served[1].equals(expected)
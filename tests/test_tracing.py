@@ -0,0 +1,28 @@
+import numpy as np
+
+from modules import tracing
+from modules.recommendation import hybrid_topk_batch, rank_positions
+
+def test_tracing_modes_do_not_change_results(scored_matrix):
+    df, matrix = scored_matrix(80, n_features=10, density=0.3)
+    positions = np.sort(np.random.default_rng(1).choice(len(df), size=30, replace=False))
+
+    def run():
+        return [rank_positions(df, matrix, positions, k=5), rank_positions(df, matrix, None, 0.1, 0.1, 0.8, k=10),
+                *hybrid_topk_batch(df, matrix, [{"positions": positions, "k": 5}])]
+
+    previous = tracing.get_mode()
+    results, traces = {}, {}
+    try:
+        for mode in tracing.MODES:
+            tracing.set_mode(mode)
+            with tracing.start_trace("test", dump=False) as trace:
+                results[mode] = run()
+            traces[mode] = trace
+    finally:
+        tracing.set_mode(previous)
+
+    for mode in ("spans", "profile"):
+        assert all(a.equals(b) for a, b in zip(results["off"], results[mode])), mode
+    assert traces["off"] is None
+    assert "rank" in traces["spans"].summary() and "rank" in traces["profile"].summary()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.user_filter import FACET_COLUMNS, FacetIndex, filter_positions, filter_user_preferences
+
+def make_frame():
+    return pd.DataFrame({
+        'Category': ['Serum', 'serum', 'Toner ', 'blush', None, 'toner'],
+        'Skin_Type': ['oily', 'dry, oily', 'combination', 'normal', 'oily', 'sensitive'],
+        'Gender': ['female', 'male', 'unisex female', 'female', 'male', None],
+        'Usage_Frequency': ['daily', 'weekly', 'daily', 'monthly', 'occasionally', 'daily'],
+        'Price_IDR': [15000.0, 42000.0, 'n/a', 99000.0, 15000.0, 30000.0],
+    })
+
+def baseline(df, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return filter_user_preferences(df, *args).index.to_numpy()
+
+def test_filter_positions_matches_filter_user_preferences():
+    df = make_frame()
+    index = FacetIndex(df)
+    cases = [(None, None, None, None)]
+    for i, col in enumerate(FACET_COLUMNS):
+        # Semua nilai tiap facet + substring parsial ("oil", "male" di dalam "female")
+        values = sorted(df[col].dropna().str.strip().str.lower().unique().tolist()) + ['oil', 'male', 'zzz']
+        cases += [tuple(value if j == i else None for j in range(len(FACET_COLUMNS))) for value in values]
+    cases += [('serum', 'oily', None, None), ('toner', None, 'female', 'daily'), (None, 'oily', 'male', 'weekly')]
+    ranges = [None, (0, 100000), (15000, 30000), (15001, 29999), (50000, 10)]
+    for facets, price_range in itertools.product(cases, ranges):
+        expected = baseline(df, *facets, price_range)
+        np.testing.assert_array_equal(filter_positions(index, *facets, price_range), expected)
+
+def test_substring_facets_match_literally():
+    # Satu-satunya perbedaan dengan filter_user_preferences: str.contains memakai regex,
+    # FacetIndex mencocokkan substring apa adanya
+    df = pd.DataFrame({
+        'Category': ['serum'] * 3,
+        'Skin_Type': ['a.b', 'axb', '(x) oily'],
+        'Gender': ['female'] * 3,
+        'Usage_Frequency': ['daily'] * 3,
+        'Price_IDR': [10000.0] * 3,
+    })
+    index = FacetIndex(df)
+
+    assert filter_positions(index, None, 'a.b', None, None, None).tolist() == [0]
+    assert baseline(df, None, 'a.b', None, None, None).tolist() == [0, 1]
+
+    assert filter_positions(index, None, '(x', None, None, None).tolist() == [2]
+    with pytest.raises(re.error):
+        baseline(df, None, '(x', None, None, None)
@@ -1,57 +1,143 @@
-import pandas as pd
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
-from modules.recommendation import hybrid_topk
-from modules.precompute_similarity import build_tfidf_matrix
-from modules.user_filter import filter_user_preferences
-from evaluasi_metrik import precision_at_k, recall_at_k, ndcg_at_k
+import pandas as pd
+from modules.catalog import get_catalog
+from eval import evaluate_batch
 
-# ===== Load dataset =====
-df = pd.read_csv("data/skincare_products_clean.csv")
+"""
+    Tuning bobot weighted_score (α rating, β popularity, γ similarity).
 
-# ===== Build TF-IDF matrix =====
-tfidf_matrix = build_tfidf_matrix(df)
+    - Grid search (daftar nilai per bobot) atau random search
+    - Dijalankan paralel dengan process pool; katalog dimuat sekali di proses
+      utama (di-share copy-on-write saat fork) dan TF-IDF matrix dibuka
+      memory-mapped dari artefak, jadi semua worker berbagi data read-only
+    - Tiap konfigurasi ditulis ke CSV begitu selesai, sehingga tuning yang
+      terputus bisa dilanjutkan (--resume) tanpa menghitung ulang
 
-# ===== Parameter grid untuk tuning weighted_score =====
+    Contoh:
+        python tuning.py
+        python tuning.py --alpha 0.1 0.2 0.3 0.4 0.5 --workers 4 --resume
+        python tuning.py --random 500 --seed 7 --workers 8
+"""
+
+CSV_PATH = "data/skincare_products_clean.csv"
+OUTPUT_PATH = "tuning_internal_results.csv"
+RESULT_COLUMNS = ["alpha", "beta", "gamma", "precision", "recall", "ndcg"]
+
+# ===== Parameter grid default untuk tuning weighted_score =====
 ALPHA_LIST = [0.1, 0.2, 0.3, 0.4]   # rating
 BETA_LIST  = [0.1, 0.2, 0.3, 0.4]   # popularity
 GAMMA_LIST = [0.4, 0.5, 0.6, 0.7]   # similarity
 K = 10  # top-k untuk evaluasi
 
-results = []
-
-print("=== START INTERNAL FAST TUNING α β γ ===\n")
-
-for alpha in ALPHA_LIST:
-    for beta in BETA_LIST:
-        for gamma in GAMMA_LIST:
-            # ===== Buat weighted score ground truth internal =====
-            data = df.copy()
-            data['Rating_norm'] = data['Rating'] / 5
-            max_reviews = data['Number_of_Reviews'].max()
-            data['Popularity_norm'] = data['Number_of_Reviews'] / max_reviews if max_reviews > 0 else 0
-            data['weighted_score'] = alpha*data['Rating_norm'] + beta*data['Popularity_norm'] + gamma*0  # similarity=0 untuk ground truth
-            topk_system = data.sort_values('weighted_score', ascending=False).head(K)['Product_Name'].tolist()
-
-            # ===== Rekomendasi hybrid_topk =====
-            topk_recom = hybrid_topk(df, tfidf_matrix, alpha=alpha, beta=beta, gamma=gamma, k=K, user_index=None)['Product_Name'].tolist()
-
-            # ===== Hitung metrik internal =====
-            precision = precision_at_k(topk_recom, topk_system, K)
-            recall    = recall_at_k(topk_recom, topk_system, K)
-            ndcg      = ndcg_at_k(topk_recom, topk_system, K)
-
-            results.append({
-                "alpha": alpha,
-                "beta": beta,
-                "gamma": gamma,
-                "precision": precision,
-                "recall": recall,
-                "ndcg": ndcg
-            })
-
-            print(f"α={alpha}, β={beta}, γ={gamma} -> Precision={precision:.3f}, Recall={recall:.3f}, NDCG={ndcg:.3f}")
-
-# ===== Simpan hasil tuning =====
-df_result = pd.DataFrame(results)
-df_result.to_csv("tuning_internal_results.csv", index=False)
-print("\n=== FINISHED: tuning_internal_results.csv created ===")
+_worker_catalog = None
+
+def weight_grid(alpha_list, beta_list, gamma_list):
+    return [tuple(float(w) for w in ws) for ws in itertools.product(alpha_list, beta_list, gamma_list)]
+
+def random_weights(n, seed=42, low=0.0, high=1.0, decimals=3):
+    rng = np.random.default_rng(seed)
+    weights = np.round(rng.uniform(low, high, size=(n, 3)), decimals)
+    return [tuple(float(w) for w in row) for row in weights]
+
+def config_key(alpha, beta, gamma):
+    return (round(float(alpha), 10), round(float(beta), 10), round(float(gamma), 10))
+
+def load_done(output_path):
+    # Konfigurasi yang sudah ada di file hasil (untuk resume)
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set()
+    done = pd.read_csv(output_path, float_precision="round_trip")
+    return {config_key(a, b, g) for a, b, g in done[["alpha", "beta", "gamma"]].itertuples(index=False)}
+
+def _init_worker(csv_path):
+    # Saat fork, katalog proses utama sudah ada di cache dan langsung dipakai
+    global _worker_catalog
+    _worker_catalog = get_catalog(csv_path)
+
+def _evaluate_chunk(configs, k):
+    catalog = _worker_catalog
+    queries = [{"positions": None, "alpha": a, "beta": b, "gamma": g, "k": k} for a, b, g in configs]
+    results = evaluate_batch(catalog.df, catalog.tfidf_matrix, queries)
+    return [
+        {"alpha": a, "beta": b, "gamma": g, "precision": p, "recall": r, "ndcg": n}
+        for (a, b, g), (p, r, n, _, _) in zip(configs, results)
+    ]
+
+def run_tuning(configs, output_path=OUTPUT_PATH, k=K, workers=1, chunk_size=8, resume=False, csv_path=CSV_PATH):
+    done = load_done(output_path) if resume else set()
+    todo = [c for c in configs if config_key(*c) not in done]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    print(f"=== START INTERNAL TUNING α β γ: {len(todo)} konfigurasi ({len(done)} sudah selesai), {workers} worker ===\n")
+
+    # Katalog dimuat sebelum pool dibuat supaya worker mewarisinya
+    get_catalog(csv_path)
+
+    write_header = not (resume and os.path.exists(output_path) and os.path.getsize(output_path) > 0)
+    start = time.perf_counter()
+    finished = 0
+    with open(output_path, "w" if write_header else "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        if write_header:
+            writer.writeheader()
+
+        if workers <= 1:
+            _init_worker(csv_path)
+            completed = (_evaluate_chunk(chunk, k) for chunk in chunks)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(csv_path,))
+            futures = [pool.submit(_evaluate_chunk, chunk, k) for chunk in chunks]
+            completed = (future.result() for future in as_completed(futures))
+
+        try:
+            for rows in completed:
+                for row in rows:
+                    writer.writerow(row)
+                    print(f"α={row['alpha']}, β={row['beta']}, γ={row['gamma']} -> "
+                          f"Precision={row['precision']:.3f}, Recall={row['recall']:.3f}, NDCG={row['ndcg']:.3f}")
+                # Flush per chunk supaya hasil aman jika proses terputus
+                f.flush()
+                finished += len(rows)
+        finally:
+            if workers > 1:
+                pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    throughput = finished / elapsed if elapsed > 0 else 0.0
+    print(f"\n{finished} konfigurasi dalam {elapsed:.2f} detik ({throughput:.1f} config/detik)")
+
+    # Urutkan file akhir agar hasil deterministik terlepas dari urutan selesai worker
+    result = pd.read_csv(output_path, float_precision="round_trip").sort_values(["alpha", "beta", "gamma"], kind="stable")
+    result.to_csv(output_path, index=False)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuning bobot α β γ sistem rekomendasi")
+    parser.add_argument("--alpha", type=float, nargs="+", default=ALPHA_LIST)
+    parser.add_argument("--beta", type=float, nargs="+", default=BETA_LIST)
+    parser.add_argument("--gamma", type=float, nargs="+", default=GAMMA_LIST)
+    parser.add_argument("--random", type=int, default=0, help="jumlah konfigurasi random search (0 = grid)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--resume", action="store_true", help="lewati konfigurasi yang sudah ada di file output")
+    args = parser.parse_args()
+
+    if args.random > 0:
+        configs = random_weights(args.random, args.seed)
+    else:
+        configs = weight_grid(args.alpha, args.beta, args.gamma)
+
+    run_tuning(configs, args.output, args.k, args.workers, args.chunk_size, args.resume)
+    print(f"\n=== FINISHED: {args.output} created ===")
+
+if __name__ == "__main__":
+    main()